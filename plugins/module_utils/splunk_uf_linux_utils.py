@@ -0,0 +1,891 @@
+# Copyright (c) Ansible Project
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""Shared utility functions for Splunk Universal Forwarder Linux modules."""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import json
+import os
+import re
+import tempfile
+import time
+
+REDACTED = "********"
+
+# Environment variables enabling the cProfile hook around module execution
+PROFILE_DIR_ENV = "SPLUNK_UF_PROFILE_DIR"
+PROFILE_TOP_ENV = "SPLUNK_UF_PROFILE_TOP"
+PROFILE_TOP_DEFAULT = 25
+
+STANZA_RE = re.compile(r"^\s*\[(.*)\]\s*$")
+KEY_RE = re.compile(r"^\s*([^#=\s][^=]*?)\s*=\s*(.*?)\s*$")
+CONF_BOOLEANS = {
+    "true": True,
+    "1": True,
+    "yes": True,
+    "t": True,
+    "false": False,
+    "0": False,
+    "no": False,
+    "f": False,
+}
+
+# Sizes in .conf files, such as maxQueueSize or persistentQueueSize
+SIZE_RE = re.compile(r"^\s*(\d+)\s*(B|KB|MB|GB|TB)?\s*$", re.IGNORECASE)
+SIZE_UNITS = {"B": 1, "KB": 1024, "MB": 1024**2, "GB": 1024**3, "TB": 1024**4}
+
+# Durations in .conf files, such as ignoreOlderThan
+DURATION_RE = re.compile(r"^\s*(\d+)\s*([smhd])\s*$")
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+# splunkd REST endpoints that apply the changes of .conf stanzas without a restart,
+# by file and stanza name prefix
+RELOAD_ENDPOINTS = {
+    ("inputs.conf", "monitor://"): "/services/data/inputs/monitor/_reload",
+    ("inputs.conf", "batch://"): "/services/data/inputs/monitor/_reload",
+}
+
+# Output queue samples of metrics.log, written by splunkd every 30 seconds
+METRICS_QUEUE_RE = re.compile(
+    r"group=queue, name=(tcpout_[^,\s]+),.*?\bcurrent_size=(\d+)"
+)
+# One sample per open indexer connection, named <output group>:<ip>:<port>:<n>, with the KB sent since the last one
+METRICS_CONNECTION_RE = re.compile(
+    r"group=tcpout_connections, name=([^,\s]+),.*?\bkb=([\d.]+)"
+)
+# Bytes read from the end of metrics.log for the latest samples, and seconds between two reads while waiting
+METRICS_TAIL_BYTES = 256 * 1024
+METRICS_POLL_INTERVAL = 5
+
+# Host load sources, the pressure files only exist on kernels with pressure stall information enabled
+LOADAVG_PATH = "/proc/loadavg"
+PRESSURE_DIR = "/proc/pressure"
+PRESSURE_AVG10_RE = re.compile(r"^some avg10=([\d.]+)", re.MULTILINE)
+# Seconds between two reads of the host load while waiting for it to drop
+LOAD_POLL_INTERVAL = 10
+
+# Unit files written by 'splunk enable boot-start', whose ExecStart runs $SPLUNK_HOME/bin/splunk
+SYSTEMD_UNIT_DIR = "/etc/systemd/system"
+UNIT_SPLUNK_HOME_RE = re.compile(r"^ExecStart=\s*(\S+)/bin/splunk\s", re.MULTILINE)
+DEFAULT_MGMT_PORT = 8089
+
+# CLI flags whose following argument carries credentials
+CREDENTIAL_FLAGS = ["-auth", "-password", "-pass4SymmKey", "-secret"]
+# .conf keys whose values carry credentials, such as pass4SymmKey or sslPassword
+CREDENTIAL_KEY_RE = re.compile(r"pass4SymmKey|password|secret|token", re.IGNORECASE)
+
+
+def check_rhel_version(module) -> str:
+    """Check if the system is RHEL 8, 9, or 10."""
+    try:
+        if os.path.exists("/etc/os-release"):
+            with open("/etc/os-release", "r") as f:
+                content = f.read()
+            if "Red Hat Enterprise Linux" not in content and "RHEL" not in content:
+                module.fail_json(msg="This module only supports RHEL systems")
+            version_match = re.search(r'VERSION_ID="?(\d+)', content)
+            if version_match:
+                major_version = version_match.group(1)
+                if major_version in ["8", "9", "10"]:
+                    return major_version
+                else:
+                    module.fail_json(
+                        msg=f"Unsupported RHEL version: {major_version}. Only RHEL 8, 9, and 10 are supported",
+                    )
+            else:
+                module.fail_json(msg="Could not determine RHEL version")
+        else:
+            module.fail_json(
+                msg="/etc/os-release not found. Cannot verify RHEL version",
+            )
+    except Exception as e:
+        module.fail_json(msg=f"Error checking RHEL version: {str(e)}")
+
+
+def parse_forward_servers(output: str) -> list:
+    """Parse the output of 'splunk list forward-server' into a list of servers."""
+    forward_servers = []
+    current_key = None
+    for line in output.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.endswith(":"):
+            current_key = line.replace(":", "")
+        elif current_key:
+            if line.lower() != "none":
+                forward_servers.append(line)
+    return forward_servers
+
+
+def output_size(output) -> int:
+    """Return the size in bytes of command output."""
+    if not output:
+        return 0
+    if isinstance(output, bytes):
+        return len(output)
+    return len(output.encode("utf-8", errors="surrogateescape"))
+
+
+def redact_command(args, no_log_values) -> list:
+    """Return the argv of a command with credentials replaced by a placeholder."""
+    if isinstance(args, (str, bytes)):
+        args = [args]
+    redacted = []
+    redact_next = False
+    for arg in args:
+        arg = str(arg)
+        if redact_next:
+            redacted.append(REDACTED)
+            redact_next = False
+            continue
+        if arg in CREDENTIAL_FLAGS:
+            redact_next = True
+        for value in no_log_values:
+            if value and value in arg:
+                arg = arg.replace(value, REDACTED)
+        redacted.append(arg)
+    return redacted
+
+
+def enable_command_trace(module, return_trace: bool, trace_path=None) -> list:
+    """Record every run_command invocation made by the module.
+
+    Each record holds the redacted argv, the start offset and duration in
+    seconds, the return code and the byte count of stdout/stderr. Records are
+    appended as JSON lines to trace_path when given, and returned in the module
+    result under command_trace when return_trace is set.
+    """
+    records = []
+    if not return_trace and not trace_path:
+        return records
+
+    trace_start = time.monotonic()
+    run_command = module.run_command
+    state = dict(write_failed=False)
+
+    def write_record(record: dict) -> None:
+        if not trace_path or state["write_failed"]:
+            return
+        try:
+            with open(trace_path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+        except Exception as e:
+            state["write_failed"] = True
+            module.warn(f"Failed to write command trace to {trace_path}: {str(e)}")
+
+    def traced_run_command(args, *run_args, **run_kwargs):
+        start = time.monotonic()
+        rc, out, err = run_command(args, *run_args, **run_kwargs)
+        record = dict(
+            argv=redact_command(args, getattr(module, "no_log_values", [])),
+            start=round(start - trace_start, 6),
+            duration=round(time.monotonic() - start, 6),
+            rc=rc,
+            stdout_bytes=output_size(out),
+            stderr_bytes=output_size(err),
+        )
+        records.append(record)
+        write_record(dict(record, pid=os.getpid()))
+        return rc, out, err
+
+    module.run_command = traced_run_command
+
+    if return_trace:
+        exit_json = module.exit_json
+        fail_json = module.fail_json
+
+        def traced_exit_json(**kwargs):
+            kwargs["command_trace"] = records
+            exit_json(**kwargs)
+
+        def traced_fail_json(msg, **kwargs):
+            kwargs["command_trace"] = records
+            fail_json(msg, **kwargs)
+
+        module.exit_json = traced_exit_json
+        module.fail_json = traced_fail_json
+
+    return records
+
+
+def write_profile(profiler, profile_dir: str, module_name: str, top: int) -> None:
+    """Write a .pstats file and a top-N cumulative time summary for a profiler."""
+    import io
+    import pstats
+
+    os.makedirs(profile_dir, exist_ok=True)
+    basename = f"{module_name}-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+    profiler.dump_stats(os.path.join(profile_dir, f"{basename}.pstats"))
+    summary = io.StringIO()
+    stats = pstats.Stats(profiler, stream=summary)
+    stats.sort_stats("cumulative").print_stats(top)
+    with open(os.path.join(profile_dir, f"{basename}.txt"), "w") as f:
+        f.write(summary.getvalue())
+
+
+def run_profiled(run_module, module_name: str) -> None:
+    """Run the module entry point, under cProfile when SPLUNK_UF_PROFILE_DIR is set.
+
+    The profile is written to the directory as <module>-<timestamp>-<pid>.pstats
+    together with a .txt summary of the top SPLUNK_UF_PROFILE_TOP functions by
+    cumulative time. Without the environment variable the entry point is called
+    directly.
+    """
+    profile_dir = os.environ.get(PROFILE_DIR_ENV)
+    if not profile_dir:
+        run_module()
+        return
+
+    import cProfile
+
+    try:
+        top = int(os.environ.get(PROFILE_TOP_ENV, PROFILE_TOP_DEFAULT))
+    except ValueError:
+        top = PROFILE_TOP_DEFAULT
+    profiler = cProfile.Profile()
+    try:
+        profiler.runcall(run_module)
+    finally:
+        # The module result has already been emitted, so a failure to write
+        # the profile must not change the outcome of the module run
+        try:
+            write_profile(profiler, profile_dir, module_name, top)
+        except Exception:
+            pass
+
+
+def parse_conf(content: str) -> dict:
+    """Parse the content of a Splunk .conf file into {stanza: {key: value}}.
+
+    Settings that appear before the first stanza header belong to the
+    [default] stanza, as they do for Splunk itself.
+    """
+    stanzas = {}
+    current = "default"
+    for line in content.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        stanza_match = STANZA_RE.match(line)
+        if stanza_match:
+            current = stanza_match.group(1).strip()
+            stanzas.setdefault(current, {})
+            continue
+        key_match = KEY_RE.match(line)
+        if key_match:
+            stanzas.setdefault(current, {})[key_match.group(1)] = key_match.group(2)
+    return stanzas
+
+
+def read_conf(path: str) -> dict:
+    """Read and parse a Splunk .conf file, an absent file has no stanzas."""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return parse_conf(f.read())
+
+
+def format_conf_value(value) -> str:
+    """Format a module option value the way Splunk writes it in .conf files."""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def conf_values_equal(current, desired: str) -> bool:
+    """Compare a .conf value with a desired value, honouring boolean synonyms."""
+    if current is None:
+        return False
+    current = current.strip()
+    if desired in ("true", "false"):
+        return CONF_BOOLEANS.get(current.lower(), current) == (desired == "true")
+    return current == desired
+
+
+def update_conf(content: str, settings: dict, separator: str = " = ") -> str:
+    """Return the content of a .conf file with the settings applied.
+
+    settings maps stanza names to {key: value}. A value of None removes the
+    key and a stanza of None removes the whole stanza. Comments, ordering and
+    unrelated settings are preserved, new keys are added at the end of their
+    stanza and new stanzas at the end of the file. Keys are written with
+    separator between key and value.
+    """
+    pending = {
+        stanza: dict(keys) for stanza, keys in settings.items() if keys is not None
+    }
+    output = []
+    current = "default"
+
+    def flush(stanza):
+        keys = pending.pop(stanza, None)
+        if not keys:
+            return
+        new_lines = [
+            f"{key}{separator}{value}"
+            for key, value in keys.items()
+            if value is not None
+        ]
+        # Keep blank lines separating the stanza from the next one at the end
+        position = len(output)
+        while position > 0 and not output[position - 1].strip():
+            position -= 1
+        output[position:position] = new_lines
+
+    for line in content.splitlines():
+        stanza_match = STANZA_RE.match(line)
+        if stanza_match:
+            flush(current)
+            current = stanza_match.group(1).strip()
+            if current in settings and settings[current] is None:
+                continue
+            output.append(line)
+            continue
+        if current in settings and settings[current] is None:
+            continue
+        key_match = KEY_RE.match(line)
+        if (
+            key_match
+            and not line.strip().startswith("#")
+            and key_match.group(1) in pending.get(current, {})
+        ):
+            value = pending[current].pop(key_match.group(1))
+            if value is not None:
+                output.append(f"{key_match.group(1)}{separator}{value}")
+            continue
+        output.append(line)
+    flush(current)
+
+    for stanza, keys in pending.items():
+        new_lines = [
+            f"{key}{separator}{value}"
+            for key, value in keys.items()
+            if value is not None
+        ]
+        if not new_lines:
+            continue
+        if output and output[-1].strip():
+            output.append("")
+        output.append(f"[{stanza}]")
+        output.extend(new_lines)
+    return "\n".join(output) + "\n" if output else ""
+
+
+def diff_conf(current: dict, settings: dict, defaults=None) -> list:
+    """Return the settings that differ from the current effective values.
+
+    current holds the parsed local file and defaults the parsed default file
+    the local values override. Each difference is returned as a dict with the
+    stanza, key, before and after values.
+    """
+    defaults = defaults or {}
+    changes = []
+    for stanza, keys in settings.items():
+        if keys is None:
+            if stanza in current:
+                changes.extend(
+                    dict(stanza=stanza, key=key, before=value, after=None)
+                    for key, value in current[stanza].items()
+                )
+            continue
+        local = current.get(stanza, {})
+        for key, value in keys.items():
+            if value is None:
+                if key in local:
+                    changes.append(
+                        dict(stanza=stanza, key=key, before=local[key], after=None)
+                    )
+                continue
+            before = local.get(key, defaults.get(stanza, {}).get(key))
+            if not conf_values_equal(before, value):
+                changes.append(dict(stanza=stanza, key=key, before=before, after=value))
+    return changes
+
+
+def parse_conf_size(value: str) -> int:
+    """Convert a .conf size such as 64MB to bytes, raising ValueError when invalid."""
+    match = SIZE_RE.match(value)
+    if not match:
+        raise ValueError(f"invalid size '{value}', expected <integer>[KB|MB|GB|TB]")
+    return int(match.group(1)) * SIZE_UNITS[(match.group(2) or "B").upper()]
+
+
+def parse_conf_duration(value: str) -> int:
+    """Convert a .conf duration such as 7d to seconds, raising ValueError when invalid."""
+    match = DURATION_RE.match(value)
+    if not match:
+        raise ValueError(f"invalid duration '{value}', expected <integer>[s|m|h|d]")
+    return int(match.group(1)) * DURATION_UNITS[match.group(2)]
+
+
+def write_file_atomic(path: str, content: str) -> None:
+    """Replace a file atomically, keeping the mode and owner of the old file.
+
+    A new file is created with mode 0600 and the owner of its directory, so it
+    stays readable by the user splunkd runs as. Missing directories are
+    created with the owner of the nearest existing one, such as the app
+    directory or $SPLUNK_HOME/etc.
+    """
+    directory = os.path.dirname(path)
+    missing = []
+    parent = directory or "."
+    while not os.path.isdir(parent):
+        missing.append(parent)
+        parent = os.path.dirname(parent)
+    owner = os.stat(parent)
+    for missing_dir in reversed(missing):
+        os.mkdir(missing_dir)
+        if os.geteuid() == 0:
+            os.chown(missing_dir, owner.st_uid, owner.st_gid)
+    if os.path.exists(path):
+        reference = os.stat(path)
+        mode = reference.st_mode & 0o7777
+    else:
+        reference = os.stat(directory)
+        mode = 0o600
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+        os.chmod(tmp_path, mode)
+        if os.geteuid() == 0:
+            os.chown(tmp_path, reference.st_uid, reference.st_gid)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def get_conf_dirs(splunk_home: str, app) -> tuple:
+    """Return the local and default directories of the managed .conf files, those of app when given."""
+    if app:
+        base_dir = os.path.join(splunk_home, "etc", "apps", app)
+    else:
+        base_dir = os.path.join(splunk_home, "etc", "system")
+    return os.path.join(base_dir, "local"), os.path.join(base_dir, "default")
+
+
+def get_conf_layer_dirs(splunk_home: str) -> list:
+    """Return the directories etc/system/local takes precedence over, highest first.
+
+    This is the global precedence of Splunk: the local directories of the
+    apps, then their default directories, both in ASCII order of the app
+    names, then etc/system/default.
+    """
+    apps_dir = os.path.join(splunk_home, "etc", "apps")
+    try:
+        apps = sorted(
+            name
+            for name in os.listdir(apps_dir)
+            if os.path.isdir(os.path.join(apps_dir, name))
+        )
+    except OSError:
+        apps = []
+    return (
+        [os.path.join(apps_dir, app, "local") for app in apps]
+        + [os.path.join(apps_dir, app, "default") for app in apps]
+        + [os.path.join(splunk_home, "etc", "system", "default")]
+    )
+
+
+def read_conf_layers(conf_dirs: list, conf_name: str) -> dict:
+    """Merge a .conf file of several directories, the first directory taking precedence."""
+    merged = {}
+    for conf_dir in reversed(conf_dirs):
+        for stanza, keys in read_conf(os.path.join(conf_dir, conf_name)).items():
+            merged.setdefault(stanza, {}).update(keys)
+    return merged
+
+
+def apply_conf_settings(
+    module, conf_dir: str, settings: dict, default_dirs=None
+) -> list:
+    """Apply {conf file: {stanza: {key: value}}} settings to the files in conf_dir.
+
+    Settings are compared with the effective values of the local file on top
+    of the matching files in default_dirs, the directories conf_dir overrides
+    listed from the highest precedence, see get_conf_layer_dirs. Only files
+    with differences are rewritten, one atomic replacement per file. Returns the list of changes,
+    each tagged with its file. Nothing is written in check mode. The .cfg
+    logging files and splunk-launch.conf are written as key=value, like
+    Splunk does.
+    """
+    changes = []
+    for conf_name, stanzas in settings.items():
+        path = os.path.join(conf_dir, conf_name)
+        try:
+            current = read_conf(path)
+            defaults = read_conf_layers(default_dirs or [], conf_name)
+        except Exception as e:
+            module.fail_json(msg=f"Failed to read {path}: {str(e)}")
+        file_changes = diff_conf(current, stanzas, defaults)
+        if not file_changes:
+            continue
+        changes.extend(dict(change, file=conf_name) for change in file_changes)
+        if module.check_mode:
+            continue
+        # Only write the keys that changed so values equal to the lower layers stay unset
+        updates = {}
+        for change in file_changes:
+            if stanzas.get(change["stanza"]) is None:
+                updates[change["stanza"]] = None
+            else:
+                updates.setdefault(change["stanza"], {})[change["key"]] = change[
+                    "after"
+                ]
+        try:
+            content = ""
+            if os.path.exists(path):
+                with open(path, "r") as f:
+                    content = f.read()
+            separator = (
+                "="
+                if conf_name.endswith(".cfg") or conf_name == "splunk-launch.conf"
+                else " = "
+            )
+            write_file_atomic(path, update_conf(content, updates, separator))
+        except Exception as e:
+            module.fail_json(msg=f"Failed to update {path}: {str(e)}")
+    return changes
+
+
+def get_deployment_server(module, splunk_home: str):
+    """Get the targetUri of the [target-broker:deploymentServer] stanza of deploymentclient.conf."""
+    deployment_conf = os.path.join(
+        splunk_home, "etc", "system", "local", "deploymentclient.conf"
+    )
+    try:
+        conf = read_conf(deployment_conf)
+    except Exception as e:
+        module.warn(f"Failed to read deploymentclient.conf: {str(e)}")
+        return None
+    return conf.get("target-broker:deploymentServer", {}).get("targetUri") or None
+
+
+def read_version_file(splunk_home: str) -> dict:
+    """Read the KEY=VALUE pairs of etc/splunk.version, empty when the file cannot be read."""
+    try:
+        with open(os.path.join(splunk_home, "etc", "splunk.version"), "r") as f:
+            return dict(re.findall(r"^(\w+)=(\S+)", f.read(), re.M))
+    except OSError:
+        return {}
+
+
+def get_mgmt_port(splunk_home: str) -> int:
+    """Get the management port of an instance from mgmtHostPort in its local web.conf."""
+    try:
+        conf = read_conf(
+            os.path.join(splunk_home, "etc", "system", "local", "web.conf")
+        )
+        return int(conf["settings"]["mgmtHostPort"].rsplit(":", 1)[-1])
+    except (OSError, KeyError, ValueError):
+        return DEFAULT_MGMT_PORT
+
+
+def get_service_splunk_homes() -> dict:
+    """Map the name of each systemd service running a Splunk instance to the $SPLUNK_HOME it runs."""
+    services = {}
+    try:
+        unit_files = sorted(os.listdir(SYSTEMD_UNIT_DIR))
+    except OSError:
+        return services
+    for unit_file in unit_files:
+        if not unit_file.endswith(".service"):
+            continue
+        try:
+            with open(os.path.join(SYSTEMD_UNIT_DIR, unit_file), "r") as f:
+                match = UNIT_SPLUNK_HOME_RE.search(f.read())
+        except OSError:
+            continue
+        if match:
+            services[unit_file[: -len(".service")]] = match.group(1)
+    return services
+
+
+def is_same_instance(path: str, splunk_home: str) -> bool:
+    """Tell whether path is splunk_home, the directory it links to, or one of its versioned directories."""
+    path = os.path.normpath(path)
+    splunk_home = os.path.normpath(splunk_home)
+    if path in (splunk_home, os.path.realpath(splunk_home)):
+        return True
+    return re.match(rf"^{re.escape(splunk_home)}-\d+(\.\d+)+$", path) is not None
+
+
+def is_credential_key(key) -> bool:
+    """Tell whether a .conf key holds a credential."""
+    return bool(key) and CREDENTIAL_KEY_RE.search(key) is not None
+
+
+def redact_conf_changes(changes: list) -> list:
+    """Return the changes with the before and after values of credential keys masked."""
+    redacted = []
+    for change in changes:
+        if is_credential_key(change["key"]):
+            change = dict(
+                change,
+                before=None if change["before"] is None else REDACTED,
+                after=None if change["after"] is None else REDACTED,
+            )
+        redacted.append(change)
+    return redacted
+
+
+def merge_conf_settings(target: dict, settings: dict) -> dict:
+    """Merge {conf file: {stanza: {key: value}}} settings into target."""
+    for conf_name, stanzas in settings.items():
+        target_stanzas = target.setdefault(conf_name, {})
+        for stanza, keys in stanzas.items():
+            if keys is None or target_stanzas.get(stanza, {}) is None:
+                target_stanzas[stanza] = keys
+            else:
+                target_stanzas.setdefault(stanza, {}).update(keys)
+    return target
+
+
+def reload_endpoints(
+    module, splunk_home: str, username: str, password: str, endpoints: list
+) -> bool:
+    """Call the _reload REST endpoints of splunkd through the CLI, False when one fails."""
+    splunk_bin = os.path.join(splunk_home, "bin", "splunk")
+    env = os.environ.copy()
+    env["SPLUNK_USERNAME"] = username
+    env["SPLUNK_PASSWORD"] = password
+    for endpoint in endpoints:
+        rc, out, err = module.run_command(
+            [splunk_bin, "_internal", "call", endpoint, "-method", "POST"],
+            environ_update=env,
+            check_rc=False,
+        )
+        if rc != 0:
+            module.warn(f"Failed to reload {endpoint}: {err}")
+            return False
+    return True
+
+
+def get_reload_endpoint(change: dict):
+    """Return the reload endpoint that applies a changed setting, None when it needs a restart."""
+    for (conf_name, prefix), endpoint in RELOAD_ENDPOINTS.items():
+        if change["file"] == conf_name and change["stanza"].startswith(prefix):
+            return endpoint
+    return None
+
+
+def read_metrics_log(path: str, offset=None) -> tuple:
+    """Read metrics.log from offset, returning the content read and the offset to continue from.
+
+    Without an offset, or when the file was rotated since, only the end of
+    the file is read.
+    """
+    try:
+        size = os.path.getsize(path)
+        tail = offset is None or offset > size
+        if tail:
+            offset = max(0, size - METRICS_TAIL_BYTES)
+        with open(path, "rb") as f:
+            f.seek(offset)
+            content = f.read(size - offset).decode("utf-8", errors="replace")
+    except OSError:
+        return "", None
+    if tail and offset:
+        # Skip the line the read started in the middle of
+        content = content.partition("\n")[2]
+    return content, size
+
+
+def read_tcpout_queues(path: str, offset=None) -> tuple:
+    """Read the latest size of each tcpout queue from metrics.log, starting at offset.
+
+    Returns the sizes in events by queue name and the offset to continue from.
+    """
+    content, offset = read_metrics_log(path, offset)
+    queues = {
+        name: int(current_size)
+        for name, current_size in METRICS_QUEUE_RE.findall(content)
+    }
+    return queues, offset
+
+
+def drain_outputs(
+    module, splunk_home: str, timeout: int, poll_interval: int = METRICS_POLL_INTERVAL
+) -> dict:
+    """Wait until the tcpout queues reported by metrics.log are empty, for at most timeout seconds.
+
+    Returns whether the queues drained, the seconds spent and the last known
+    size of each queue. A forwarder without tcpout queue samples has nothing
+    to drain.
+    """
+    path = os.path.join(splunk_home, "var", "log", "splunk", "metrics.log")
+    start = time.monotonic()
+    attempts = -(-timeout // poll_interval)
+    queues, offset = read_tcpout_queues(path)
+    attempt = 0
+    while any(queues.values()) and attempt < attempts:
+        attempt += 1
+        module.log(
+            f"Waiting for the output queues to drain (attempt {attempt}/{attempts}): {queues}"
+        )
+        time.sleep(poll_interval)
+        new_queues, offset = read_tcpout_queues(path, offset)
+        queues.update(new_queues)
+    drained = not any(queues.values())
+    if not drained:
+        module.warn(f"Output queues did not drain within {timeout} seconds: {queues}")
+    return dict(
+        drained=drained, seconds=round(time.monotonic() - start, 3), queues=queues
+    )
+
+
+def read_host_load() -> dict:
+    """Read the 1 minute load average per CPU and the CPU and I/O pressure of the host.
+
+    The pressure values are the percentage of the last 10 seconds in which
+    some tasks were stalled. A value that cannot be read is None.
+    """
+    load = dict(load_per_cpu=None, cpu_pressure=None, io_pressure=None)
+    try:
+        with open(LOADAVG_PATH, "r") as f:
+            load["load_per_cpu"] = round(
+                float(f.read().split()[0]) / (os.cpu_count() or 1), 2
+            )
+    except (OSError, ValueError, IndexError):
+        pass
+    for resource in ("cpu", "io"):
+        try:
+            with open(os.path.join(PRESSURE_DIR, resource), "r") as f:
+                match = PRESSURE_AVG10_RE.search(f.read())
+        except OSError:
+            continue
+        if match:
+            load[f"{resource}_pressure"] = float(match.group(1))
+    return load
+
+
+def get_load_excess(load: dict, limits: dict) -> list:
+    """Return the load values above their limit, as readable conditions."""
+    excess = []
+    for key, value in load.items():
+        limit = limits.get(f"max_{key}")
+        if limit is not None and value is not None and value > limit:
+            excess.append(f"{key} {value} > {limit}")
+    return excess
+
+
+def wait_for_low_load(
+    module, limits: dict, max_wait: int, poll_interval: int = LOAD_POLL_INTERVAL
+) -> dict:
+    """Wait until the host load is below the limits, for at most max_wait seconds.
+
+    Returns whether the load dropped below the limits, the seconds spent and
+    the load read last, right before the caller goes on.
+    """
+    start = time.monotonic()
+    attempts = -(-max_wait // poll_interval)
+    load = read_host_load()
+    excess = get_load_excess(load, limits)
+    attempt = 0
+    while excess and attempt < attempts:
+        attempt += 1
+        module.log(
+            f"Waiting for the host load to drop (attempt {attempt}/{attempts}): {', '.join(excess)}"
+        )
+        time.sleep(poll_interval)
+        load = read_host_load()
+        excess = get_load_excess(load, limits)
+    if excess:
+        module.warn(
+            f"Host load still above the limits after {max_wait} seconds: {', '.join(excess)}"
+        )
+    return dict(
+        below_limits=not excess, seconds=round(time.monotonic() - start, 3), load=load
+    )
+
+
+def verify_data_flow(
+    module, splunk_home: str, timeout: int, poll_interval: int = METRICS_POLL_INTERVAL
+) -> dict:
+    """Wait until metrics.log shows data sent over an indexer connection, for at most timeout seconds.
+
+    Only the samples written after the call count, so an earlier splunkd
+    process cannot verify the current one. The file is checked before the
+    first wait and no wait runs past the timeout. Returns whether data was
+    sent, the seconds spent and the KB sent by connection.
+    """
+    path = os.path.join(splunk_home, "var", "log", "splunk", "metrics.log")
+    start = time.monotonic()
+    deadline = start + timeout
+    attempts = -(-timeout // poll_interval)
+    try:
+        offset = os.path.getsize(path)
+    except OSError:
+        # splunkd creates the file with its first samples
+        offset = 0
+    connections = {}
+    attempt = 0
+    while True:
+        content, new_offset = read_metrics_log(path, offset)
+        if new_offset is not None:
+            offset = new_offset
+        for name, kb in METRICS_CONNECTION_RE.findall(content):
+            connections[name] = round(connections.get(name, 0) + float(kb), 3)
+        remaining = deadline - time.monotonic()
+        if any(connections.values()) or remaining <= 0 or attempt >= attempts:
+            break
+        attempt += 1
+        module.log(
+            f"Waiting for data to be forwarded (attempt {attempt}/{attempts}): {connections}"
+        )
+        time.sleep(min(poll_interval, remaining))
+    verified = any(connections.values())
+    return dict(
+        verified=verified,
+        seconds=round(time.monotonic() - start, 3),
+        connections=connections,
+    )
+
+
+def reload_or_restart(
+    module,
+    splunk_home: str,
+    conf_changes: list,
+    username=None,
+    password=None,
+    before_restart=None,
+) -> str:
+    """Apply changed .conf settings to splunkd with one reload pass or one restart.
+
+    The changes are reloaded through their REST endpoints when all of them
+    can be and credentials are given, otherwise or when a reload fails Splunk
+    is restarted once, after calling before_restart when given. A stopped
+    splunkd is left stopped, it reads the files on its next start. Returns
+    reload, restart or next_start.
+    """
+    splunk_bin = os.path.join(splunk_home, "bin", "splunk")
+    endpoints = []
+    for change in conf_changes:
+        endpoint = get_reload_endpoint(change)
+        if endpoint is None:
+            endpoints = None
+            break
+        if endpoint not in endpoints:
+            endpoints.append(endpoint)
+    if username and endpoints:
+        if reload_endpoints(module, splunk_home, username, password, endpoints):
+            return "reload"
+    rc, out, err = module.run_command([splunk_bin, "status"], check_rc=False)
+    if rc != 0:
+        return "next_start"
+    changed_files = sorted(set(change["file"] for change in conf_changes))
+    if before_restart is not None:
+        before_restart()
+    rc, out, err = module.run_command([splunk_bin, "restart"], check_rc=False)
+    if rc != 0:
+        module.fail_json(
+            msg=f"Failed to restart Splunk after updating {', '.join(changed_files)}: {err}"
+        )
+    return "restart"
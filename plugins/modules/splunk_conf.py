@@ -0,0 +1,354 @@
+#!/usr/bin/python
+
+# Copyright (c) Ansible Project
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = r"""
+module: splunk_conf
+
+short_description: Apply batched edits to Splunk Universal Forwarder .conf files on RHEL systems
+
+description:
+  - This module applies a list of key and stanza edits to the C(.conf) files of C($SPLUNK_HOME/etc/system/local)
+    or of an app of a Splunk Universal Forwarder installed on RHEL 8, 9, and 10 systems.
+  - All the edits are applied in one pass, with one atomic replacement per changed file, and only the keys whose
+    effective value differs are written.
+  - The effective value of C($SPLUNK_HOME/etc/system/local) follows the precedence of Splunk, over the C(local)
+    and C(default) directories of the apps and C(etc/system/default). The effective value of an app is its
+    C(local) file over its C(default) file.
+  - The changes are applied to the running splunkd with at most one reload or restart for the whole batch.
+
+version_added: "1.0.0"
+
+author:
+  - Shahar Golshani (@shahargolshani)
+
+attributes:
+  check_mode:
+    description: The module supports check mode and will report what changes would be made without actually making them.
+    support: full
+  diff_mode:
+    description: The module does not support diff mode.
+    support: none
+
+options:
+  edits:
+    description:
+      - Edits to apply, each one sets or removes one key, or removes a whole stanza.
+    type: list
+    elements: dict
+    required: true
+    suboptions:
+      file:
+        description:
+          - Name of the C(.conf) file, for example V(outputs.conf).
+        type: str
+        required: true
+      stanza:
+        description:
+          - Name of the stanza, without the brackets.
+        type: str
+        required: true
+      key:
+        description:
+          - Name of the key.
+          - Required when O(edits[].state=present). When omitted with O(edits[].state=absent), the whole stanza is removed.
+        type: str
+      value:
+        description:
+          - Value of the key. Booleans are written as V(true) and V(false).
+          - The value of a key holding a credential, whose name contains C(pass4SymmKey), C(password), C(secret)
+            or C(token), is masked in the output of the module.
+          - Required when O(edits[].state=present).
+        type: raw
+      state:
+        description:
+          - Whether the key is set, or the key or stanza is removed.
+        type: str
+        choices: ['present', 'absent']
+        default: present
+
+  app:
+    description:
+      - Edit the files of C($SPLUNK_HOME/etc/apps/<app>/local) instead of C($SPLUNK_HOME/etc/system/local).
+    type: str
+
+  splunk_home:
+    description:
+      - Installation directory of the forwarder instance to configure.
+    type: path
+    default: /opt/splunkforwarder
+
+  apply:
+    description:
+      - V(auto) reloads the changed settings when all of them have a reload endpoint and O(username) is set,
+        and restarts Splunk otherwise or when the reload fails.
+      - V(restart) always restarts Splunk when a file changed.
+      - V(none) only writes the files, the changes are applied on the next restart.
+      - A stopped splunkd is not started, it reads the files on its next start.
+    type: str
+    choices: ['auto', 'restart', 'none']
+    default: auto
+
+  username:
+    description:
+      - Username for the Splunk admin account, used to reload the changed files.
+    type: str
+
+  password:
+    description:
+      - Password for the Splunk admin account, used to reload the changed files.
+    type: str
+
+  command_trace:
+    description:
+      - Record every command run by the module and return the records in RV(command_trace).
+      - Each record contains the command argv with credentials redacted, the start offset and duration
+        in seconds, the return code and the size of stdout and stderr in bytes.
+    type: bool
+    default: false
+
+  command_trace_path:
+    description:
+      - Path of a file on the target host to append the command trace to as JSON lines.
+      - Each line holds one command record, plus the process id of the module run.
+      - Can be used independently of O(command_trace).
+    type: path
+
+notes:
+  - This module only works on RHEL 8, 9, and 10 systems.
+  - Splunk Universal Forwarder is expected to be installed in V(/opt/splunkforwarder) with RPM package,
+    or in O(splunk_home).
+  - Only the C(monitor://) and C(batch://) stanzas of C(inputs.conf) can be reloaded, the other settings need a restart.
+  - Set the E(SPLUNK_UF_PROFILE_DIR) environment variable to profile the module run with cProfile. A V(.pstats) file and a V(.txt)
+    summary of the top E(SPLUNK_UF_PROFILE_TOP) functions (default V(25)) by cumulative time are written to that directory on the target.
+"""
+
+EXAMPLES = r"""
+- name: Tune several files with a single restart
+  splunk.enterprise.splunk_conf:
+    edits:
+      - file: outputs.conf
+        stanza: tcpout
+        key: forceTimebasedAutoLB
+        value: true
+      - file: server.conf
+        stanza: queue=parsingQueue
+        key: maxSize
+        value: 10MB
+      - file: limits.conf
+        stanza: thruput
+        key: maxKBps
+        value: 0
+
+- name: Remove a stanza of an app and reload the monitor inputs
+  splunk.enterprise.splunk_conf:
+    app: legacy_inputs
+    username: admin
+    password: "changeme123"
+    edits:
+      - file: inputs.conf
+        stanza: monitor:///var/log/legacy
+        state: absent
+"""
+
+RETURN = r"""
+conf_changes:
+  description:
+    - Settings changed in the .conf files, with their effective value before and after the change.
+    - The values of the keys holding credentials, such as C(pass4SymmKey) or C(sslPassword), are masked.
+    - In check mode, the settings that would be changed.
+  type: list
+  elements: dict
+  returned: always
+  sample: [{"file": "limits.conf", "stanza": "thruput", "key": "maxKBps", "before": "256", "after": "0"}]
+
+applied_by:
+  description: How the changes were applied to the running splunkd.
+  type: str
+  returned: when changed, O(apply) is not V(none) and not in check mode
+  sample: "restart"
+  choices: ['reload', 'restart', 'next_start']
+
+conf_dir:
+  description: Directory of the edited files.
+  type: str
+  returned: always
+  sample: "/opt/splunkforwarder/etc/system/local"
+
+command_trace:
+  description: Commands run by the module, in execution order.
+  type: list
+  elements: dict
+  returned: when O(command_trace=true)
+  sample: [{"argv": ["/opt/splunkforwarder/bin/splunk", "restart"], "start": 0.012, "duration": 9.211, "rc": 0, "stdout_bytes": 420, "stderr_bytes": 0}]
+"""
+
+
+import os
+
+from ansible.module_utils.basic import AnsibleModule
+
+from ..module_utils.splunk_uf_linux_utils import (
+    apply_conf_settings,
+    check_rhel_version,
+    enable_command_trace,
+    format_conf_value,
+    get_conf_dirs,
+    get_conf_layer_dirs,
+    is_credential_key,
+    redact_conf_changes,
+    reload_or_restart,
+    run_profiled,
+)
+
+SPLUNK_HOME = "/opt/splunkforwarder"
+
+
+def build_conf_edits(module: AnsibleModule, edits: list) -> dict:
+    """Group the edits into {file: {stanza: {key: value}}} settings, None removing a key or stanza."""
+    settings = {}
+    for edit in edits:
+        conf_name = edit["file"]
+        stanza = edit["stanza"]
+        key = edit["key"]
+        if (
+            not conf_name.endswith(".conf")
+            or "/" in conf_name
+            or conf_name.startswith(".")
+        ):
+            module.fail_json(
+                msg=f"Invalid file '{conf_name}', expected the name of a .conf file"
+            )
+        if "[" in stanza or "]" in stanza:
+            module.fail_json(
+                msg=f"Invalid stanza '{stanza}', give the stanza name without brackets"
+            )
+        stanzas = settings.setdefault(conf_name, {})
+        if key is None:
+            if edit["state"] == "present":
+                module.fail_json(
+                    msg=f"key is required to set a value in [{stanza}] of {conf_name}"
+                )
+            if stanzas.get(stanza):
+                module.fail_json(
+                    msg=f"[{stanza}] of {conf_name} is both removed and edited"
+                )
+            stanzas[stanza] = None
+            continue
+        if stanza in stanzas and stanzas[stanza] is None:
+            module.fail_json(
+                msg=f"[{stanza}] of {conf_name} is both removed and edited"
+            )
+        if key in stanzas.get(stanza, {}):
+            module.fail_json(
+                msg=f"Duplicate edit of {key} in [{stanza}] of {conf_name}"
+            )
+        if edit["state"] == "present":
+            if edit["value"] is None:
+                module.fail_json(
+                    msg=f"value is required to set {key} in [{stanza}] of {conf_name}"
+                )
+            value = format_conf_value(edit["value"])
+            if is_credential_key(key):
+                # Keep the secret out of the module output and logs
+                module.no_log_values.add(value)
+            if "\n" in value:
+                module.fail_json(
+                    msg=f"The value of {key} in [{stanza}] of {conf_name} must be a single line"
+                )
+        else:
+            value = None
+        stanzas.setdefault(stanza, {})[key] = value
+    return settings
+
+
+def run_module() -> None:
+    module = AnsibleModule(
+        argument_spec=dict(
+            edits=dict(
+                type="list",
+                elements="dict",
+                required=True,
+                options=dict(
+                    file=dict(type="str", required=True),
+                    stanza=dict(type="str", required=True),
+                    key=dict(type="str", no_log=False),
+                    value=dict(type="raw"),
+                    state=dict(
+                        type="str", default="present", choices=["present", "absent"]
+                    ),
+                ),
+            ),
+            app=dict(type="str"),
+            splunk_home=dict(type="path", default=SPLUNK_HOME),
+            apply=dict(type="str", default="auto", choices=["auto", "restart", "none"]),
+            username=dict(type="str"),
+            password=dict(type="str", no_log=True),
+            command_trace=dict(type="bool", default=False),
+            command_trace_path=dict(type="path"),
+        ),
+        required_together=[
+            ("username", "password"),
+        ],
+        supports_check_mode=True,
+    )
+
+    enable_command_trace(
+        module,
+        module.params["command_trace"],
+        module.params["command_trace_path"],
+    )
+
+    splunk_home = module.params["splunk_home"]
+    app = module.params["app"]
+    apply = module.params["apply"]
+
+    if not os.path.exists(os.path.join(splunk_home, "bin", "splunk")):
+        module.fail_json(
+            msg=f"Splunk Universal Forwarder is not installed in {splunk_home}"
+        )
+    if app and (app in (".", "..") or "/" in app):
+        module.fail_json(msg=f"Invalid app name '{app}'")
+
+    rhel_version = check_rhel_version(module)
+    module.log(f"RHEL version: {rhel_version}")
+
+    local_dir, default_dir = get_conf_dirs(splunk_home, app)
+    result = dict(
+        changed=False,
+        conf_dir=local_dir,
+    )
+
+    conf_settings = build_conf_edits(module, module.params["edits"])
+    # etc/system/local overrides every app, the local files of an app only its defaults
+    default_dirs = [default_dir] if app else get_conf_layer_dirs(splunk_home)
+    conf_changes = apply_conf_settings(module, local_dir, conf_settings, default_dirs)
+    result["conf_changes"] = redact_conf_changes(conf_changes)
+
+    if conf_changes:
+        result["changed"] = True
+        if apply != "none" and not module.check_mode:
+            username = module.params["username"] if apply == "auto" else None
+            result["applied_by"] = reload_or_restart(
+                module,
+                splunk_home,
+                conf_changes,
+                username,
+                module.params["password"],
+            )
+
+    module.exit_json(**result)
+
+
+def main() -> None:
+    run_profiled(run_module, "splunk_conf")
+
+
+if __name__ == "__main__":
+    main()
@@ -17,6 +17,7 @@ description:
   - This module manages Splunk Universal Forwarder installations on RHEL 8, 9, and 10 systems with RPM package.
   - Support Universal Forwarder version 9 only. Version 10.0.0 and above is not supported.
   - Downloads the Splunk Universal Forwarder RPM and verifies its integrity using SHA512 checksums.
+  - The RPM can be staged ahead of an upgrade so the installation run does not wait for the download.
   - Supports idempotent installation and removal of the forwarder.
   - Automatically configures user credentials and starts the forwarder on first installation.
   - If the forwarder is already installed, only upgrades are allowed.
@@ -41,16 +42,32 @@ options:
     description:
       - Whether the Splunk Universal Forwarder should be installed or removed.
       - V(present) ensures the forwarder is installed and configured.
-      - V(absent) ensures the forwarder is removed from the system and all configuration is removed.
+      - V(staged) downloads and verifies the package of O(version) and records it as ready, without touching
+        the installed forwarder. A later V(present) run installs the staged package without downloading or
+        verifying it again, as long as the package and its checksum file were not changed in between.
+      - V(rolled_back) restores the version, the C(etc) directory and the fishbucket saved by the last
+        upgrade, see O(snapshot). The package of the previous version is downloaded again when it is
+        no longer in the download directory. A tarball rollback fails, before splunkd is stopped, when the
+        directory of the previous version no longer exists.
+      - V(absent) ensures the forwarder is removed from the system and all configuration is removed,
+        except the state listed in O(preserve_state).
+      - V(image_prepared) installs and configures the forwarder like V(present), then stops it and runs
+        C(splunk clone-prep-clear-config), which clears the instance GUID and server name. Boot-start stays
+        enabled, so each machine cloned from the image starts as a new instance with its own GUID. A prepared
+        image is only started again to change its O(forward_servers) when they differ from the servers of
+        C(outputs.conf).
+      - V(first_boot) only applies the host-specific settings, like O(server_name), O(mgmt_port) or
+        O(deployment_client), to the forwarder of a cloned image and starts it. Nothing is downloaded or
+        installed, and O(version) is not needed.
     type: str
-    choices: ['present', 'absent']
+    choices: ['present', 'staged', 'rolled_back', 'absent', 'image_prepared', 'first_boot']
     default: present
 
   version:
     description:
       - Version of Splunk Universal Forwarder to install (e.g., V(9.4.7)).
       - Only major version 9 is supported. Version 10.0.0 and above is not supported.
-      - Required when O(state=present).
+      - Required when O(state=present), O(state=staged) or O(state=image_prepared).
     type: str
 
   release_id:
@@ -58,13 +75,13 @@ options:
       - Release id corresponding to the Splunk Universal Forwarder version (e.g., V(2a9293b80994)).
       - The release id can be found on the Splunk download page for each version.
       - Combined with O(version) to form the RPM filename (e.g., V(9.4.7-2a9293b80994)).
-      - Required when O(state=present).
+      - Required when O(state=present), O(state=staged) or O(state=image_prepared).
     type: str
 
   username:
     description:
       - Username for the Splunk admin account.
-      - Required when O(state=present).
+      - Required when O(state=present) or O(state=image_prepared).
       - User Will be craeted on scratch installation.
       - Required to retrieve information on subsequent tasks.
     type: str
@@ -72,7 +89,7 @@ options:
   password:
     description:
       - Password for the Splunk admin account.
-      - Required when O(state=present).
+      - Required when O(state=present) or O(state=image_prepared).
       - Will be set to this value on scratch installation.
       - Required to retrieve information on subsequent tasks.
     type: str
@@ -86,6 +103,155 @@ options:
     choices: ['64-bit', 'ARM']
     default: 64-bit
 
+  install_method:
+    description:
+      - How the forwarder is installed.
+      - V(rpm) installs the RPM package into C(/opt/splunkforwarder). An upgrade stops and removes the old package
+        before the new one is installed and started.
+      - V(tarball) unpacks the official tarball into a versioned directory C(/opt/splunkforwarder-<version>) and makes
+        C(/opt/splunkforwarder) a symlink to it. An upgrade unpacks the new version next to the running one and copies
+        the C(etc) files the new version does not ship, then stops the old instance, copies its fishbucket, switches
+        the symlink atomically and starts the new version. The ingestion gap is a single restart, and the previous
+        directory is kept for rollback.
+      - An installation cannot be switched from one method to the other, remove it with O(state=absent) first.
+      - O(state=absent) detects the method of the current installation.
+    type: str
+    choices: ['rpm', 'tarball']
+    default: rpm
+
+  splunk_home:
+    description:
+      - Installation directory of the forwarder.
+      - Another directory than V(/opt/splunkforwarder) requires O(install_method=tarball), the RPM package
+        always installs into V(/opt/splunkforwarder). Several instances can run on one host, each with its own
+        O(splunk_home), O(mgmt_port) and O(service_name).
+      - The versioned directories, the snapshot and the preserved state of an instance are kept next to its
+        O(splunk_home), for example C(/data/splunkforwarder2-9.4.7) and C(/data/splunkforwarder2.snapshot).
+    type: path
+    default: /opt/splunkforwarder
+
+  service_name:
+    description:
+      - Name of the systemd service of the instance, set up by C(splunk enable boot-start) on installation.
+      - Another name than V(SplunkForwarder) is also written as C(SPLUNK_SERVER_NAME) to
+        C($SPLUNK_HOME/etc/splunk-launch.conf), so the removal of the instance finds its service.
+      - The module fails when the service already runs another instance.
+    type: str
+    default: SplunkForwarder
+
+  mgmt_port:
+    description:
+      - Management port of splunkd, written as C(mgmtHostPort) to C($SPLUNK_HOME/etc/system/local/web.conf) and
+        applied like O(output_settings).
+      - Each instance of a host needs its own port. The module fails when another instance found through its
+        systemd service already uses the port.
+    type: int
+
+  server_name:
+    description:
+      - Name of the instance, written as C(serverName) to the C([general]) stanza of C(server.conf) and as the
+        default C(host) of the events to the C([default]) stanza of C(inputs.conf), and applied like O(output_settings).
+      - Without it, a forwarder started from a prepared image names itself after the host name of the machine.
+      - Cannot be set with O(state=image_prepared), which clears the server name.
+    type: str
+
+  preserve_state:
+    description:
+      - State of the forwarder kept by O(state=absent), for a reinstall or a downgrade with V(absent) then V(present).
+      - V(fishbucket) keeps C(var/lib/splunk/fishbucket), the read checkpoints of the monitored files, so the
+        reinstalled forwarder does not send every monitored file again.
+      - V(etc) keeps the C(etc) directory, the local configuration, the admin credentials and the instance GUID.
+        The files shipped by the newly installed version take precedence over the kept ones.
+      - The state is moved to C(/opt/splunkforwarder.preserved) and moved back by the next installation before
+        the first start. A removal without O(preserve_state) deletes previously preserved state.
+    type: list
+    elements: str
+    choices: ['fishbucket', 'etc']
+    default: []
+
+  purge:
+    description:
+      - How O(state=absent) deletes the installation directory.
+      - V(sync) deletes it before the module returns, which can take minutes with large persistent queues
+        and fishbuckets.
+      - V(background) renames it to a hidden C(/opt/.splunkforwarder.purge-*) directory on the same file system,
+        which is instant, and deletes that directory in the background at idle CPU and I/O priority.
+        The installation path is free as soon as the module returns.
+      - The background deletion runs as a transient systemd service when C(systemd-run) is available, and as a
+        detached process otherwise. Directories left by a deletion interrupted by a reboot are deleted by the next
+        purge, and in the background by the next installation or upgrade.
+    type: str
+    choices: ['sync', 'background']
+    default: sync
+
+  snapshot:
+    description:
+      - Save the state of the forwarder before an upgrade so O(state=rolled_back) can restore it.
+      - With O(install_method=rpm), the stopped forwarder's C(etc) directory and C(var/lib/splunk/fishbucket)
+        are copied to C(/opt/splunkforwarder.snapshot) before the old package is removed. The copies
+        share their blocks with the originals through reflinks on file systems that support them, such as XFS and Btrfs,
+        so the snapshot is close to free there.
+      - With O(install_method=tarball), the previous version directory is kept by the upgrade and is used as
+        the snapshot, nothing is copied.
+      - Only the last upgrade is kept, a new upgrade replaces the snapshot.
+    type: bool
+    default: true
+
+  drain_timeout:
+    description:
+      - Seconds to wait for the output queues of a running forwarder to drain before splunkd is stopped for an
+        upgrade, a rollback, a removal or a restart that applies configuration changes.
+      - The queue sizes are read from the C(tcpout) queue samples of C(var/log/splunk/metrics.log), which splunkd
+        writes every 30 seconds, and are polled every 5 seconds.
+      - When the queues do not drain in time, a warning is returned and splunkd is stopped anyway.
+      - V(0) stops splunkd without waiting.
+    type: int
+    default: 0
+
+  load_limits:
+    description:
+      - Delay the stop of a running forwarder for an upgrade, a rollback, a removal or a configuration restart
+        until the host load is below these limits, so the restarted forwarder does not catch up on its backlog
+        during the peak of the applications on the host.
+      - The load is read every 10 seconds. A limit whose source does not exist on the host is ignored.
+      - After O(load_limits.max_wait) seconds, a warning is returned and the forwarder is stopped anyway.
+      - The wait happens before the drain of the output queues set by O(drain_timeout).
+    type: dict
+    suboptions:
+      max_load_per_cpu:
+        description:
+          - Limit of the 1 minute load average of C(/proc/loadavg), divided by the number of CPUs.
+        type: float
+      max_cpu_pressure:
+        description:
+          - Limit of the C(some avg10) value of C(/proc/pressure/cpu), the percentage of the last 10 seconds
+            in which some tasks waited for a CPU.
+        type: float
+      max_io_pressure:
+        description:
+          - Limit of the C(some avg10) value of C(/proc/pressure/io), the percentage of the last 10 seconds
+            in which some tasks waited for I/O.
+        type: float
+      max_wait:
+        description:
+          - Maximum number of seconds to wait for the load to drop.
+        type: int
+        default: 600
+
+  verify_timeout:
+    description:
+      - Seconds to wait, after an installation, an upgrade, a rollback or a configuration change, for the forwarder
+        to send data to an indexer. The task fails when no data was sent in time.
+      - Data flow is verified by a C(tcpout_connections) sample of C(var/log/splunk/metrics.log), written by
+        splunkd every 30 seconds, that shows data sent over an indexer connection after the change. The file is
+        checked right away, then every 5 seconds until the timeout.
+      - Set it to at least V(60) so two samples can be written. In a rolling upgrade, the failed host stops the play
+        before the next batch of hosts is changed.
+      - Not done in check mode or when the changes are left for the next start of a stopped splunkd.
+      - V(0) does not verify the data flow.
+    type: int
+    default: 0
+
   forward_servers:
     description:
       - List of Splunk Enterprise servers to forward data to.
@@ -93,6 +259,7 @@ options:
       - The default Splunk receiving port is typically V(9997).
       - When specified, configures the forwarder to send data to these servers, Sets the forward-servers exactly to this list.
       - When list is empty, The current configured forward-servers will be removed, and the configuration will be empty.
+      - Mutually exclusive with O(output_groups) and O(indexer_discovery).
     type: list
     elements: str
 
@@ -102,17 +269,278 @@ options:
       - Must be in V(<host>:<port>) format (e.g., V(deployment-server.example.com:8089)).
       - The default Splunk deployment server port is V(8089).
       - When specified, configures the forwarder to poll this deployment server for apps and configurations.
-      - When set to an empty string, removes the deployment server configuration and restarts the forwarder service.
+      - When set to an empty string, removes the deployment server configuration.
+      - Written to C($SPLUNK_HOME/etc/system/local/deploymentclient.conf) and applied like O(output_settings),
+        together with the other changed settings of the run.
+    type: str
+
+  deployment_client:
+    description:
+      - Tuning of the C([deployment-client]) stanza in C($SPLUNK_HOME/etc/system/local/deploymentclient.conf).
+      - Only the settings that are specified are managed, the others keep their current value.
+      - Applied like O(output_settings), Splunk is restarted only when a setting changes.
+      - Cannot be set when O(deployment_server) is an empty string.
+    type: dict
+    suboptions:
+      phone_home_interval:
+        description:
+          - Seconds between two phone homes of the client to the deployment server, C(phoneHomeIntervalInSecs).
+        type: int
+      handshake_retry_interval:
+        description:
+          - Seconds between two handshake attempts until the deployment server answers, C(handshakeRetryIntervalInSecs).
+        type: int
+      client_name:
+        description:
+          - Name the client reports to the deployment server for server class matching, C(clientName).
+        type: str
+      splay:
+        description:
+          - Spread the phone homes and handshakes of many clients over time after a mass restart.
+          - Adds to O(deployment_client.phone_home_interval) and O(deployment_client.handshake_retry_interval)
+            a number of seconds between V(0) and this value, derived from a hash of the host name.
+          - The offset is the same on every run for a given host, so the configuration stays idempotent.
+          - Requires O(deployment_client.phone_home_interval) or O(deployment_client.handshake_retry_interval).
+        type: int
+
+  output_settings:
+    description:
+      - Tuning of the global C([tcpout]) stanza in C($SPLUNK_HOME/etc/system/local/outputs.conf).
+      - Only the settings that are specified are managed, the others keep their current value.
+      - Settings are compared with the effective value of C(etc/system/local) over the C(local) and C(default)
+        directories of the apps and C(etc/system/default), and only the settings that differ are written.
+      - When the forwarder is already installed and a setting changes, Splunk is restarted once to apply all of them.
+        On installation and upgrade the settings are written before the first start and no extra restart is needed.
+    type: dict
+    suboptions:
+      max_queue_size:
+        description:
+          - Maximum size of the output queue, C(maxQueueSize).
+          - Either a number of events (e.g., V(20000)), a size in V(KB), V(MB) or V(GB) (e.g., V(64MB)) or V(auto).
+        type: str
+      auto_lb_frequency:
+        description:
+          - Seconds between switches to another indexer of the group, C(autoLBFrequency).
+        type: int
+      auto_lb_volume:
+        description:
+          - Bytes sent to an indexer before switching to another one, C(autoLBVolume).
+          - V(0) disables volume based load balancing.
+        type: int
+      compressed:
+        description:
+          - Compress the data sent to the indexers, C(compressed).
+          - The receiving port of the indexers must be configured with the same setting.
+        type: bool
+      use_ack:
+        description:
+          - Wait for indexer acknowledgment before releasing data from the output queue, C(useACK).
+        type: bool
+      connection_timeout:
+        description:
+          - Seconds to wait for a connection to an indexer, C(connectionTimeout).
+        type: int
+      write_timeout:
+        description:
+          - Seconds to wait for a write to an indexer to complete, C(writeTimeout).
+        type: int
+      dns_resolution_interval:
+        description:
+          - Seconds between DNS resolutions of the indexer host names, C(dnsResolutionInterval).
+        type: int
+
+  output_groups:
+    description:
+      - Named target groups of indexers, one C([tcpout:<name>]) stanza each in
+        C($SPLUNK_HOME/etc/system/local/outputs.conf).
+      - The list is the complete set of target groups, C([tcpout:<name>]) stanzas of other groups are removed,
+        including the C(default-autolb-group) created by O(forward_servers).
+      - The groups with O(output_groups[].default=true) are set as C(defaultGroup) of the C([tcpout]) stanza.
+        The other groups only receive the data routed to them with C(_TCP_ROUTING).
+      - All the groups are written in one configuration update and applied with a single restart, like O(output_settings).
+      - An empty list removes all the target groups.
+      - Mutually exclusive with O(forward_servers).
+    type: list
+    elements: dict
+    suboptions:
+      name:
+        description:
+          - Name of the target group.
+          - May contain letters, digits, V(_), V(-) and V(.).
+        type: str
+        required: true
+      servers:
+        description:
+          - Indexers of the group, in V(<host>:<port>) format.
+          - Mutually exclusive with O(output_groups[].indexer_discovery), one of them is required.
+        type: list
+        elements: str
+      indexer_discovery:
+        description:
+          - Send to the indexers discovered through the cluster manager of O(indexer_discovery)
+            instead of a static list of servers.
+        type: bool
+      default:
+        description:
+          - Send the data that is not explicitly routed to this group.
+        type: bool
+        default: true
+      max_queue_size:
+        description:
+          - Maximum size of the output queue of the group, C(maxQueueSize).
+        type: str
+      auto_lb_frequency:
+        description:
+          - Seconds between switches to another indexer of the group, C(autoLBFrequency).
+        type: int
+      auto_lb_volume:
+        description:
+          - Bytes sent to an indexer before switching to another one, C(autoLBVolume).
+        type: int
+      compressed:
+        description:
+          - Compress the data sent to the indexers of the group, C(compressed).
+        type: bool
+      use_ack:
+        description:
+          - Wait for indexer acknowledgment, C(useACK).
+        type: bool
+      connection_timeout:
+        description:
+          - Seconds to wait for a connection to an indexer, C(connectionTimeout).
+        type: int
+      write_timeout:
+        description:
+          - Seconds to wait for a write to an indexer to complete, C(writeTimeout).
+        type: int
+      dns_resolution_interval:
+        description:
+          - Seconds between DNS resolutions of the indexer host names, C(dnsResolutionInterval).
+        type: int
+
+  indexer_discovery:
+    description:
+      - Discover the indexers from the cluster manager instead of configuring static servers,
+        with an C([indexer_discovery:<name>]) stanza in C($SPLUNK_HOME/etc/system/local/outputs.conf).
+      - The cluster manager returns the peers of the cluster, weighted by their free disk space
+        when indexer discovery weighting is enabled on the manager.
+      - When O(output_groups) is not set, a C([tcpout:<name>]) group using the discovery is set as the only
+        target group and C(defaultGroup), like a single entry of O(output_groups).
+      - Other C([indexer_discovery:<name>]) stanzas are removed.
+      - Applied like O(output_settings), Splunk is restarted only when a setting changes.
+      - Mutually exclusive with O(forward_servers).
+    type: dict
+    suboptions:
+      name:
+        description:
+          - Name of the indexer discovery stanza and of the target group created for it.
+        type: str
+        default: cluster_manager
+      manager_uri:
+        description:
+          - URI of the cluster manager, for example V(https://cm.example.com:8089).
+        type: str
+        required: true
+      pass4symmkey:
+        description:
+          - Security key shared with the cluster manager, the C(pass4SymmKey) of its C([indexer_discovery]) stanza.
+          - Splunk encrypts the key on the next start. The stored key is decrypted with C(splunk show-decrypted)
+            to compare it, so an unchanged key does not cause a restart.
+        type: str
+        required: true
+
+  input_queues:
+    description:
+      - In-memory and persistent queue sizes of network and scripted inputs, in the C([<input>]) stanzas of
+        C($SPLUNK_HOME/etc/system/local/inputs.conf).
+      - The settings are layered on the input definition, which may live in an app. A warning is returned when no
+        C(inputs.conf) of C(etc/system) or C(etc/apps) defines the input, because the stanza then creates a new input.
+      - The sum of the persistent queue sizes must fit in the free space of the file system of C($SPLUNK_HOME/var),
+        where Splunk stores the persistent queues, otherwise the module fails before changing anything.
+      - Use O(output_settings.max_queue_size) for the output side queue.
+      - Applied like O(output_settings), Splunk is restarted only when a setting changes.
+    type: list
+    elements: dict
+    suboptions:
+      input:
+        description:
+          - Input stanza, for example V(tcp://9514), V(udp://514), V(fifo:///var/run/app.fifo),
+            V(script://./bin/poll.sh) or V(http://token_name).
+          - File monitor inputs do not support persistent queues.
+        type: str
+        required: true
+      queue_size:
+        description:
+          - Size of the in-memory input queue, C(queueSize), for example V(10MB).
+        type: str
+      persistent_queue_size:
+        description:
+          - Size of the persistent queue on disk that absorbs the data when the in-memory queue is full,
+            C(persistentQueueSize), for example V(5GB).
+          - V(0) disables the persistent queue.
+        type: str
+
+  internal_logging:
+    description:
+      - Profile of the internal logs of the forwarder, trading visibility on the forwarder for indexer license and network load.
+      - V(minimal) only forwards the C(_audit) index with the C(forwardedindex.2.whitelist) filter of the C([tcpout]) stanza
+        of C(outputs.conf). The C(_internal), C(_introspection), C(_metrics) and C(_telemetry) logs stay on the forwarder,
+        so the forwarder is no longer visible in the monitoring console. It also logs warnings and errors only,
+        and keeps 2 rotated C(splunkd.log) files of 10MB, in C($SPLUNK_HOME/etc/log-local.cfg).
+      - V(default) removes the overrides of the other profiles and restores the Splunk defaults.
+      - V(debug) forwards all internal indexes by disabling the index filters with C(forwardedindex.filter.disable),
+        and logs the output, file monitor and deployment client components at debug level with 10 rotated
+        C(splunkd.log) files of 100MB.
+      - The C(forwardedindex.*) filter keys of the C([tcpout]) stanza are managed by every profile, a value set
+        outside of the profile is removed.
+      - Applied like O(output_settings), Splunk is restarted only when a setting changes.
     type: str
+    choices: ['minimal', 'default', 'debug']
+
+  thruput_max_kbps:
+    description:
+      - Maximum throughput of the forwarder in kilobytes per second, C(maxKBps) of the C([thruput]) stanza
+        in C($SPLUNK_HOME/etc/system/local/limits.conf).
+      - The universal forwarder default is V(256). V(0) removes the limit.
+      - Applied like O(output_settings), Splunk is restarted only when the value changes.
+    type: int
+
+  parallel_ingestion_pipelines:
+    description:
+      - Number of ingestion pipelines, C(parallelIngestionPipelines) of the C([general]) stanza
+        in C($SPLUNK_HOME/etc/system/local/server.conf).
+      - Each pipeline uses one additional CPU core and its own output queue.
+      - Applied like O(output_settings), Splunk is restarted only when the value changes.
+    type: int
+
+  command_trace:
+    description:
+      - Record every command run by the module and return the records in RV(command_trace).
+      - Each record contains the command argv with credentials redacted, the start offset and duration
+        in seconds, the return code and the size of stdout and stderr in bytes.
+    type: bool
+    default: false
+
+  command_trace_path:
+    description:
+      - Path of a file on the target host to append the command trace to as JSON lines.
+      - Each line holds one command record, plus the process id of the module run.
+      - Can be used independently of O(command_trace).
+    type: path
 
 notes:
   - This module only works on RHEL 8, 9, and 10 systems.
   - Only Splunk Universal Forwarder major version 9 is supported. Version 10.0.0 and above is not supported.
   - The RPM package will be downloaded to V(/opt) from the official Splunk download site.
-  - Splunk Universal Forwarder will be installed to V(/opt/splunkforwarder).
+  - Splunk Universal Forwarder will be installed to V(/opt/splunkforwarder), or to O(splunk_home) with
+    O(install_method=tarball).
   - Requires root privileges to install/remove packages and start services.
   - The RPM filename is constructed as V(splunkforwarder-{version}-{release_id}.{cpu_arch}.rpm).
+  - The tarball filename is constructed as V(splunkforwarder-{version}-{release_id}-linux-amd64.tgz), or
+    V(splunkforwarder-{version}-{release_id}-Linux-armv8.tgz) for O(cpu=ARM).
   - When upgrading from a previous version, $SPLUNK_HOME/etc & $SPLUNK_HOME/var directories will be preserved to save previous data.
+  - Set the E(SPLUNK_UF_PROFILE_DIR) environment variable to profile the module run with cProfile. A V(.pstats) file and a V(.txt)
+    summary of the top E(SPLUNK_UF_PROFILE_TOP) functions (default V(25)) by cumulative time are written to that directory on the target.
 """
 
 EXAMPLES = r"""
@@ -163,6 +591,148 @@ EXAMPLES = r"""
     password: "changeme123"
     deployment_server: ""
 
+- name: Phone home every 10 minutes, splayed over 5 minutes across the fleet
+  splunk.enterprise.splunk_universal_forwarder_linux:
+    state: present
+    version: "9.4.7"
+    release_id: "2a9293b80994"
+    username: admin
+    password: "changeme123"
+    deployment_server: "deployment-server.example.com:8089"
+    deployment_client:
+      phone_home_interval: 600
+      handshake_retry_interval: 60
+      splay: 300
+
+- name: Tune the output queue and load balancing of a high-volume forwarder
+  splunk.enterprise.splunk_universal_forwarder_linux:
+    state: present
+    version: "9.4.7"
+    release_id: "2a9293b80994"
+    username: admin
+    password: "changeme123"
+    output_settings:
+      max_queue_size: 64MB
+      auto_lb_frequency: 30
+      auto_lb_volume: 1048576
+      use_ack: true
+
+- name: Send security and application data to separate indexer clusters
+  splunk.enterprise.splunk_universal_forwarder_linux:
+    state: present
+    version: "9.4.7"
+    release_id: "2a9293b80994"
+    username: admin
+    password: "changeme123"
+    output_groups:
+      - name: app_cluster
+        servers:
+          - app-idx1.example.com:9997
+          - app-idx2.example.com:9997
+      - name: security_cluster
+        servers:
+          - sec-idx1.example.com:9997
+          - sec-idx2.example.com:9997
+        default: false
+        use_ack: true
+
+- name: Discover the indexers from the cluster manager
+  splunk.enterprise.splunk_universal_forwarder_linux:
+    state: present
+    version: "9.4.7"
+    release_id: "2a9293b80994"
+    username: admin
+    password: "changeme123"
+    indexer_discovery:
+      manager_uri: https://cm.example.com:8089
+      pass4symmkey: "{{ indexer_discovery_key }}"
+
+- name: Buffer syslog bursts on disk while the indexers are slow
+  splunk.enterprise.splunk_universal_forwarder_linux:
+    state: present
+    version: "9.4.7"
+    release_id: "2a9293b80994"
+    username: admin
+    password: "changeme123"
+    output_settings:
+      max_queue_size: 64MB
+    input_queues:
+      - input: udp://514
+        queue_size: 10MB
+        persistent_queue_size: 5GB
+
+- name: Keep the internal logs of the forwarder on the host
+  splunk.enterprise.splunk_universal_forwarder_linux:
+    state: present
+    version: "9.4.7"
+    release_id: "2a9293b80994"
+    username: admin
+    password: "changeme123"
+    internal_logging: minimal
+
+- name: Raise the throughput of a busy log host
+  splunk.enterprise.splunk_universal_forwarder_linux:
+    state: present
+    version: "9.4.7"
+    release_id: "2a9293b80994"
+    username: admin
+    password: "changeme123"
+    thruput_max_kbps: 0
+    parallel_ingestion_pipelines: 2
+
+- name: Download and verify the next release ahead of the maintenance window
+  splunk.enterprise.splunk_universal_forwarder_linux:
+    state: staged
+    version: "9.4.7"
+    release_id: "2a9293b80994"
+
+- name: Upgrade side by side from the tarball with a single restart
+  splunk.enterprise.splunk_universal_forwarder_linux:
+    state: present
+    install_method: tarball
+    version: "9.4.7"
+    release_id: "2a9293b80994"
+    username: admin
+    password: "changeme123"
+
+- name: Run a second instance next to the default one, from the tarball
+  splunk.enterprise.splunk_universal_forwarder_linux:
+    state: present
+    install_method: tarball
+    splunk_home: /opt/splunkforwarder2
+    service_name: SplunkForwarder2
+    mgmt_port: 8090
+    version: "9.4.7"
+    release_id: "2a9293b80994"
+    username: admin
+    password: "changeme123"
+    forward_servers:
+      - "splunk-indexer.example.com:9997"
+
+- name: Downgrade without re-reading the monitored files
+  splunk.enterprise.splunk_universal_forwarder_linux:
+    state: absent
+    preserve_state:
+      - fishbucket
+      - etc
+
+- name: Install the older version, the preserved state is restored before the first start
+  splunk.enterprise.splunk_universal_forwarder_linux:
+    state: present
+    version: "9.4.6"
+    release_id: "60284236e579"
+    username: admin
+    password: "changeme123"
+
+- name: Remove Splunk Universal Forwarder without waiting for the files to be deleted
+  splunk.enterprise.splunk_universal_forwarder_linux:
+    state: absent
+    purge: background
+
+- name: Roll back the last upgrade
+  splunk.enterprise.splunk_universal_forwarder_linux:
+    state: rolled_back
+
 - name: Remove Splunk Universal Forwarder
   splunk.enterprise.splunk_universal_forwarder_linux:
     state: absent
@@ -175,6 +745,33 @@ EXAMPLES = r"""
     username: admin
     password: "changeme123"
   check_mode: true
+
+- name: Prepare the forwarder of a golden image, cloned machines start as new instances
+  splunk.enterprise.splunk_universal_forwarder_linux:
+    state: image_prepared
+    version: "9.4.7"
+    release_id: "2a9293b80994"
+    username: admin
+    password: "changeme123"
+    forward_servers:
+      - "indexer1.example.com:9997"
+
+- name: Set the host-specific settings and start the forwarder on the first boot of a clone
+  splunk.enterprise.splunk_universal_forwarder_linux:
+    state: first_boot
+    server_name: "{{ inventory_hostname }}"
+    deployment_client:
+      client_name: "{{ inventory_hostname }}"
+
+- name: Profile the module run on a slow host
+  splunk.enterprise.splunk_universal_forwarder_linux:
+    state: present
+    version: "9.4.7"
+    release_id: "2a9293b80994"
+    username: admin
+    password: "changeme123"
+  environment:
+    SPLUNK_UF_PROFILE_DIR: /var/tmp/splunk_uf_profile
 """
 
 RETURN = r"""
@@ -187,25 +784,118 @@ msg:
 version:
   description: Version of Splunk Universal Forwarder that was installed.
   type: str
-  returned: when state is present
+  returned: when state is present, staged, rolled_back or image_prepared
   sample: "10.0.1"
 
 release_id:
   description: Release id corresponding to the version.
   type: str
-  returned: when state is present
+  returned: when state is present, staged, rolled_back or image_prepared
   sample: "c486717c322b"
 
 rpm_path:
   description: Path where the RPM file was downloaded.
   type: str
-  returned: when state is present
+  returned: when state is present or staged and O(install_method=rpm)
   sample: "/opt/splunkforwarder-10.0.1-c486717c322b.x86_64.rpm"
 
+tarball_path:
+  description: Path where the tarball was downloaded.
+  type: str
+  returned: when state is present or staged and O(install_method=tarball)
+  sample: "/opt/splunkforwarder-9.4.7-2a9293b80994-linux-amd64.tgz"
+
+install_dir:
+  description: Versioned directory the C(/opt/splunkforwarder) symlink points to.
+  type: str
+  returned: when state is present and O(install_method=tarball)
+  sample: "/opt/splunkforwarder-9.4.7"
+
+preserved_dir:
+  description: Directory the state listed in O(preserve_state) was moved to.
+  type: str
+  returned: when state is absent and O(preserve_state) is set
+  sample: "/opt/splunkforwarder.preserved"
+
+restored_state:
+  description: State preserved by a previous removal and restored by the installation.
+  type: list
+  elements: str
+  returned: when state is present and preserved state was restored
+  sample: ["fishbucket", "etc"]
+
+snapshot_dir:
+  description: Directory of the snapshot saved before the upgrade.
+  type: str
+  returned: when the forwarder was upgraded with O(snapshot=true)
+  sample: "/opt/splunkforwarder.snapshot"
+
+drain:
+  description: Wait for the output queues to drain before splunkd was stopped.
+  type: dict
+  returned: when O(drain_timeout) is set and a running forwarder was stopped
+  contains:
+    drained:
+      description: Whether all the output queues were empty before splunkd was stopped.
+      type: bool
+      sample: true
+    seconds:
+      description: Seconds spent waiting for the queues.
+      type: float
+      sample: 10.012
+    queues:
+      description: Last known size of each output queue, in events.
+      type: dict
+      sample: {"tcpout_primary_indexers": 0}
+
+load_wait:
+  description: Wait for the host load to drop before the forwarder was stopped.
+  type: dict
+  returned: when O(load_limits) is set and a running forwarder was stopped
+  contains:
+    below_limits:
+      description: Whether the load was below the limits when the forwarder was stopped.
+      type: bool
+      sample: true
+    seconds:
+      description: Seconds spent waiting for the load to drop.
+      type: float
+      sample: 40.018
+    load:
+      description:
+        - Load of the host when the forwarder was stopped, C(null) for a value the host does not provide.
+        - The pressure values are percentages.
+      type: dict
+      sample: {"load_per_cpu": 0.42, "cpu_pressure": 1.5, "io_pressure": 0.3}
+
+data_flow:
+  description: Verification that the forwarder sends data to an indexer after the change.
+  type: dict
+  returned: when O(verify_timeout) is set and the forwarder changed, also on failure
+  contains:
+    verified:
+      description: Whether data was sent over an indexer connection.
+      type: bool
+      sample: true
+    seconds:
+      description: Seconds spent waiting for the data to be sent.
+      type: float
+      sample: 30.004
+    connections:
+      description: KB sent by indexer connection, named C(<output group>:<ip>:<port>:<n>).
+      type: dict
+      sample: {"default-autolb-group:10.0.0.1:9997:0": 44.4}
+
+previous_install_dir:
+  description: Directory of the version replaced by an upgrade, kept in place for rollback.
+  type: str
+  returned: when the forwarder was upgraded with O(install_method=tarball)
+  sample: "/opt/splunkforwarder-9.4.6"
+
 cpu_arch:
   description: CPU architecture used for the installation.
   type: str
-  returned: when state is present
+  returned: when state is present or staged
   sample: "x86_64"
 
 splunk_home:
@@ -219,19 +909,168 @@ changed:
   type: bool
   returned: always
   sample: true
+
+conf_changes:
+  description:
+    - Settings changed in the C(etc/system/local) .conf files, with their effective value before and after the change.
+    - In check mode, the settings that would be changed.
+    - The values of credential keys, such as C(pass4SymmKey), are masked.
+  type: list
+  elements: dict
+  returned: when configuration settings are managed
+  sample: [{"file": "limits.conf", "stanza": "thruput", "key": "maxKBps", "before": "256", "after": "0"}]
+
+applied_by:
+  description:
+    - How the configuration changes of an installed forwarder were applied to the running splunkd.
+    - All the changes of a run are applied with at most one restart.
+  type: str
+  returned: when the forwarder is already installed, a setting changed and not in check mode
+  sample: "restart"
+  choices: ['reload', 'restart', 'next_start']
+
+command_trace:
+  description: Commands run by the module, in execution order.
+  type: list
+  elements: dict
+  returned: when O(command_trace=true)
+  sample: [{"argv": ["rpm", "-qa", "splunkforwarder"], "start": 0.012, "duration": 0.241, "rc": 0, "stdout_bytes": 36, "stderr_bytes": 0}]
 """
 
 
 import hashlib
+import json
 import os
 import re
 import shutil
+import socket
+import subprocess
+import tempfile
 import time
 from pathlib import Path
+from urllib.error import HTTPError
 
 from ansible.module_utils.basic import AnsibleModule
 from ansible.module_utils.urls import open_url
 
+from ..module_utils.splunk_uf_linux_utils import (
+    apply_conf_settings,
+    drain_outputs,
+    enable_command_trace,
+    format_conf_value,
+    get_conf_layer_dirs,
+    get_mgmt_port,
+    get_service_splunk_homes,
+    is_same_instance,
+    merge_conf_settings,
+    parse_conf_size,
+    parse_forward_servers,
+    read_conf,
+    read_conf_layers,
+    read_version_file,
+    redact_conf_changes,
+    reload_or_restart,
+    run_profiled,
+    verify_data_flow,
+    wait_for_low_load,
+    write_file_atomic,
+)
+
+SPLUNK_HOME = "/opt/splunkforwarder"
+SERVICE_NAME = "SplunkForwarder"
+DOWNLOAD_DIR = "/opt"
+DOWNLOAD_BASE_URL = "https://download.splunk.com/products/universalforwarder/releases"
+# Read size used when hashing downloaded packages
+CHECKSUM_CHUNK_SIZE = 1024 * 1024
+# Write size and attempts used when downloading packages
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_RETRIES = 3
+# Suffix of the file recording that a downloaded package passed its checksum
+STAGED_MARKER_SUFFIX = ".staged"
+# Platform part of the tarball filename for each CPU architecture
+TARBALL_PLATFORMS = {
+    "x86_64": "linux-amd64",
+    "aarch64": "Linux-armv8",
+}
+# Directory of the file tracking state of splunkd, relative to $SPLUNK_HOME
+FISHBUCKET_DIR = os.path.join("var", "lib", "splunk", "fishbucket")
+# Suffix of the directory holding the pre-upgrade snapshot, next to $SPLUNK_HOME
+SNAPSHOT_SUFFIX = ".snapshot"
+SNAPSHOT_FILE = "snapshot.json"
+# Suffix of the directory holding the state kept by a removal, and where each item lives under $SPLUNK_HOME
+PRESERVED_SUFFIX = ".preserved"
+PRESERVED_STATE_DIRS = {
+    "fishbucket": FISHBUCKET_DIR,
+    "etc": "etc",
+}
+# Part of the name of the hidden directories a background purge deletes, next to $SPLUNK_HOME
+TOMBSTONE_INFIX = ".purge-"
+
+# Map of the output_settings suboptions to the [tcpout] keys of outputs.conf
+OUTPUT_SETTINGS_KEYS = {
+    "max_queue_size": "maxQueueSize",
+    "auto_lb_frequency": "autoLBFrequency",
+    "auto_lb_volume": "autoLBVolume",
+    "compressed": "compressed",
+    "use_ack": "useACK",
+    "connection_timeout": "connectionTimeout",
+    "write_timeout": "writeTimeout",
+    "dns_resolution_interval": "dnsResolutionInterval",
+}
+# Map of the deployment_client interval suboptions to the [deployment-client] keys
+DEPLOYMENT_CLIENT_INTERVAL_KEYS = {
+    "phone_home_interval": "phoneHomeIntervalInSecs",
+    "handshake_retry_interval": "handshakeRetryIntervalInSecs",
+}
+OUTPUT_GROUP_NAME_RE = re.compile(r"^[A-Za-z0-9_.-]+$")
+# Logging and launch files that live in $SPLUNK_HOME/etc instead of etc/system/local
+ETC_CONF_FILES = ["log-local.cfg", "splunk-launch.conf"]
+# Keys of the [tcpout] stanza that filter the forwarded internal indexes
+FORWARDED_INDEX_KEYS = [
+    "forwardedindex.0.whitelist",
+    "forwardedindex.1.blacklist",
+    "forwardedindex.2.whitelist",
+    "forwardedindex.filter.disable",
+]
+LOG_LOCAL_KEYS = [
+    "rootCategory",
+    "category.TcpOutputProc",
+    "category.TailingProcessor",
+    "category.DeploymentClient",
+    "appender.A1.maxFileSize",
+    "appender.A1.maxBackupIndex",
+]
+# Settings of each internal_logging profile, unset keys fall back to the Splunk defaults
+INTERNAL_LOGGING_PROFILES = {
+    "minimal": {
+        "outputs.conf": {"tcpout": {"forwardedindex.2.whitelist": "(_audit)"}},
+        "log-local.cfg": {
+            "splunkd": {
+                "rootCategory": "WARN,A1",
+                "appender.A1.maxFileSize": "10000000",
+                "appender.A1.maxBackupIndex": "2",
+            },
+        },
+    },
+    "default": {},
+    "debug": {
+        "outputs.conf": {"tcpout": {"forwardedindex.filter.disable": "true"}},
+        "log-local.cfg": {
+            "splunkd": {
+                "category.TcpOutputProc": "DEBUG",
+                "category.TailingProcessor": "DEBUG",
+                "category.DeploymentClient": "DEBUG",
+                "appender.A1.maxFileSize": "100000000",
+                "appender.A1.maxBackupIndex": "10",
+            },
+        },
+    },
+}
+# Input types that support persistent queues
+QUEUE_INPUT_TYPES = ["tcp", "udp", "fifo", "script", "http"]
+# Prefix of the values Splunk encrypts with splunk.secret
+ENCRYPTED_VALUE_PREFIX = "$7$"
+
 
 def check_rhel_version(module: AnsibleModule) -> str:
     """Check if the system is RHEL 8, 9, or 10."""
@@ -281,6 +1120,56 @@ def get_installed_version(module: AnsibleModule):
         return None
 
 
+def get_linked_version(splunk_home: str):
+    """Get the version of the tarball installation splunk_home links to."""
+    if not os.path.islink(splunk_home):
+        return None
+    return read_version_file(splunk_home).get("VERSION")
+
+
+def get_installed_release(module: AnsibleModule) -> tuple:
+    """Get the release id and architecture of the installed RPM."""
+    rc, out, err = module.run_command(
+        ["rpm", "-q", "--queryformat", "%{RELEASE} %{ARCH}", "splunkforwarder"],
+        check_rc=False,
+    )
+    if rc != 0 or len(out.split()) != 2:
+        module.fail_json(
+            msg=f"Failed to query the installed splunkforwarder package: {err}"
+        )
+    release_id, cpu_arch = out.split()
+    return release_id, cpu_arch
+
+
+def get_current_version(module: AnsibleModule, splunk_home: str, install_method: str):
+    """Get the installed version, failing when the installation uses the other install method."""
+    if os.path.islink(splunk_home):
+        if install_method != "tarball":
+            module.fail_json(
+                msg=f"{splunk_home} is a tarball installation, use install_method=tarball or remove it first",
+            )
+        return get_linked_version(splunk_home)
+    if install_method == "tarball":
+        # The RPM only ever installs into the default location
+        if splunk_home == SPLUNK_HOME and is_splunk_installed(module):
+            module.fail_json(
+                msg=f"{splunk_home} is an RPM installation, use install_method=rpm or remove it first",
+            )
+        return None
+    return get_installed_version(module)
+
+
+def get_package_filename(
+    version: str, release_id: str, cpu_arch: str, install_method: str
+) -> str:
+    """Return the filename of the RPM or tarball of a release."""
+    if install_method == "tarball":
+        return (
+            f"splunkforwarder-{version}-{release_id}-{TARBALL_PLATFORMS[cpu_arch]}.tgz"
+        )
+    return f"splunkforwarder-{version}-{release_id}.{cpu_arch}.rpm"
+
+
 def check_if_downgrade(version_a, version_b):
     """Allow only universal forwarder upgrades, To prevent configuration errors - To downgrade use absent -> present"""
     a = list(map(int, version_a.split(".")))
@@ -293,19 +1182,63 @@ def check_if_downgrade(version_a, version_b):
     return False
 
 
-def download_file(module: AnsibleModule, url: str, dest_path: str) -> None:
-    """Download a file from URL to destination path."""
+def download_file(
+    module: AnsibleModule,
+    url: str,
+    dest_path: str,
+    chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+    retries: int = DOWNLOAD_RETRIES,
+) -> None:
+    """Download a file from URL to destination path.
+
+    The file is streamed to a .part file next to the destination and renamed
+    into place once complete. An interrupted transfer is resumed with a Range
+    request, or restarted when the server does not honour it.
+    """
     if module.check_mode:
         return
-    try:
-        response = open_url(url, timeout=300)
-        with open(dest_path, "wb") as f:
-            f.write(response.read())
-    except Exception as e:
-        module.fail_json(msg=f"Failed to download {url}: {str(e)}")
+    part_path = f"{dest_path}.part"
+    last_error = None
+    for attempt in range(1, retries + 1):
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else None
+        try:
+            response = open_url(url, timeout=300, headers=headers)
+            if offset and response.getcode() != 206:
+                module.log(
+                    f"Server ignored the range request for {url}, restarting download"
+                )
+                offset = 0
+            length = response.headers.get("Content-Length")
+            received = 0
+            with open(part_path, "ab" if offset else "wb") as f:
+                for chunk in iter(lambda: response.read(chunk_size), b""):
+                    f.write(chunk)
+                    received += len(chunk)
+            # A dropped connection ends the body early instead of raising
+            if length is not None and received < int(length):
+                raise IOError(f"Connection closed after {offset + received} bytes")
+            os.replace(part_path, dest_path)
+            return
+        except HTTPError as e:
+            last_error = e
+            if e.code == 416 and os.path.exists(part_path):
+                # The partial file does not match the remote file, start over
+                os.remove(part_path)
+        except Exception as e:
+            last_error = e
+        module.log(
+            f"Download of {url} failed (attempt {attempt}/{retries}): {str(last_error)}"
+        )
+    module.fail_json(msg=f"Failed to download {url}: {str(last_error)}")
 
 
-def verify_checksum(module: AnsibleModule, rpm_path: str, checksum_path: str) -> bool:
+def verify_checksum(
+    module: AnsibleModule,
+    rpm_path: str,
+    checksum_path: str,
+    chunk_size: int = CHECKSUM_CHUNK_SIZE,
+) -> bool:
     """Verify the RPM file against SHA512 checksum."""
     try:
         with open(checksum_path, "r") as f:
@@ -319,7 +1252,7 @@ def verify_checksum(module: AnsibleModule, rpm_path: str, checksum_path: str) ->
         expected_checksum = checksum_match.group(1).lower()
         sha512 = hashlib.sha512()
         with open(rpm_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
+            for chunk in iter(lambda: f.read(chunk_size), b""):
                 sha512.update(chunk)
         actual_checksum = sha512.hexdigest()
         if actual_checksum != expected_checksum:
@@ -332,6 +1265,66 @@ def verify_checksum(module: AnsibleModule, rpm_path: str, checksum_path: str) ->
         module.fail_json(msg=f"Error verifying checksum: {str(e)}")
 
 
+def is_package_staged(rpm_path: str, checksum_path: str) -> bool:
+    """Check if the package was verified by a staged run and left unchanged since.
+
+    The marker written by record_staged_package holds the size and mtime of the
+    RPM and the content of its checksum file at verification time.
+    """
+    try:
+        with open(f"{rpm_path}{STAGED_MARKER_SUFFIX}", "r") as f:
+            marker = json.load(f)
+        stat = os.stat(rpm_path)
+        with open(checksum_path, "r") as f:
+            checksum = f.read().strip()
+    except (OSError, ValueError):
+        return False
+    return marker == dict(
+        size=stat.st_size, mtime_ns=stat.st_mtime_ns, checksum=checksum
+    )
+
+
+def record_staged_package(
+    module: AnsibleModule, rpm_path: str, checksum_path: str
+) -> None:
+    """Record a verified package as ready for installation."""
+    if module.check_mode:
+        return
+    try:
+        stat = os.stat(rpm_path)
+        with open(checksum_path, "r") as f:
+            checksum = f.read().strip()
+        marker = dict(size=stat.st_size, mtime_ns=stat.st_mtime_ns, checksum=checksum)
+        write_file_atomic(f"{rpm_path}{STAGED_MARKER_SUFFIX}", json.dumps(marker))
+    except Exception as e:
+        module.fail_json(msg=f"Failed to record staged package {rpm_path}: {str(e)}")
+
+
+def fetch_package(
+    module: AnsibleModule, rpm_url: str, rpm_path: str, checksum_path: str
+) -> bool:
+    """Download the RPM and its checksum when missing and verify them.
+
+    A package recorded by a staged run is used as is. Returns True when the
+    package had to be downloaded or verified.
+    """
+    if is_package_staged(rpm_path, checksum_path):
+        module.log(f"Using the staged package {rpm_path}")
+        return False
+    if not os.path.exists(rpm_path) or not os.path.exists(checksum_path):
+        if not module.check_mode:
+            module.log(f"Downloading RPM from {rpm_url}")
+            download_file(module, rpm_url, rpm_path)
+
+            module.log(f"Downloading checksum from {rpm_url}.sha512")
+            download_file(module, f"{rpm_url}.sha512", checksum_path)
+
+    if not module.check_mode:
+        module.log("Verifying RPM checksum")
+        verify_checksum(module, rpm_path, checksum_path)
+    return True
+
+
 def install_rpm(module: AnsibleModule, rpm_path: str):
     """Install the RPM package."""
     if module.check_mode:
@@ -340,6 +1333,118 @@ def install_rpm(module: AnsibleModule, rpm_path: str):
     return rc, out, err
 
 
+def unpack_tarball(module: AnsibleModule, tarball_path: str, install_dir: str) -> None:
+    """Unpack the tarball into install_dir.
+
+    The tarball is unpacked next to install_dir and renamed into place once
+    complete, so an interrupted run never leaves a partial installation.
+    """
+    if module.check_mode:
+        return
+    part_dir = f"{install_dir}.part"
+    try:
+        for path in (part_dir, install_dir):
+            if os.path.lexists(path):
+                shutil.rmtree(path)
+        os.makedirs(part_dir)
+    except Exception as e:
+        module.fail_json(msg=f"Failed to prepare {install_dir}: {str(e)}")
+    rc, out, err = module.run_command(
+        [
+            "tar",
+            "-xzf",
+            tarball_path,
+            "-C",
+            part_dir,
+            "--strip-components=1",
+            "--no-same-owner",
+        ],
+        check_rc=False,
+    )
+    if rc != 0:
+        shutil.rmtree(part_dir, ignore_errors=True)
+        module.fail_json(
+            msg=f"Failed to unpack {tarball_path}: {err}", stdout=out, stderr=err
+        )
+    os.rename(part_dir, install_dir)
+
+
+def copy_missing_files(src_dir: str, dest_dir: str) -> None:
+    """Copy the files of src_dir that dest_dir does not have.
+
+    Files shipped by the new version win, like an in-place tarball upgrade
+    that keeps the local files. Symlinks are copied as symlinks.
+    """
+    for root, dirs, files in os.walk(src_dir):
+        dest_root = os.path.normpath(
+            os.path.join(dest_dir, os.path.relpath(root, src_dir))
+        )
+        if not os.path.isdir(dest_root):
+            os.makedirs(dest_root)
+            shutil.copystat(root, dest_root)
+        for name in files + [
+            name for name in dirs if os.path.islink(os.path.join(root, name))
+        ]:
+            src_path = os.path.join(root, name)
+            dest_path = os.path.join(dest_root, name)
+            if os.path.lexists(dest_path):
+                continue
+            if os.path.islink(src_path):
+                os.symlink(os.readlink(src_path), dest_path)
+            else:
+                shutil.copy2(src_path, dest_path)
+
+
+def copy_state_tree(module: AnsibleModule, src_dir: str, dest_dir: str) -> None:
+    """Replace dest_dir with a copy of src_dir, sharing blocks through reflinks where the file system supports them."""
+    if module.check_mode or not os.path.isdir(src_dir):
+        return
+    try:
+        if os.path.lexists(dest_dir):
+            shutil.rmtree(dest_dir)
+        os.makedirs(os.path.dirname(dest_dir), exist_ok=True)
+    except Exception as e:
+        module.fail_json(msg=f"Failed to prepare {dest_dir}: {str(e)}")
+    rc, out, err = module.run_command(
+        ["cp", "-a", "--reflink=auto", src_dir, dest_dir], check_rc=False
+    )
+    if rc != 0:
+        module.fail_json(msg=f"Failed to copy {src_dir} to {dest_dir}: {err}")
+
+
+def match_owner(module: AnsibleModule, reference: str, path: str) -> None:
+    """Give the tree of path the owner of reference when running as root."""
+    if module.check_mode or os.geteuid() != 0:
+        return
+    stat = os.stat(reference)
+    rc, out, err = module.run_command(
+        ["chown", "-R", f"{stat.st_uid}:{stat.st_gid}", path], check_rc=False
+    )
+    if rc != 0:
+        module.fail_json(msg=f"Failed to change the owner of {path}: {err}")
+
+
+def switch_splunk_home(
+    module: AnsibleModule, splunk_home: str, install_dir: str
+) -> None:
+    """Point the splunk_home symlink at install_dir with an atomic rename."""
+    if module.check_mode:
+        return
+    link_path = f"{splunk_home}.link"
+    try:
+        if os.path.isdir(splunk_home) and not os.path.islink(splunk_home):
+            # Left empty by a previous removal, a non-empty directory fails here
+            os.rmdir(splunk_home)
+        if os.path.lexists(link_path):
+            os.remove(link_path)
+        os.symlink(install_dir, link_path)
+        os.replace(link_path, splunk_home)
+    except OSError as e:
+        module.fail_json(
+            msg=f"Failed to point {splunk_home} to {install_dir}: {str(e)}"
+        )
+
+
 def remove_rpm(module: AnsibleModule, package_name: str):
     """Remove the RPM package."""
     if module.check_mode:
@@ -393,18 +1498,29 @@ def get_existing_forward_servers(
     if rc != 0:
         module.warn(f"Failed to list forward-servers: {err}")
         return []
-    existing_forward_servers = []
-    current_key = None
-    for line in out.splitlines():
-        line = line.strip()
-        if not line:
+    return parse_forward_servers(out)
+
+
+def get_configured_forward_servers(splunk_home: str) -> list:
+    """Get the forward-servers of the [tcpout:<group>] stanzas of outputs.conf, without splunkd.
+
+    'splunk add forward-server' writes them to etc/system/local, apps can
+    set more, merged with the precedence of Splunk.
+    """
+    outputs = read_conf_layers(
+        [os.path.join(splunk_home, "etc", "system", "local")]
+        + get_conf_layer_dirs(splunk_home),
+        "outputs.conf",
+    )
+    forward_servers = []
+    for stanza, keys in outputs.items():
+        if not stanza.startswith("tcpout:"):
             continue
-        if line.endswith(":"):
-            current_key = line.replace(":", "")
-        elif current_key:
-            if line.lower() != "none":
-                existing_forward_servers.append(line)
-    return existing_forward_servers
+        for server in keys.get("server", "").split(","):
+            server = server.strip()
+            if server and server not in forward_servers:
+                forward_servers.append(server)
+    return forward_servers
 
 
 def manage_forward_servers(
@@ -428,118 +1544,709 @@ def manage_forward_servers(
             [splunk_bin, action, "forward-server", server],
             environ_update=env,
         )
-        if rc != 0:
-            module.warn(f"Failed to {action} forward-server {server}: {err}")
-        else:
-            changed = True
-    return changed
+        if rc != 0:
+            module.warn(f"Failed to {action} forward-server {server}: {err}")
+        else:
+            changed = True
+    return changed
+
+
+def host_splay(hostname: str, splay: int) -> int:
+    """Return a deterministic offset between 0 and splay seconds for a host."""
+    digest = hashlib.sha256(hostname.encode("utf-8")).hexdigest()
+    return int(digest, 16) % (splay + 1)
+
+
+def build_deployment_server_settings(deployment_server: str) -> dict:
+    """Map the deployment_server option to deploymentclient.conf, an empty string removing the client configuration."""
+    if deployment_server == "":
+        return {
+            "deploymentclient.conf": {
+                "target-broker:deploymentServer": None,
+                "deployment-client": None,
+            },
+        }
+    return {
+        "deploymentclient.conf": {
+            "target-broker:deploymentServer": {"targetUri": deployment_server}
+        }
+    }
+
+
+def build_deployment_client_settings(
+    module: AnsibleModule, deployment_client: dict
+) -> dict:
+    """Map the deployment_client option to the [deployment-client] stanza of deploymentclient.conf."""
+    splay = deployment_client["splay"]
+    offset = 0
+    if splay:
+        if splay < 0:
+            module.fail_json(
+                msg="deployment_client.splay must be a positive number of seconds"
+            )
+        if (
+            deployment_client["phone_home_interval"] is None
+            and deployment_client["handshake_retry_interval"] is None
+        ):
+            module.fail_json(
+                msg="deployment_client.splay requires phone_home_interval or handshake_retry_interval",
+            )
+        offset = host_splay(socket.gethostname(), splay)
+    stanza = {}
+    for option, conf_key in DEPLOYMENT_CLIENT_INTERVAL_KEYS.items():
+        if deployment_client[option] is not None:
+            stanza[conf_key] = str(deployment_client[option] + offset)
+    if deployment_client["client_name"] is not None:
+        stanza["clientName"] = deployment_client["client_name"]
+    if not stanza:
+        return {}
+    return {"deploymentclient.conf": {"deployment-client": stanza}}
+
+
+def map_output_settings(module: AnsibleModule, output_settings: dict) -> dict:
+    """Map output tuning suboptions to outputs.conf keys, skipping unset ones."""
+    max_queue_size = output_settings.get("max_queue_size")
+    if max_queue_size is not None and max_queue_size.strip() != "auto":
+        value = max_queue_size.strip()
+        try:
+            parse_conf_size(value)
+        except ValueError as e:
+            module.fail_json(msg=f"Invalid max_queue_size: {str(e)} or auto")
+        if not value.isdigit() and value[-2:].upper() not in ("KB", "MB", "GB"):
+            module.fail_json(
+                msg=f"Invalid max_queue_size '{value}', the unit must be KB, MB or GB"
+            )
+    return {
+        conf_key: format_conf_value(output_settings[option])
+        for option, conf_key in OUTPUT_SETTINGS_KEYS.items()
+        if output_settings.get(option) is not None
+    }
+
+
+def build_output_settings(module: AnsibleModule, output_settings: dict) -> dict:
+    """Map the output_settings option to the [tcpout] stanza of outputs.conf."""
+    tcpout = map_output_settings(module, output_settings)
+    if not tcpout:
+        return {}
+    return {"outputs.conf": {"tcpout": tcpout}}
+
+
+def build_output_groups(
+    module: AnsibleModule,
+    splunk_home: str,
+    output_groups: list,
+    indexer_discovery=None,
+) -> dict:
+    """Map the output_groups option to [tcpout:<name>] stanzas and defaultGroup.
+
+    Target group stanzas of the local outputs.conf that are not listed are removed.
+    """
+    stanzas = {}
+    default_groups = []
+    for group in output_groups:
+        name = group["name"]
+        if not OUTPUT_GROUP_NAME_RE.match(name):
+            module.fail_json(msg=f"Invalid output group name '{name}'")
+        if f"tcpout:{name}" in stanzas:
+            module.fail_json(msg=f"Duplicate output group '{name}'")
+        if group.get("indexer_discovery"):
+            if indexer_discovery is None:
+                module.fail_json(
+                    msg=f"Output group '{name}' uses indexer discovery but indexer_discovery is not set"
+                )
+            stanza = {"indexerDiscovery": indexer_discovery["name"], "server": None}
+        elif group["servers"]:
+            stanza = {"server": ",".join(group["servers"]), "indexerDiscovery": None}
+        else:
+            module.fail_json(msg=f"Output group '{name}' has no servers")
+        stanza.update(map_output_settings(module, group))
+        stanzas[f"tcpout:{name}"] = stanza
+        if group["default"]:
+            default_groups.append(name)
+
+    local_outputs = read_conf(
+        os.path.join(splunk_home, "etc", "system", "local", "outputs.conf")
+    )
+    for stanza in local_outputs:
+        if stanza.startswith("tcpout:") and stanza not in stanzas:
+            stanzas[stanza] = None
+
+    stanzas["tcpout"] = {
+        "defaultGroup": ",".join(default_groups) if default_groups else None
+    }
+    return {"outputs.conf": stanzas}
+
+
+def decrypt_conf_value(module: AnsibleModule, splunk_home: str, value: str):
+    """Decrypt a value encrypted by Splunk, None when it cannot be decrypted."""
+    splunk_bin = os.path.join(splunk_home, "bin", "splunk")
+    if not os.path.exists(splunk_bin):
+        return None
+    # Neither the encrypted nor the decrypted key shows in the command trace or the result
+    module.no_log_values.add(value)
+    rc, out, err = module.run_command(
+        [splunk_bin, "show-decrypted", "--value", value],
+        check_rc=False,
+    )
+    if rc != 0:
+        module.warn(f"Failed to decrypt the stored pass4SymmKey: {err}")
+        return None
+    if out.strip():
+        module.no_log_values.add(out.strip())
+    return out.strip()
+
+
+def build_indexer_discovery(
+    module: AnsibleModule, splunk_home: str, indexer_discovery: dict
+) -> dict:
+    """Map the indexer_discovery option to its [indexer_discovery:<name>] stanza.
+
+    The stored pass4SymmKey is left alone when it decrypts to the desired key,
+    and other indexer discovery stanzas of the local outputs.conf are removed.
+    """
+    name = indexer_discovery["name"]
+    if not OUTPUT_GROUP_NAME_RE.match(name):
+        module.fail_json(msg=f"Invalid indexer discovery name '{name}'")
+    stanza_name = f"indexer_discovery:{name}"
+    stanza = {
+        "manager_uri": indexer_discovery["manager_uri"],
+        "pass4SymmKey": indexer_discovery["pass4symmkey"],
+    }
+    local_outputs = read_conf(
+        os.path.join(splunk_home, "etc", "system", "local", "outputs.conf")
+    )
+    stored_key = local_outputs.get(stanza_name, {}).get("pass4SymmKey")
+    if stored_key and stored_key.startswith(ENCRYPTED_VALUE_PREFIX):
+        if (
+            decrypt_conf_value(module, splunk_home, stored_key)
+            == indexer_discovery["pass4symmkey"]
+        ):
+            del stanza["pass4SymmKey"]
+
+    stanzas = {stanza_name: stanza}
+    for existing in local_outputs:
+        if existing.startswith("indexer_discovery:") and existing != stanza_name:
+            stanzas[existing] = None
+    return {"outputs.conf": stanzas}
+
+
+def is_input_defined(splunk_home: str, stanza: str) -> bool:
+    """Check whether an inputs.conf of etc/system/local or an app defines the stanza."""
+    etc_dir = os.path.join(splunk_home, "etc")
+    paths = [os.path.join(etc_dir, "system", "local", "inputs.conf")]
+    apps_dir = os.path.join(etc_dir, "apps")
+    if os.path.isdir(apps_dir):
+        for app in sorted(os.listdir(apps_dir)):
+            for layer in ("local", "default"):
+                paths.append(os.path.join(apps_dir, app, layer, "inputs.conf"))
+    for path in paths:
+        try:
+            if stanza in read_conf(path):
+                return True
+        except Exception:
+            continue
+    return False
+
+
+def get_free_space(path: str) -> int:
+    """Return the free bytes of the file system of path, or of its closest existing parent."""
+    while not os.path.exists(path):
+        path = os.path.dirname(path)
+    return shutil.disk_usage(path).free
+
+
+def build_input_queue_settings(
+    module: AnsibleModule, splunk_home: str, input_queues: list
+) -> dict:
+    """Map the input_queues option to inputs.conf stanzas and check the disk space."""
+    stanzas = {}
+    persistent_total = 0
+    for input_queue in input_queues:
+        stanza_name = input_queue["input"]
+        input_type = stanza_name.split("://", 1)[0]
+        if "://" not in stanza_name or input_type not in QUEUE_INPUT_TYPES:
+            module.fail_json(
+                msg=f"Input '{stanza_name}' does not support queue settings, "
+                f"supported input types are: {', '.join(QUEUE_INPUT_TYPES)}",
+            )
+        stanza = {}
+        for option, conf_key in (
+            ("queue_size", "queueSize"),
+            ("persistent_queue_size", "persistentQueueSize"),
+        ):
+            value = input_queue[option]
+            if value is None:
+                continue
+            try:
+                size = parse_conf_size(value)
+            except ValueError as e:
+                module.fail_json(
+                    msg=f"Invalid {option} of input '{stanza_name}': {str(e)}"
+                )
+            if conf_key == "persistentQueueSize":
+                persistent_total += size
+            stanza[conf_key] = value.strip()
+        if not stanza:
+            continue
+        if not is_input_defined(splunk_home, stanza_name):
+            module.warn(
+                f"No inputs.conf defines [{stanza_name}], the queue settings create a new input"
+            )
+        stanzas[stanza_name] = stanza
+
+    var_dir = os.path.join(splunk_home, "var")
+    free_space = get_free_space(var_dir)
+    if persistent_total > free_space:
+        module.fail_json(
+            msg=f"The persistent queues need {persistent_total} bytes but only {free_space} bytes "
+            f"are free for {var_dir}",
+        )
+    if not stanzas:
+        return {}
+    return {"inputs.conf": stanzas}
+
+
+def build_internal_logging_settings(profile: str) -> dict:
+    """Map an internal_logging profile to outputs.conf filters and log-local.cfg levels.
+
+    Every key managed by a profile is listed, the keys the profile does not
+    set are removed so switching profiles leaves no leftovers.
+    """
+    settings = INTERNAL_LOGGING_PROFILES[profile]
+    tcpout = settings.get("outputs.conf", {}).get("tcpout", {})
+    splunkd = settings.get("log-local.cfg", {}).get("splunkd", {})
+    return {
+        "outputs.conf": {
+            "tcpout": {key: tcpout.get(key) for key in FORWARDED_INDEX_KEYS}
+        },
+        "log-local.cfg": {"splunkd": {key: splunkd.get(key) for key in LOG_LOCAL_KEYS}},
+    }
+
+
+def build_throughput_settings(module: AnsibleModule, max_kbps, pipelines) -> dict:
+    """Map the throughput options to limits.conf [thruput] and server.conf [general]."""
+    conf_settings = {}
+    if max_kbps is not None:
+        if max_kbps < 0:
+            module.fail_json(
+                msg="thruput_max_kbps must be 0 (unlimited) or a positive number"
+            )
+        conf_settings["limits.conf"] = {"thruput": {"maxKBps": str(max_kbps)}}
+    if pipelines is not None:
+        if pipelines < 1:
+            module.fail_json(msg="parallel_ingestion_pipelines must be at least 1")
+        conf_settings["server.conf"] = {
+            "general": {"parallelIngestionPipelines": str(pipelines)}
+        }
+    return conf_settings
+
+
+def configure_splunk(
+    module: AnsibleModule, splunk_home: str, conf_settings: dict
+) -> list:
+    """Apply .conf settings to etc/system/local, or etc for the logging files, and return the changed settings."""
+    system_settings = {
+        name: stanzas
+        for name, stanzas in conf_settings.items()
+        if name not in ETC_CONF_FILES
+    }
+    etc_settings = {
+        name: stanzas
+        for name, stanzas in conf_settings.items()
+        if name in ETC_CONF_FILES
+    }
+    changes = apply_conf_settings(
+        module,
+        os.path.join(splunk_home, "etc", "system", "local"),
+        system_settings,
+        get_conf_layer_dirs(splunk_home),
+    )
+    if etc_settings:
+        changes.extend(
+            apply_conf_settings(module, os.path.join(splunk_home, "etc"), etc_settings)
+        )
+    return changes
+
+
+def start_splunk(module: AnsibleModule, splunk_home: str):
+    """Start Splunk for the first time with license acceptance."""
+    if module.check_mode:
+        return 0, "Check mode: would start Splunk", ""
+    splunk_bin = os.path.join(splunk_home, "bin", "splunk")
+    env = os.environ.copy()
+    env["SPLUNK_HOME"] = splunk_home
+    rc, out, err = module.run_command(
+        [splunk_bin, "start", "--accept-license", "--answer-yes"],
+        environ_update=env,
+    )
+    time.sleep(15)
+    if not check_splunk_service(module, splunk_home, "start"):
+        module.fail_json(msg="Failed to start Splunk service")
+    return rc, out, err
+
+
+def read_snapshot(snapshot_dir: str):
+    """Read the description of a pre-upgrade snapshot, None when there is none."""
+    try:
+        with open(os.path.join(snapshot_dir, SNAPSHOT_FILE), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def snapshot_splunk_home(
+    module: AnsibleModule, splunk_home: str, snapshot_dir: str, snapshot: dict
+) -> None:
+    """Save etc and the fishbucket of a stopped forwarder, then describe the snapshot.
+
+    The description is removed first and written last, so a partial snapshot
+    is never used. Nothing is copied when snapshot has an install_dir, the
+    previous tarball directory is the snapshot.
+    """
+    if module.check_mode:
+        return
+    snapshot_file = os.path.join(snapshot_dir, SNAPSHOT_FILE)
+    try:
+        if os.path.exists(snapshot_file):
+            os.remove(snapshot_file)
+    except OSError as e:
+        module.fail_json(
+            msg=f"Failed to replace the snapshot in {snapshot_dir}: {str(e)}"
+        )
+    if not snapshot.get("install_dir"):
+        copy_state_tree(
+            module, os.path.join(splunk_home, "etc"), os.path.join(snapshot_dir, "etc")
+        )
+        copy_state_tree(
+            module,
+            os.path.join(splunk_home, FISHBUCKET_DIR),
+            os.path.join(snapshot_dir, "fishbucket"),
+        )
+    write_file_atomic(snapshot_file, json.dumps(snapshot))
+
+
+def preserve_splunk_state(
+    module: AnsibleModule, splunk_home: str, preserved_dir: str, items: list
+) -> None:
+    """Move the listed state of a removed forwarder out of splunk_home, replacing previously preserved state."""
+    if module.check_mode:
+        return
+    try:
+        if os.path.lexists(preserved_dir):
+            shutil.rmtree(preserved_dir)
+        for item in items:
+            src_dir = os.path.join(splunk_home, PRESERVED_STATE_DIRS[item])
+            if not os.path.isdir(src_dir):
+                continue
+            os.makedirs(preserved_dir, exist_ok=True)
+            # A rename on the same file system, whatever the size of the state
+            shutil.move(src_dir, os.path.join(preserved_dir, item))
+            module.log(f"Preserved {src_dir} in {preserved_dir}")
+    except Exception as e:
+        module.fail_json(msg=f"Failed to preserve the state of {splunk_home}: {str(e)}")
+
+
+def restore_splunk_state(
+    module: AnsibleModule, splunk_home: str, preserved_dir: str
+) -> list:
+    """Move the state kept by a removal back into a fresh installation and return the restored items."""
+    if not os.path.isdir(preserved_dir):
+        return []
+    restored = [
+        item
+        for item in PRESERVED_STATE_DIRS
+        if os.path.isdir(os.path.join(preserved_dir, item))
+    ]
+    if module.check_mode:
+        return restored
+    try:
+        for item in restored:
+            src_dir = os.path.join(preserved_dir, item)
+            dest_dir = os.path.join(splunk_home, PRESERVED_STATE_DIRS[item])
+            if item == "etc":
+                # The files shipped by the installed version take precedence
+                copy_missing_files(src_dir, dest_dir)
+            else:
+                if os.path.lexists(dest_dir):
+                    shutil.rmtree(dest_dir)
+                os.makedirs(os.path.dirname(dest_dir), exist_ok=True)
+                shutil.move(src_dir, dest_dir)
+            module.log(f"Restored {dest_dir} from {preserved_dir}")
+        shutil.rmtree(preserved_dir)
+    except Exception as e:
+        module.fail_json(
+            msg=f"Failed to restore the state preserved in {preserved_dir}: {str(e)}"
+        )
+    return restored
+
+
+def rollback_splunk(
+    module: AnsibleModule,
+    splunk_home: str,
+    download_dir: str,
+    drain_timeout: int = 0,
+    load_limits=None,
+) -> dict:
+    """Restore the version, etc and fishbucket saved by the last upgrade."""
+    snapshot_dir = f"{splunk_home}{SNAPSHOT_SUFFIX}"
+    snapshot = read_snapshot(snapshot_dir)
+    if snapshot is None:
+        module.fail_json(msg=f"No snapshot to roll back to in {snapshot_dir}")
+    version = snapshot["version"]
+    install_method = snapshot["install_method"]
+    result = dict(
+        changed=False,
+        version=version,
+        release_id=snapshot["release_id"],
+        snapshot_dir=snapshot_dir,
+    )
+
+    installed_version = get_current_version(module, splunk_home, install_method)
+    if installed_version == version:
+        result["msg"] = f"Splunk Universal Forwarder {version} is already installed"
+        return result
+    if install_method == "tarball" and not os.path.isdir(snapshot["install_dir"]):
+        # Checked before splunkd is stopped, the link is not switched to a missing version
+        module.fail_json(
+            msg=f"Cannot roll back to {version}, its installation directory "
+            f"{snapshot['install_dir']} no longer exists",
+            **result,
+        )
+    result["changed"] = True
+    result["msg"] = f"Splunk Universal Forwarder rolled back to {version}"
+    if module.check_mode:
+        return result
+
+    if installed_version:
+        prepare_stop(module, splunk_home, drain_timeout, load_limits, result)
+    if install_method == "tarball":
+        if installed_version:
+            stop_splunk(module, splunk_home)
+        switch_splunk_home(module, splunk_home, snapshot["install_dir"])
+        start_splunk(module, splunk_home)
+        return result
+
+    package_filename = get_package_filename(
+        version, snapshot["release_id"], snapshot["cpu_arch"], "rpm"
+    )
+    package_path = os.path.join(download_dir, package_filename)
+    fetch_package(
+        module,
+        f"{DOWNLOAD_BASE_URL}/{version}/linux/{package_filename}",
+        package_path,
+        f"{package_path}.sha512",
+    )
+    if installed_version:
+        uninstall_splunk(module, splunk_home)
+    rc, out, err = install_rpm(module, package_path)
+    if rc != 0:
+        module.fail_json(msg=f"Failed to install RPM: {err}", stdout=out, stderr=err)
+    copy_state_tree(
+        module, os.path.join(snapshot_dir, "etc"), os.path.join(splunk_home, "etc")
+    )
+    copy_state_tree(
+        module,
+        os.path.join(snapshot_dir, "fishbucket"),
+        os.path.join(splunk_home, FISHBUCKET_DIR),
+    )
+    start_splunk(module, splunk_home)
+    enable_systemd_service(module, splunk_home)
+    return result
+
+
+def prepare_stop(
+    module: AnsibleModule,
+    splunk_home: str,
+    drain_timeout: int,
+    load_limits,
+    result: dict,
+) -> None:
+    """Wait for a quiet host, then for the output queues to drain, before a running splunkd is stopped.
+
+    Done at most once per module run.
+    """
+    if (
+        not (drain_timeout or load_limits)
+        or module.check_mode
+        or "drain" in result
+        or "load_wait" in result
+    ):
+        return
+    splunk_bin = os.path.join(splunk_home, "bin", "splunk")
+    if not os.path.exists(splunk_bin):
+        return
+    rc, out, err = module.run_command([splunk_bin, "status"], check_rc=False)
+    if rc != 0:
+        return
+    if load_limits:
+        result["load_wait"] = wait_for_low_load(
+            module, load_limits, load_limits["max_wait"]
+        )
+    if drain_timeout:
+        result["drain"] = drain_outputs(module, splunk_home, drain_timeout)
 
 
-def get_deployment_server(module: AnsibleModule, splunk_home: str):
-    """Get the currently configured deployment server from deploymentclient.conf."""
-    deployment_conf = os.path.join(
-        splunk_home,
-        "etc",
-        "system",
-        "local",
-        "deploymentclient.conf",
+def verify_after_change(
+    module: AnsibleModule, splunk_home: str, verify_timeout: int, result: dict
+) -> None:
+    """Fail the module when a changed forwarder sends no data to an indexer before the timeout."""
+    if (
+        not verify_timeout
+        or module.check_mode
+        or not result["changed"]
+        or result.get("applied_by") == "next_start"
+    ):
+        return
+    module.log(
+        f"Verifying that data is forwarded, for at most {verify_timeout} seconds"
     )
-    if not os.path.exists(deployment_conf):
-        return None
-    try:
-        with open(deployment_conf, "r") as f:
-            content = f.read()
-        # Parse targetUri from [target-broker:deploymentServer] section
-        match = re.search(r"targetUri\s*=\s*(\S+)", content)
-        if match:
-            return match.group(1)
-        return None
-    except Exception as e:
-        module.warn(f"Failed to read deploymentclient.conf: {str(e)}")
-        return None
+    result["data_flow"] = verify_data_flow(module, splunk_home, verify_timeout)
+    if not result["data_flow"]["verified"]:
+        result["msg"] = (
+            f"{result['msg']}, but no data was forwarded to an indexer within {verify_timeout} seconds"
+        )
+        module.fail_json(**result)
 
 
-def set_deployment_server(
-    module: AnsibleModule,
-    splunk_home: str,
-    username: str,
-    password: str,
-    deployment_server: str,
-) -> bool:
-    """Set the deployment server using the Splunk CLI command."""
+def stop_splunk(module: AnsibleModule, splunk_home: str) -> None:
+    """Stop Splunk and wait until it is stopped."""
     if module.check_mode:
-        return True
+        return
     splunk_bin = os.path.join(splunk_home, "bin", "splunk")
-    env = os.environ.copy()
-    env["SPLUNK_USERNAME"] = username
-    env["SPLUNK_PASSWORD"] = password
+    rc, out, err = module.run_command([splunk_bin, "stop"], check_rc=False)
+    if rc != 0:
+        module.fail_json(msg=f"Failed to stop Splunk: {err}")
+    if not check_splunk_service(module, splunk_home, "stop"):
+        module.fail_json(msg="Failed to stop Splunk service")
+
+
+def start_stopped_splunk(module: AnsibleModule, splunk_home: str) -> bool:
+    """Start a stopped splunkd that already went through its first start, return whether it was started."""
+    splunk_bin = os.path.join(splunk_home, "bin", "splunk")
+    rc, out, err = module.run_command([splunk_bin, "status"], check_rc=False)
+    if rc == 0:
+        return False
+    if module.check_mode:
+        return True
     rc, out, err = module.run_command(
-        [splunk_bin, "set", "deploy-poll", deployment_server],
-        environ_update=env,
+        [splunk_bin, "start", "--accept-license", "--answer-yes", "--no-prompt"],
+        check_rc=False,
     )
     if rc != 0:
-        module.warn(f"Failed to set deploy-poll to {deployment_server}: {err}")
-        return False
+        module.fail_json(msg=f"Failed to start Splunk: {err}")
+    if not check_splunk_service(module, splunk_home, "start"):
+        module.fail_json(msg="Failed to start Splunk service")
     return True
 
 
-def remove_deployment_server(module: AnsibleModule, splunk_home: str) -> bool:
-    """Remove the deployment server by deleting deploymentclient.conf and restarting Splunk."""
-    if module.check_mode:
-        return True
-    deployment_conf = os.path.join(
-        splunk_home,
-        "etc",
-        "system",
-        "local",
-        "deploymentclient.conf",
+def prepare_image(module: AnsibleModule, splunk_home: str) -> bool:
+    """Stop splunkd and clear the instance GUID and server name for cloning, return whether anything changed.
+
+    Boot-start is left enabled, the clones generate their own GUID on their first start.
+    """
+    splunk_bin = os.path.join(splunk_home, "bin", "splunk")
+    rc, out, err = module.run_command([splunk_bin, "status"], check_rc=False)
+    running = rc == 0
+    instance_conf = read_conf(os.path.join(splunk_home, "etc", "instance.cfg"))
+    server_conf = read_conf(
+        os.path.join(splunk_home, "etc", "system", "local", "server.conf")
     )
-    if os.path.exists(deployment_conf):
-        try:
-            os.remove(deployment_conf)
-            module.log(f"Removed deployment client config: {deployment_conf}")
-        except Exception as e:
-            module.warn(f"Failed to remove deploymentclient.conf: {str(e)}")
-            return False
-        # Restart Splunk service to apply changes
-        splunk_bin = os.path.join(splunk_home, "bin", "splunk")
-        rc, out, err = module.run_command([splunk_bin, "restart"], check_rc=False)
+    if not (
+        running
+        or instance_conf.get("general", {}).get("guid")
+        or server_conf.get("general", {}).get("serverName")
+    ):
+        return False
+    if running:
+        stop_splunk(module, splunk_home)
+    if not module.check_mode:
+        rc, out, err = module.run_command(
+            [splunk_bin, "clone-prep-clear-config"], check_rc=False
+        )
         if rc != 0:
-            module.warn(
-                f"Failed to restart Splunk after removing deployment server: {err}",
-            )
-            return False
-        if not check_splunk_service(module, splunk_home, "start"):
-            module.warn(
-                "Splunk service did not restart properly after removing deployment server",
+            module.fail_json(
+                msg=f"Failed to clear the instance configuration: {err}",
+                stdout=out,
+                stderr=err,
             )
-            return False
-        return True
-    return False
+    return True
 
 
-def start_splunk(module: AnsibleModule, splunk_home: str):
-    """Start Splunk for the first time with license acceptance."""
-    if module.check_mode:
-        return 0, "Check mode: would start Splunk", ""
-    splunk_bin = os.path.join(splunk_home, "bin", "splunk")
-    env = os.environ.copy()
-    env["SPLUNK_HOME"] = splunk_home
-    rc, out, err = module.run_command(
-        [splunk_bin, "start", "--accept-license", "--answer-yes"],
-        environ_update=env,
-    )
-    time.sleep(15)
-    if not check_splunk_service(module, splunk_home, "start"):
-        module.fail_json(msg="Failed to start Splunk service")
-    return rc, out, err
+def finish_image(
+    module: AnsibleModule, splunk_home: str, version: str, result: dict
+) -> None:
+    """Prepare the installed forwarder for cloning and report it in the result."""
+    if prepare_image(module, splunk_home):
+        result["changed"] = True
+    if result["changed"]:
+        result["msg"] = f"Splunk Universal Forwarder {version} prepared for cloning"
+    else:
+        result["msg"] = (
+            f"Splunk Universal Forwarder {version} is already prepared for cloning"
+        )
+
+
+def get_service_name(splunk_home: str) -> str:
+    """Get the systemd service name of an instance from SPLUNK_SERVER_NAME in its splunk-launch.conf."""
+    try:
+        launch_conf = read_conf(os.path.join(splunk_home, "etc", "splunk-launch.conf"))
+    except OSError:
+        return SERVICE_NAME
+    return launch_conf.get("default", {}).get("SPLUNK_SERVER_NAME") or SERVICE_NAME
+
+
+def build_instance_settings(
+    module: AnsibleModule,
+    splunk_home: str,
+    service_name: str,
+    mgmt_port,
+    server_name=None,
+) -> dict:
+    """Map the service name, management port and server name of an instance to its .conf files."""
+    settings = {}
+    if server_name is not None:
+        if not server_name or any(char.isspace() for char in server_name):
+            module.fail_json(msg=f"Invalid server_name '{server_name}'")
+        settings["server.conf"] = {"general": {"serverName": server_name}}
+        settings["inputs.conf"] = {"default": {"host": server_name}}
+    if mgmt_port is not None:
+        if not 0 < mgmt_port < 65536:
+            module.fail_json(
+                msg=f"Invalid mgmt_port {mgmt_port}, expected a port number"
+            )
+        settings["web.conf"] = {"settings": {"mgmtHostPort": f"127.0.0.1:{mgmt_port}"}}
+    if service_name != SERVICE_NAME:
+        if not re.match(r"^[A-Za-z0-9_.@-]+$", service_name):
+            module.fail_json(msg=f"Invalid service_name '{service_name}'")
+        settings["splunk-launch.conf"] = {
+            "default": {"SPLUNK_SERVER_NAME": service_name}
+        }
+    return settings
+
+
+def check_instance_conflicts(
+    module: AnsibleModule, splunk_home: str, service_name: str, mgmt_port
+) -> None:
+    """Fail when the service name or management port belongs to another instance of the host."""
+    for name, other_home in get_service_splunk_homes().items():
+        if is_same_instance(other_home, splunk_home):
+            continue
+        if name == service_name:
+            module.fail_json(
+                msg=f"The {service_name} service already runs the instance in {other_home}"
+            )
+        if mgmt_port is not None and get_mgmt_port(other_home) == mgmt_port:
+            module.fail_json(
+                msg=f"Port {mgmt_port} is already the management port of the instance in {other_home}"
+            )
 
 
 def enable_systemd_service(
     module: AnsibleModule,
     splunk_home: str,
+    service_name: str = SERVICE_NAME,
 ):
-    """Enable and start the SplunkForwarder systemd service using Splunk commands."""
+    """Enable and start the systemd service of the instance using Splunk commands."""
     if module.check_mode:
         return 0, "Check mode: would enable/start SplunkForwarder systemd service", ""
 
@@ -562,10 +2269,12 @@ def enable_systemd_service(
     if rc != 0:
         module.fail_json(msg=f"Failed to disable boot-start: {err}")
 
-    rc, out, err = module.run_command(
-        [splunk_bin, "enable", "boot-start"],
-        check_rc=False,
-    )
+    boot_start = [splunk_bin, "enable", "boot-start"]
+    if service_name != SERVICE_NAME:
+        boot_start.extend(
+            ["-systemd-managed", "1", "-systemd-unit-file-name", service_name]
+        )
+    rc, out, err = module.run_command(boot_start, check_rc=False)
     time.sleep(2)
     if rc != 0:
         module.fail_json(msg=f"Failed to enable boot-start: {err}")
@@ -621,17 +2330,22 @@ def check_splunk_service(
     return False
 
 
-def uninstall_splunk(module: AnsibleModule, splunk_home: str) -> dict:
-    """Uninstall Splunk Universal Forwarder from the system."""
+def uninstall_splunk(
+    module: AnsibleModule, splunk_home: str, stopped: bool = False
+) -> dict:
+    """Uninstall Splunk Universal Forwarder from the system, stopping it first unless it is already stopped."""
     result = dict(changed=False, msg="Splunk Universal Forwarder is not installed")
 
-    if not is_splunk_installed(module):
+    # A tarball installation is a symlink to its versioned directory
+    tarball = os.path.islink(splunk_home)
+    if not tarball and (splunk_home != SPLUNK_HOME or not is_splunk_installed(module)):
         return result
+    service_name = get_service_name(splunk_home)
 
     if not module.check_mode:
         # Stop Splunk service
         splunk_bin = os.path.join(splunk_home, "bin", "splunk")
-        if os.path.exists(splunk_bin):
+        if os.path.exists(splunk_bin) and not stopped:
             module.run_command([splunk_bin, "stop"], check_rc=False)
             # Verify the service stopped
             if check_splunk_service(module, splunk_home, "stop"):
@@ -645,19 +2359,20 @@ def uninstall_splunk(module: AnsibleModule, splunk_home: str) -> dict:
         if rc != 0:
             module.fail_json(msg=f"Failed to disable boot-start: {err}")
     # Remove the RPM package
-    rc, out, err = remove_rpm(module, "splunkforwarder")
-    if rc != 0 and "not installed" not in err.lower():
-        module.fail_json(
-            msg=f"Failed to remove Splunk Universal Forwarder: {err}",
-            stdout=out,
-            stderr=err,
-        )
+    if not tarball:
+        rc, out, err = remove_rpm(module, "splunkforwarder")
+        if rc != 0 and "not installed" not in err.lower():
+            module.fail_json(
+                msg=f"Failed to remove Splunk Universal Forwarder: {err}",
+                stdout=out,
+                stderr=err,
+            )
 
     if not module.check_mode:
         systemd_files = [
-            "/usr/lib/systemd/system/SplunkForwarder.service",
-            "/etc/systemd/system/SplunkForwarder.service",
-            "/etc/systemd/system/multi-user.target.wants/SplunkForwarder.service",
+            f"/usr/lib/systemd/system/{service_name}.service",
+            f"/etc/systemd/system/{service_name}.service",
+            f"/etc/systemd/system/multi-user.target.wants/{service_name}.service",
         ]
         for service_file in systemd_files:
             if os.path.exists(service_file):
@@ -676,8 +2391,78 @@ def uninstall_splunk(module: AnsibleModule, splunk_home: str) -> dict:
     return result
 
 
-def purge_splunk_home(module: AnsibleModule, splunk_home: str) -> None:
-    """Purge the Splunk Universal Forwarder home directory."""
+def start_background_removal(module: AnsibleModule, paths: list) -> None:
+    """Delete paths in the background at idle CPU and I/O priority.
+
+    The deletion runs as a transient systemd service, so it outlives the
+    module and the SSH session, or as a detached process when systemd-run is
+    not available.
+    """
+    command = ["rm", "-rf", "--one-file-system", *paths]
+    if shutil.which("systemd-run"):
+        rc, out, err = module.run_command(
+            [
+                "systemd-run",
+                "--collect",
+                "--description=Purge of removed Splunk Universal Forwarder files",
+                "--property=Nice=19",
+                "--property=IOSchedulingClass=idle",
+                *command,
+            ],
+            check_rc=False,
+        )
+        if rc == 0:
+            return
+        module.log(f"systemd-run failed, purging in a detached process: {err}")
+    prefix = ["nice", "-n", "19"]
+    if shutil.which("ionice"):
+        prefix += ["ionice", "-c", "3"]
+    subprocess.Popen(
+        prefix + command,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def find_tombstones(splunk_home: str) -> list:
+    """Return the tombstones of earlier background purges left next to splunk_home."""
+    path = Path(splunk_home)
+    tombstone_prefix = f".{path.name}{TOMBSTONE_INFIX}"
+    try:
+        return sorted(
+            entry
+            for entry in path.parent.iterdir()
+            if entry.name.startswith(tombstone_prefix)
+            and entry.is_dir()
+            and not entry.is_symlink()
+        )
+    except OSError:
+        return []
+
+
+def sweep_tombstones(module: AnsibleModule, splunk_home: str) -> None:
+    """Delete in the background the tombstones a purge interrupted by a reboot left behind."""
+    if module.check_mode:
+        return
+    tombstones = find_tombstones(splunk_home)
+    if tombstones:
+        module.log(f"Deleting the leftovers of earlier purges: {tombstones}")
+        start_background_removal(module, [str(tombstone) for tombstone in tombstones])
+
+
+def purge_splunk_home(
+    module: AnsibleModule, splunk_home: str, background: bool = False
+) -> None:
+    """Purge the Splunk Universal Forwarder home directory.
+
+    In background mode the directories are renamed to tombstones next to
+    splunk_home, on the same file system, and deleted by a background process,
+    so splunk_home is free as soon as this returns. Tombstones left by an
+    interrupted deletion, after a reboot for example, are deleted too, in
+    both modes.
+    """
     if not module.check_mode:
         # Safety check: ensure 'splunk' is in {splunk_home} to prevent deletion of system folders!
         if "splunk" not in splunk_home.lower():
@@ -688,41 +2473,205 @@ def purge_splunk_home(module: AnsibleModule, splunk_home: str) -> None:
                 ),
             )
         path = Path(splunk_home)
-        if path.exists() and path.is_dir():
-            shutil.rmtree(path)
-            module.log(f"Removed: {splunk_home}")
+        paths = []
+        if path.is_symlink():
+            # Remove the link first, then the versioned directories of the tarball installations
+            install_dir_re = re.compile(
+                rf"^{re.escape(path.name)}-\d+(\.\d+)+(\.part)?$"
+            )
+            paths = [
+                entry
+                for entry in path.parent.iterdir()
+                if install_dir_re.match(entry.name)
+                and entry.is_dir()
+                and not entry.is_symlink()
+            ]
+            path.unlink()
+        elif path.exists() and path.is_dir():
+            paths = [path]
         else:
             module.log(f"Directory does not exist or is not a directory: {splunk_home}")
+        snapshot_path = Path(f"{splunk_home}{SNAPSHOT_SUFFIX}")
+        if snapshot_path.is_dir():
+            paths.append(snapshot_path)
+
+        tombstones = find_tombstones(splunk_home)
+        if not background:
+            for entry in paths:
+                shutil.rmtree(entry)
+                module.log(f"Removed: {entry}")
+            # A background deletion may still be removing them
+            for entry in tombstones:
+                shutil.rmtree(entry, ignore_errors=True)
+                module.log(f"Removed: {entry}")
+            return
+
+        tombstone_prefix = f".{path.name}{TOMBSTONE_INFIX}"
+        for entry in paths:
+            # The empty directory of mkdtemp reserves a unique name the rename replaces
+            tombstone = Path(tempfile.mkdtemp(prefix=tombstone_prefix, dir=path.parent))
+            try:
+                entry.rename(tombstone)
+            except OSError as e:
+                tombstone.rmdir()
+                module.fail_json(
+                    msg=f"Failed to move {entry} to {tombstone} for the background purge: {str(e)}",
+                )
+            tombstones.append(tombstone)
+            module.log(f"Renamed {entry} to {tombstone}")
+        if tombstones:
+            start_background_removal(
+                module, [str(tombstone) for tombstone in tombstones]
+            )
 
 
-def main() -> None:
+def run_module() -> None:
+    output_settings_spec = dict(
+        max_queue_size=dict(type="str"),
+        auto_lb_frequency=dict(type="int"),
+        auto_lb_volume=dict(type="int"),
+        compressed=dict(type="bool"),
+        use_ack=dict(type="bool"),
+        connection_timeout=dict(type="int"),
+        write_timeout=dict(type="int"),
+        dns_resolution_interval=dict(type="int"),
+    )
     module = AnsibleModule(
         argument_spec=dict(
-            state=dict(type="str", default="present", choices=["present", "absent"]),
+            state=dict(
+                type="str",
+                default="present",
+                choices=[
+                    "present",
+                    "staged",
+                    "rolled_back",
+                    "absent",
+                    "image_prepared",
+                    "first_boot",
+                ],
+            ),
             version=dict(type="str"),
             release_id=dict(type="str"),
             cpu=dict(type="str", default="64-bit", choices=["64-bit", "ARM"]),
+            install_method=dict(type="str", default="rpm", choices=["rpm", "tarball"]),
+            splunk_home=dict(type="path", default=SPLUNK_HOME),
+            service_name=dict(type="str", default=SERVICE_NAME),
+            mgmt_port=dict(type="int"),
+            server_name=dict(type="str"),
+            snapshot=dict(type="bool", default=True),
+            drain_timeout=dict(type="int", default=0),
+            load_limits=dict(
+                type="dict",
+                options=dict(
+                    max_load_per_cpu=dict(type="float"),
+                    max_cpu_pressure=dict(type="float"),
+                    max_io_pressure=dict(type="float"),
+                    max_wait=dict(type="int", default=600),
+                ),
+            ),
+            verify_timeout=dict(type="int", default=0),
+            preserve_state=dict(
+                type="list",
+                elements="str",
+                default=[],
+                choices=list(PRESERVED_STATE_DIRS),
+            ),
+            purge=dict(type="str", default="sync", choices=["sync", "background"]),
             username=dict(type="str"),
             password=dict(type="str", no_log=True),
             forward_servers=dict(type="list", elements="str"),
             deployment_server=dict(type="str"),
+            deployment_client=dict(
+                type="dict",
+                options=dict(
+                    phone_home_interval=dict(type="int"),
+                    handshake_retry_interval=dict(type="int"),
+                    client_name=dict(type="str"),
+                    splay=dict(type="int"),
+                ),
+            ),
+            output_settings=dict(type="dict", options=output_settings_spec),
+            output_groups=dict(
+                type="list",
+                elements="dict",
+                options=dict(
+                    name=dict(type="str", required=True),
+                    servers=dict(type="list", elements="str"),
+                    indexer_discovery=dict(type="bool"),
+                    default=dict(type="bool", default=True),
+                    **output_settings_spec,
+                ),
+                mutually_exclusive=[("servers", "indexer_discovery")],
+                required_one_of=[("servers", "indexer_discovery")],
+            ),
+            indexer_discovery=dict(
+                type="dict",
+                options=dict(
+                    name=dict(type="str", default="cluster_manager"),
+                    manager_uri=dict(type="str", required=True),
+                    pass4symmkey=dict(type="str", required=True, no_log=True),
+                ),
+            ),
+            input_queues=dict(
+                type="list",
+                elements="dict",
+                options=dict(
+                    input=dict(type="str", required=True),
+                    queue_size=dict(type="str"),
+                    persistent_queue_size=dict(type="str"),
+                ),
+            ),
+            internal_logging=dict(type="str", choices=list(INTERNAL_LOGGING_PROFILES)),
+            thruput_max_kbps=dict(type="int"),
+            parallel_ingestion_pipelines=dict(type="int"),
+            command_trace=dict(type="bool", default=False),
+            command_trace_path=dict(type="path"),
         ),
         required_if=[
             ("state", "present", ["version", "release_id", "username", "password"]),
+            ("state", "staged", ["version", "release_id"]),
+            (
+                "state",
+                "image_prepared",
+                ["version", "release_id", "username", "password"],
+            ),
+        ],
+        mutually_exclusive=[
+            ("forward_servers", "output_groups"),
+            ("forward_servers", "indexer_discovery"),
         ],
         supports_check_mode=True,
     )
 
+    enable_command_trace(
+        module,
+        module.params["command_trace"],
+        module.params["command_trace_path"],
+    )
+
     state = module.params["state"]
     version = module.params["version"]
     release_id = module.params["release_id"]
     cpu = module.params["cpu"]
+    install_method = module.params["install_method"]
+    drain_timeout = module.params["drain_timeout"]
+    load_limits = module.params["load_limits"]
+    verify_timeout = module.params["verify_timeout"]
     username = module.params["username"]
     password = module.params["password"]
     forward_servers = module.params["forward_servers"]
     deployment_server = module.params["deployment_server"]
-    download_dir = "/opt"
-    splunk_home = "/opt/splunkforwarder"
+    deployment_client = module.params["deployment_client"]
+    output_settings = module.params["output_settings"]
+    output_groups = module.params["output_groups"]
+    indexer_discovery = module.params["indexer_discovery"]
+    download_dir = DOWNLOAD_DIR
+    splunk_home = module.params["splunk_home"].rstrip("/") or "/"
+    service_name = module.params["service_name"]
+    mgmt_port = module.params["mgmt_port"]
+    server_name = module.params["server_name"]
+    snapshot_dir = f"{splunk_home}{SNAPSHOT_SUFFIX}"
+    preserved_dir = f"{splunk_home}{PRESERVED_SUFFIX}"
 
     # Map user-friendly CPU names to architecture strings
     cpu_arch_map = {
@@ -731,6 +2680,43 @@ def main() -> None:
     }
     cpu_arch = cpu_arch_map[cpu]
 
+    if drain_timeout < 0:
+        module.fail_json(
+            msg="drain_timeout must be 0 (no wait) or a positive number of seconds"
+        )
+    if load_limits:
+        if all(
+            value is None for key, value in load_limits.items() if key != "max_wait"
+        ):
+            module.fail_json(
+                msg="load_limits requires max_load_per_cpu, max_cpu_pressure or max_io_pressure"
+            )
+        if load_limits["max_wait"] < 0:
+            module.fail_json(
+                msg="load_limits.max_wait must be a positive number of seconds"
+            )
+    if verify_timeout < 0:
+        module.fail_json(
+            msg="verify_timeout must be 0 (no verification) or a positive number of seconds"
+        )
+    if state == "image_prepared" and server_name is not None:
+        module.fail_json(
+            msg="server_name cannot be set with state=image_prepared, the image is prepared without one"
+        )
+    if state == "first_boot" and forward_servers is not None:
+        module.fail_json(
+            msg="forward_servers cannot be set with state=first_boot, set them when the image is prepared"
+        )
+    if (
+        state in ("present", "image_prepared")
+        and install_method == "rpm"
+        and splunk_home != SPLUNK_HOME
+    ):
+        module.fail_json(
+            msg=f"The RPM package installs into {SPLUNK_HOME}, "
+            f"use install_method=tarball to install into {splunk_home}",
+        )
+
     # Check RHEL version
     rhel_version = check_rhel_version(module)
     module.log(f"RHEL version: {rhel_version}")
@@ -742,11 +2728,134 @@ def main() -> None:
 
     # Handle removal (state == 'absent')
     if state == "absent":
+        preserve_state = module.params["preserve_state"]
+        prepare_stop(module, splunk_home, drain_timeout, load_limits, result)
         removal_result = uninstall_splunk(module, splunk_home)
-        purge_splunk_home(module, splunk_home)
+        if removal_result["changed"] or os.path.lexists(splunk_home):
+            preserve_splunk_state(module, splunk_home, preserved_dir, preserve_state)
+            if preserve_state:
+                result["preserved_dir"] = preserved_dir
+        elif not preserve_state and os.path.lexists(preserved_dir):
+            # Nothing left to remove but the state kept by an earlier removal
+            preserve_splunk_state(module, splunk_home, preserved_dir, [])
+            removal_result["changed"] = True
+        purge_splunk_home(
+            module, splunk_home, background=module.params["purge"] == "background"
+        )
         result.update(removal_result)
         module.exit_json(**result)
 
+    # Handle rollback (state == 'rolled_back')
+    if state == "rolled_back":
+        result.update(
+            rollback_splunk(
+                module, splunk_home, download_dir, drain_timeout, load_limits
+            )
+        )
+        verify_after_change(module, splunk_home, verify_timeout, result)
+        module.exit_json(**result)
+
+    # Configuration settings managed by every state that configures the forwarder
+    conf_settings = {}
+    if deployment_server is not None:
+        merge_conf_settings(
+            conf_settings, build_deployment_server_settings(deployment_server)
+        )
+    if deployment_client:
+        if deployment_server == "":
+            module.fail_json(
+                msg="deployment_client cannot be set when the deployment server is removed"
+            )
+        merge_conf_settings(
+            conf_settings, build_deployment_client_settings(module, deployment_client)
+        )
+    if output_settings:
+        merge_conf_settings(
+            conf_settings, build_output_settings(module, output_settings)
+        )
+    if indexer_discovery:
+        merge_conf_settings(
+            conf_settings,
+            build_indexer_discovery(module, splunk_home, indexer_discovery),
+        )
+        if output_groups is None:
+            output_groups = [
+                dict(
+                    dict.fromkeys(output_settings_spec),
+                    name=indexer_discovery["name"],
+                    servers=None,
+                    indexer_discovery=True,
+                    default=True,
+                ),
+            ]
+    if output_groups is not None:
+        merge_conf_settings(
+            conf_settings,
+            build_output_groups(module, splunk_home, output_groups, indexer_discovery),
+        )
+    if module.params["internal_logging"]:
+        merge_conf_settings(
+            conf_settings,
+            build_internal_logging_settings(module.params["internal_logging"]),
+        )
+    if module.params["input_queues"]:
+        merge_conf_settings(
+            conf_settings,
+            build_input_queue_settings(
+                module, splunk_home, module.params["input_queues"]
+            ),
+        )
+    merge_conf_settings(
+        conf_settings,
+        build_throughput_settings(
+            module,
+            module.params["thruput_max_kbps"],
+            module.params["parallel_ingestion_pipelines"],
+        ),
+    )
+    instance_settings = build_instance_settings(
+        module, splunk_home, service_name, mgmt_port, server_name
+    )
+    # The service name is only taken into account when boot-start is enabled by an installation
+    launch_settings = instance_settings.pop("splunk-launch.conf", None)
+    merge_conf_settings(conf_settings, instance_settings)
+
+    # Handle the first boot of a cloned image (state == 'first_boot'), the installed forwarder is only configured
+    if state == "first_boot":
+        if not os.path.exists(os.path.join(splunk_home, "bin", "splunk")):
+            module.fail_json(
+                msg=f"Splunk Universal Forwarder is not installed in {splunk_home}, "
+                "prepare the image with state=image_prepared",
+            )
+        check_instance_conflicts(module, splunk_home, service_name, mgmt_port)
+        result["msg"] = "Splunk Universal Forwarder is running"
+        conf_changes = []
+        if conf_settings:
+            conf_changes = configure_splunk(module, splunk_home, conf_settings)
+            result["conf_changes"] = redact_conf_changes(conf_changes)
+            if conf_changes:
+                result["changed"] = True
+                result["msg"] = (
+                    "Splunk Universal Forwarder is running - configuration updated"
+                )
+        if start_stopped_splunk(module, splunk_home):
+            # The configuration written above is read by this start
+            result["changed"] = True
+            result["msg"] = "Splunk Universal Forwarder started"
+        elif conf_changes and not module.check_mode:
+            result["applied_by"] = reload_or_restart(
+                module,
+                splunk_home,
+                conf_changes,
+                username,
+                password,
+                before_restart=lambda: prepare_stop(
+                    module, splunk_home, drain_timeout, load_limits, result
+                ),
+            )
+        verify_after_change(module, splunk_home, verify_timeout, result)
+        module.exit_json(**result)
+
     # Check if version is supported (only major version 9)
     major_version = int(version.split(".")[0])
     if major_version >= 10:
@@ -755,15 +2864,49 @@ def main() -> None:
             "Universal Forwarder Version 10.0.0 and above is not supported",
         )
 
-    # Handle installation (state == 'present')
     result["version"] = version
     result["release_id"] = release_id
     result["cpu_arch"] = cpu_arch
 
+    package_filename = get_package_filename(
+        version, release_id, cpu_arch, install_method
+    )
+    package_url = f"{DOWNLOAD_BASE_URL}/{version}/linux/{package_filename}"
+    package_path = os.path.join(download_dir, package_filename)
+    checksum_path = f"{package_path}.sha512"
+    result["tarball_path" if install_method == "tarball" else "rpm_path"] = package_path
+
+    # Handle staging (state == 'staged'), the running forwarder is left alone
+    if state == "staged":
+        installed_version = get_current_version(module, splunk_home, install_method)
+        if installed_version and check_if_downgrade(installed_version, version):
+            result["failed"] = True
+            result["msg"] = (
+                f"Installed Version {installed_version} is newer than {version} "
+                "Only universal forwarder upgrades are allowed. "
+                "To downgrade use absent -> present."
+            )
+        elif installed_version == version:
+            result["msg"] = f"Splunk Universal Forwarder {version} is already installed"
+        elif is_package_staged(package_path, checksum_path):
+            result["msg"] = f"Splunk Universal Forwarder {version} is already staged"
+        else:
+            fetch_package(module, package_url, package_path, checksum_path)
+            record_staged_package(module, package_path, checksum_path)
+            result["changed"] = True
+            result["msg"] = (
+                f"Splunk Universal Forwarder {version} staged in {package_path}"
+            )
+        module.exit_json(**result)
+
+    # Handle installation (state == 'present' or 'image_prepared')
+
     to_add = []
     to_remove = []
 
-    installed_version = get_installed_version(module)
+    check_instance_conflicts(module, splunk_home, service_name, mgmt_port)
+
+    installed_version = get_current_version(module, splunk_home, install_method)
 
     if installed_version:
         if check_if_downgrade(installed_version, version):
@@ -775,7 +2918,16 @@ def main() -> None:
             )
             module.exit_json(**result)
 
-    if installed_version and forward_servers is not None:
+    reconcile_forward_servers = installed_version and forward_servers is not None
+    if state == "image_prepared" and reconcile_forward_servers:
+        # The forward servers of a prepared, stopped image are managed through the running splunkd,
+        # which is only started when outputs.conf does not list the requested ones already
+        if set(get_configured_forward_servers(splunk_home)) == set(forward_servers):
+            reconcile_forward_servers = False
+        elif start_stopped_splunk(module, splunk_home):
+            result["changed"] = True
+
+    if reconcile_forward_servers:
         existing_forward_servers = get_existing_forward_servers(
             module,
             splunk_home,
@@ -815,84 +2967,165 @@ def main() -> None:
             result["msg"] = (
                 f"Splunk Universal Forwarder {version} is already installed - forward-servers set: {forward_servers}"
             )
-        # Check and configure deployment server if specified
-        if deployment_server is not None:
-            current_deployment_server = get_deployment_server(module, splunk_home)
-            if deployment_server == "":
-                # Empty string means remove deployment server
-                if current_deployment_server is not None:
-                    if remove_deployment_server(module, splunk_home):
-                        result["changed"] = True
-                        result["msg"] = (
-                            f"Splunk Universal Forwarder {version} is already installed - deployment server removed"
-                        )
-            elif current_deployment_server != deployment_server:
-                if set_deployment_server(
-                    module,
-                    splunk_home,
-                    username,
-                    password,
-                    deployment_server,
+        if conf_settings:
+            conf_changes = configure_splunk(module, splunk_home, conf_settings)
+            result["conf_changes"] = redact_conf_changes(conf_changes)
+            if conf_changes:
+                result["changed"] = True
+                update = "configuration updated"
+                if any(
+                    change["stanza"] == "target-broker:deploymentServer"
+                    for change in conf_changes
                 ):
-                    result["changed"] = True
-                    result["msg"] = (
-                        f"Splunk Universal Forwarder {version} is already installed - deployment server set to: {deployment_server}"
+                    if deployment_server:
+                        update = f"deployment server set to: {deployment_server}"
+                    else:
+                        update = "deployment server removed"
+                result["msg"] = (
+                    f"Splunk Universal Forwarder {version} is already installed - {update}"
+                )
+                # Every change of the run is applied with a single reload or restart, a prepared
+                # image reads them on the first start of its clones
+                if state == "image_prepared":
+                    result["applied_by"] = "next_start"
+                elif not module.check_mode:
+                    result["applied_by"] = reload_or_restart(
+                        module,
+                        splunk_home,
+                        conf_changes,
+                        username,
+                        password,
+                        before_restart=lambda: prepare_stop(
+                            module, splunk_home, drain_timeout, load_limits, result
+                        ),
                     )
+        if state == "image_prepared":
+            finish_image(module, splunk_home, version, result)
+        else:
+            verify_after_change(module, splunk_home, verify_timeout, result)
         module.exit_json(**result)
 
-    rpm_filename = f"splunkforwarder-{version}-{release_id}.{cpu_arch}.rpm"
-    rpm_url = f"https://download.splunk.com/products/universalforwarder/releases/{version}/linux/{rpm_filename}"
-    checksum_url = f"{rpm_url}.sha512"
-
-    rpm_path = os.path.join(download_dir, rpm_filename)
-    checksum_path = f"{rpm_path}.sha512"
-
-    result["rpm_path"] = rpm_path
-
-    if not os.path.exists(rpm_path) or not os.path.exists(checksum_path):
-        if not module.check_mode:
-            module.log(f"Downloading RPM from {rpm_url}")
-            download_file(module, rpm_url, rpm_path)
-
-            module.log(f"Downloading checksum from {checksum_url}")
-            download_file(module, checksum_url, checksum_path)
-
-    if not module.check_mode:
-        module.log("Verifying RPM checksum")
-        verify_checksum(module, rpm_path, checksum_path)
+    if launch_settings:
+        merge_conf_settings(conf_settings, {"splunk-launch.conf": launch_settings})
+    sweep_tombstones(module, splunk_home)
+    fetch_package(module, package_url, package_path, checksum_path)
+
+    if install_method == "tarball":
+        # Unpack the new version next to the running one, which keeps ingesting meanwhile
+        install_dir = f"{splunk_home}-{version}"
+        module.log(f"Unpacking Splunk Universal Forwarder {version} into {install_dir}")
+        unpack_tarball(module, package_path, install_dir)
+        result["install_dir"] = install_dir
+        if installed_version:
+            previous_install_dir = os.path.realpath(splunk_home)
+            result["previous_install_dir"] = previous_install_dir
+            if not module.check_mode:
+                copy_missing_files(
+                    os.path.join(previous_install_dir, "etc"),
+                    os.path.join(install_dir, "etc"),
+                )
+            match_owner(module, previous_install_dir, install_dir)
+            # The ingestion gap starts here and ends with the start of the new version
+            module.log(f"Stopping Splunk Universal Forwarder {installed_version}")
+            prepare_stop(module, splunk_home, drain_timeout, load_limits, result)
+            stop_splunk(module, splunk_home)
+            copy_state_tree(
+                module,
+                os.path.join(previous_install_dir, FISHBUCKET_DIR),
+                os.path.join(install_dir, FISHBUCKET_DIR),
+            )
+            if module.params["snapshot"]:
+                result["snapshot_dir"] = snapshot_dir
+                snapshot_splunk_home(
+                    module,
+                    splunk_home,
+                    snapshot_dir,
+                    dict(
+                        version=installed_version,
+                        release_id=read_version_file(splunk_home).get("BUILD"),
+                        cpu_arch=cpu_arch,
+                        install_method=install_method,
+                        install_dir=previous_install_dir,
+                    ),
+                )
+        switch_splunk_home(module, splunk_home, install_dir)
+    else:
+        if installed_version:
+            prepare_stop(module, splunk_home, drain_timeout, load_limits, result)
+        if installed_version and module.params["snapshot"]:
+            previous_release_id, previous_cpu_arch = get_installed_release(module)
+            # The fishbucket is only consistent once splunkd is stopped
+            stop_splunk(module, splunk_home)
+            module.log(
+                f"Saving a snapshot of Splunk Universal Forwarder {installed_version} to {snapshot_dir}"
+            )
+            result["snapshot_dir"] = snapshot_dir
+            snapshot_splunk_home(
+                module,
+                splunk_home,
+                snapshot_dir,
+                dict(
+                    version=installed_version,
+                    release_id=previous_release_id,
+                    cpu_arch=previous_cpu_arch,
+                    install_method=install_method,
+                ),
+            )
 
-    # Uninstall The Previous Splunk Universal Forwarder
-    if installed_version:
-        module.log(f"Uninstalling old Splunk Universal Forwarder {installed_version}")
-        uninstall_result = uninstall_splunk(module, splunk_home)
-        module.log(f"Uninstall result: {uninstall_result['msg']}")
+        # Uninstall The Previous Splunk Universal Forwarder
+        if installed_version:
+            module.log(
+                f"Uninstalling old Splunk Universal Forwarder {installed_version}"
+            )
+            uninstall_result = uninstall_splunk(
+                module, splunk_home, stopped=module.params["snapshot"]
+            )
+            module.log(f"Uninstall result: {uninstall_result['msg']}")
 
-    # Install Splunk Universal Forwarder RPM
-    module.log(f"Installing Splunk Universal Forwarder {version}")
-    rc, out, err = install_rpm(module, rpm_path)
-    if rc != 0:
-        module.fail_json(msg=f"Failed to install RPM: {err}", stdout=out, stderr=err)
+        # Install Splunk Universal Forwarder RPM
+        module.log(f"Installing Splunk Universal Forwarder {version}")
+        rc, out, err = install_rpm(module, package_path)
+        if rc != 0:
+            module.fail_json(
+                msg=f"Failed to install RPM: {err}", stdout=out, stderr=err
+            )
 
     if not module.check_mode:
         os.environ["SPLUNK_HOME"] = splunk_home
 
+    # Bring back the state kept by a previous removal before the first start
+    if not installed_version:
+        restored_state = restore_splunk_state(module, splunk_home, preserved_dir)
+        if restored_state:
+            result["restored_state"] = restored_state
+
     # Create user-seed.conf
     passwd_path = os.path.join(splunk_home, "etc", "passwd")
     if not os.path.exists(passwd_path):
         module.log("Creating user-seed.conf")
         create_user_seed_conf(module, splunk_home, username, password)
 
+    # Write the managed configuration before the first start so it needs no restart
+    if conf_settings:
+        result["conf_changes"] = redact_conf_changes(
+            configure_splunk(module, splunk_home, conf_settings)
+        )
+
     # Start Splunk for the first time
     module.log("Starting Splunk Universal Forwarder")
     rc, out, err = start_splunk(module, splunk_home)
     if rc != 0:
         module.warn(f"Splunk start returned non-zero exit code: {err}")
 
-    # Enable and start the SplunkForwarder systemd service
-    module.log("Enabling and starting SplunkForwarder systemd service")
-    rc, out, err = enable_systemd_service(module, splunk_home)
-    if rc != 0:
-        module.warn(f"Failed to enable/start SplunkForwarder systemd service: {err}")
+    # Enable and start the SplunkForwarder systemd service, a tarball upgrade keeps
+    # the service of the previous version since it runs through the symlink
+    if install_method == "rpm" or not installed_version:
+        module.log("Enabling and starting SplunkForwarder systemd service")
+        rc, out, err = enable_systemd_service(module, splunk_home, service_name)
+        if rc != 0:
+            module.warn(
+                f"Failed to enable/start SplunkForwarder systemd service: {err}"
+            )
 
     # Add forward-servers
     if forward_servers and not installed_version:
@@ -924,29 +3157,21 @@ def main() -> None:
                 action="remove",
             )
 
-    # Configure deployment server if specified
-    if deployment_server is not None:
-        current_deployment_server = get_deployment_server(module, splunk_home)
-        if deployment_server == "":
-            # Empty string means remove deployment server
-            if current_deployment_server is not None:
-                remove_deployment_server(module, splunk_home)
-        elif current_deployment_server != deployment_server:
-            set_deployment_server(
-                module,
-                splunk_home,
-                username,
-                password,
-                deployment_server,
-            )
-
     result["changed"] = True
     result["msg"] = (
         f"Splunk Universal Forwarder {version} installed and started successfully"
     )
+    if state == "image_prepared":
+        finish_image(module, splunk_home, version, result)
+    else:
+        verify_after_change(module, splunk_home, verify_timeout, result)
 
     module.exit_json(**result)
 
 
+def main() -> None:
+    run_profiled(run_module, "splunk_universal_forwarder_linux")
+
+
 if __name__ == "__main__":
     main()
@@ -16,6 +16,7 @@ short_description: Gather information about Splunk Universal Forwarder installat
 description:
   - This module gathers information about Splunk Universal Forwarder installations on RHEL 8, 9, and 10 systems.
   - Returns installation state, version, release id, CPU architecture, forward servers, and deployment server configuration.
+  - Also discovers every forwarder instance of the host in the same run, see RV(instances).
 
 version_added: "1.0.0"
 
@@ -37,10 +38,46 @@ options:
     type: str
     required: true
 
+  splunk_home:
+    description:
+      - Installation directory of the forwarder described by the top level return values.
+    type: path
+    default: /opt/splunkforwarder
+
+  instance_paths:
+    description:
+      - Additional installation directories to look for forwarder instances, as shell patterns.
+      - The instances with a systemd service and the one in O(splunk_home) are always found, this option
+        adds the instances started without a service.
+    type: list
+    elements: path
+    default: []
+
+  command_trace:
+    description:
+      - Record every command run by the module and return the records in RV(command_trace).
+      - Each record contains the command argv with credentials redacted, the start offset and duration
+        in seconds, the return code and the size of stdout and stderr in bytes.
+    type: bool
+    default: false
+
+  command_trace_path:
+    description:
+      - Path of a file on the target host to append the command trace to as JSON lines.
+      - Each line holds one command record, plus the process id of the module run.
+      - Can be used independently of O(command_trace).
+    type: path
+
 notes:
   - This module only works on RHEL 8, 9, and 10 systems.
-  - Splunk Universal Forwarder is expected to be installed in V(/opt/splunkforwarder) with RPM package.
+  - Splunk Universal Forwarder is expected to be installed in V(/opt/splunkforwarder) with RPM package,
+    or in O(splunk_home) from the tarball.
   - Requires the Splunk service to be running to retrieve forward_servers information.
+  - The instances are found through the C(ExecStart) of the systemd services in C(/etc/systemd/system)
+    that run C(bin/splunk), and through O(instance_paths). The same O(username) and O(password) are used for
+    every instance.
+  - Set the E(SPLUNK_UF_PROFILE_DIR) environment variable to profile the module run with cProfile. A V(.pstats) file and a V(.txt)
+    summary of the top E(SPLUNK_UF_PROFILE_TOP) functions (default V(25)) by cumulative time are written to that directory on the target.
 """
 
 EXAMPLES = r"""
@@ -64,6 +101,25 @@ EXAMPLES = r"""
   ansible.builtin.debug:
     msg: "Splunk Universal Forwarder is not installed"
   when: splunk_info.state == 'absent'
+
+- name: List every forwarder instance of the host
+  splunk.enterprise.splunk_universal_forwarder_linux_info:
+    username: admin
+    password: "password"
+    instance_paths:
+      - /data/splunkforwarder*
+  register: splunk_info
+
+- name: Show the management port of each instance
+  ansible.builtin.debug:
+    msg: "{{ splunk_info.instances | items2dict(key_name='splunk_home', value_name='mgmt_port') }}"
+
+- name: Profile the module run on a slow host
+  splunk.enterprise.splunk_universal_forwarder_linux_info:
+    username: admin
+    password: "password"
+  environment:
+    SPLUNK_UF_PROFILE_DIR: /var/tmp/splunk_uf_profile
 """
 
 RETURN = r"""
@@ -111,19 +167,85 @@ splunk_home:
   returned: always
   sample: "/opt/splunkforwarder"
 
+instances:
+  description: Every forwarder instance found on the host, starting with the one in O(splunk_home) when it is installed.
+  type: list
+  elements: dict
+  returned: always
+  contains:
+    splunk_home:
+      description: Installation directory of the instance.
+      type: str
+      sample: "/opt/splunkforwarder2"
+    install_method:
+      description: How the instance is installed.
+      type: str
+      choices: ['rpm', 'tarball']
+      sample: "tarball"
+    version:
+      description: Version of the instance, from C(etc/splunk.version).
+      type: str
+      sample: "9.4.7"
+    release_id:
+      description: Release id of the instance, from C(etc/splunk.version).
+      type: str
+      sample: "2a9293b80994"
+    service_name:
+      description: Name of the systemd service running the instance, C(null) without a service.
+      type: str
+      sample: "SplunkForwarder2"
+    mgmt_port:
+      description: Management port of splunkd.
+      type: int
+      sample: 8090
+    running:
+      description: Whether splunkd of the instance is running, from its C(var/run/splunk/splunkd.pid).
+      type: bool
+      sample: true
+    forward_servers:
+      description: Configured forward servers, only listed when the instance is running.
+      type: list
+      elements: str
+      sample: ["splunk-indexer1.example.com:9997"]
+    deployment_server:
+      description: Configured deployment server URI, empty string if not configured.
+      type: str
+      sample: "deployment-server.example.com:8089"
+
 rhel_version:
   description: Major version of RHEL on the system.
   type: str
   returned: always
   sample: "9"
+
+command_trace:
+  description: Commands run by the module, in execution order.
+  type: list
+  elements: dict
+  returned: when O(command_trace=true)
+  sample: [{"argv": ["rpm", "-qa", "splunkforwarder"], "start": 0.012, "duration": 0.241, "rc": 0, "stdout_bytes": 36, "stderr_bytes": 0}]
 """
 
 
+import glob
 import os
 import re
 
 from ansible.module_utils.basic import AnsibleModule
 
+from ..module_utils.splunk_uf_linux_utils import (
+    enable_command_trace,
+    get_deployment_server,
+    get_mgmt_port,
+    get_service_splunk_homes,
+    is_same_instance,
+    parse_forward_servers,
+    read_version_file,
+    run_profiled,
+)
+
+SPLUNK_HOME = "/opt/splunkforwarder"
+
 
 def check_rhel_version(module: AnsibleModule) -> str:
     """Check if the system is RHEL 8, 9, or 10."""
@@ -223,56 +345,107 @@ def get_forward_servers(
     if rc != 0:
         module.warn(f"Failed to list forward-servers: {err}")
         return []
-    forward_servers = []
-    current_key = None
-    for line in out.splitlines():
-        line = line.strip()
-        if not line:
+    return parse_forward_servers(out)
+
+
+def is_splunk_running(splunk_home: str) -> bool:
+    """Check whether the splunkd process recorded in var/run/splunk/splunkd.pid is alive."""
+    try:
+        with open(
+            os.path.join(splunk_home, "var", "run", "splunk", "splunkd.pid"), "r"
+        ) as f:
+            pid = int(f.readline().strip())
+        os.kill(pid, 0)
+    except PermissionError:
+        # The process exists but belongs to another user
+        return True
+    except (OSError, ValueError):
+        return False
+    return True
+
+
+def discover_instances(splunk_home: str, instance_paths: list) -> list:
+    """Find the installation directories of the forwarder instances, with the name of their systemd service.
+
+    splunk_home comes first, then the instances of the systemd services and
+    of instance_paths. A directory linked to by another one is only listed once.
+    """
+    services = get_service_splunk_homes()
+    candidates = [splunk_home] + list(services.values())
+    for pattern in instance_paths:
+        candidates.extend(sorted(glob.glob(pattern)))
+    instances = []
+    seen = set()
+    for candidate in candidates:
+        candidate = os.path.normpath(candidate)
+        real_path = os.path.realpath(candidate)
+        if real_path in seen or not os.path.exists(
+            os.path.join(candidate, "bin", "splunk")
+        ):
             continue
-        if line.endswith(":"):
-            current_key = line.replace(":", "")
-        elif current_key:
-            if line.lower() != "none":
-                forward_servers.append(line)
-    return forward_servers
-
-
-def get_deployment_server(module: AnsibleModule, splunk_home: str):
-    """Get the currently configured deployment server from deploymentclient.conf."""
-    deployment_conf = os.path.join(
-        splunk_home,
-        "etc",
-        "system",
-        "local",
-        "deploymentclient.conf",
+        seen.add(real_path)
+        service_name = None
+        for name, service_home in services.items():
+            if is_same_instance(service_home, candidate):
+                service_name = name
+                break
+        instances.append((candidate, service_name))
+    return instances
+
+
+def get_instance_info(
+    module: AnsibleModule,
+    splunk_home: str,
+    service_name,
+    install_method: str,
+    username: str,
+    password: str,
+    forward_servers=None,
+) -> dict:
+    """Describe one forwarder instance, listing its forward servers when it is running and they are not given."""
+    version_info = read_version_file(splunk_home)
+    running = is_splunk_running(splunk_home)
+    if forward_servers is None:
+        forward_servers = (
+            get_forward_servers(module, splunk_home, username, password)
+            if running
+            else []
+        )
+    return dict(
+        splunk_home=splunk_home,
+        install_method=install_method,
+        version=version_info.get("VERSION"),
+        release_id=version_info.get("BUILD"),
+        service_name=service_name,
+        mgmt_port=get_mgmt_port(splunk_home),
+        running=running,
+        forward_servers=forward_servers,
+        deployment_server=get_deployment_server(module, splunk_home) or "",
     )
-    if not os.path.exists(deployment_conf):
-        return None
-    try:
-        with open(deployment_conf, "r") as f:
-            content = f.read()
-        # Parse targetUri from [target-broker:deploymentServer] section
-        match = re.search(r"targetUri\s*=\s*(\S+)", content)
-        if match:
-            return match.group(1)
-        return None
-    except Exception as e:
-        module.warn(f"Failed to read deploymentclient.conf: {str(e)}")
-        return None
 
 
-def main() -> None:
+def run_module() -> None:
     module = AnsibleModule(
         argument_spec=dict(
             username=dict(type="str", required=True),
             password=dict(type="str", no_log=True, required=True),
+            splunk_home=dict(type="path", default=SPLUNK_HOME),
+            instance_paths=dict(type="list", elements="path", default=[]),
+            command_trace=dict(type="bool", default=False),
+            command_trace_path=dict(type="path"),
         ),
         supports_check_mode=True,
     )
 
+    enable_command_trace(
+        module,
+        module.params["command_trace"],
+        module.params["command_trace_path"],
+    )
+
     username = module.params["username"]
     password = module.params["password"]
-    splunk_home = "/opt/splunkforwarder"
+    splunk_home = os.path.normpath(module.params["splunk_home"])
 
     rhel_version = check_rhel_version(module)
 
@@ -282,31 +455,79 @@ def main() -> None:
         rhel_version=rhel_version,
     )
 
-    if not is_splunk_installed(module):
-        result["state"] = "absent"
-        module.exit_json(**result)
-
-    result["state"] = "present"
-
-    version = get_installed_version(module)
-    if version:
-        result["version"] = version
+    # The RPM only ever installs into the default location, other instances come from the tarball
+    rpm_installed = (
+        splunk_home == SPLUNK_HOME
+        and not os.path.islink(splunk_home)
+        and is_splunk_installed(module)
+    )
+    tarball_installed = not rpm_installed and os.path.exists(
+        os.path.join(splunk_home, "bin", "splunk")
+    )
 
-    release_id = get_installed_release_id(module)
-    if release_id:
-        result["release_id"] = release_id
+    if rpm_installed:
+        result["state"] = "present"
+
+        version = get_installed_version(module)
+        if version:
+            result["version"] = version
+
+        release_id = get_installed_release_id(module)
+        if release_id:
+            result["release_id"] = release_id
+
+        cpu = get_installed_cpu_arch(module)
+        if cpu:
+            result["cpu"] = cpu
+    elif tarball_installed:
+        result["state"] = "present"
+        version_info = read_version_file(splunk_home)
+        if version_info.get("VERSION"):
+            result["version"] = version_info["VERSION"]
+        if version_info.get("BUILD"):
+            result["release_id"] = version_info["BUILD"]
+        if version_info.get("PLATFORM"):
+            result["cpu"] = version_info["PLATFORM"].rsplit("-", 1)[-1]
+    else:
+        result["state"] = "absent"
 
-    cpu = get_installed_cpu_arch(module)
-    if cpu:
-        result["cpu"] = cpu
+    if result["state"] == "present":
+        forward_servers = get_forward_servers(module, splunk_home, username, password)
+        result["forward_servers"] = forward_servers
+
+        deployment_server = get_deployment_server(module, splunk_home)
+        result["deployment_server"] = deployment_server if deployment_server else ""
+
+    result["instances"] = []
+    for instance_home, service_name in discover_instances(
+        splunk_home, module.params["instance_paths"]
+    ):
+        install_method = (
+            "rpm"
+            if instance_home == SPLUNK_HOME and not os.path.islink(instance_home)
+            else "tarball"
+        )
+        # The forward servers of splunk_home were already listed for the top level values
+        forward_servers = (
+            result["forward_servers"] if instance_home == splunk_home else None
+        )
+        result["instances"].append(
+            get_instance_info(
+                module,
+                instance_home,
+                service_name,
+                install_method,
+                username,
+                password,
+                forward_servers,
+            ),
+        )
 
-    forward_servers = get_forward_servers(module, splunk_home, username, password)
-    result["forward_servers"] = forward_servers
+    module.exit_json(**result)
 
-    deployment_server = get_deployment_server(module, splunk_home)
-    result["deployment_server"] = deployment_server if deployment_server else ""
 
-    module.exit_json(**result)
+def main() -> None:
+    run_profiled(run_module, "splunk_universal_forwarder_linux_info")
 
 
 if __name__ == "__main__":
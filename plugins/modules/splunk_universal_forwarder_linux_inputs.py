@@ -0,0 +1,541 @@
+#!/usr/bin/python
+
+# Copyright (c) Ansible Project
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = r"""
+module: splunk_universal_forwarder_linux_inputs
+
+short_description: Manage file monitor inputs of Splunk Universal Forwarder on RHEL systems
+
+description:
+  - This module manages C([monitor://<path>]) and C([batch://<path>]) stanzas of C(inputs.conf) of a Splunk Universal Forwarder
+    installed on RHEL 8, 9, and 10 systems.
+  - All the inputs are written in one update of the file, and applied with one reload of the monitor inputs.
+  - Estimates the number of files each monitor input tracks with a bounded directory scan, and warns about inputs
+    that make the tailing processor scan large directory trees.
+
+version_added: "1.0.0"
+
+author:
+  - Shahar Golshani (@shahargolshani)
+
+attributes:
+  check_mode:
+    description: The module supports check mode and will report what changes would be made without actually making them.
+    support: full
+  diff_mode:
+    description: The module does not support diff mode.
+    support: none
+
+options:
+  inputs:
+    description:
+      - File monitor and batch inputs to manage.
+      - Only the settings that are specified are managed, the others keep their current value.
+    type: list
+    elements: dict
+    required: true
+    suboptions:
+      path:
+        description:
+          - File or directory to read, may contain the V(*) and V(...) wildcards of Splunk monitor paths.
+        type: str
+        required: true
+      type:
+        description:
+          - V(monitor) tails the files and keeps reading new data.
+          - V(batch) indexes the files once and deletes them, C(move_policy = sinkhole) is set automatically.
+        type: str
+        choices: ['monitor', 'batch']
+        default: monitor
+      state:
+        description:
+          - V(absent) removes the stanza of the input.
+        type: str
+        choices: ['present', 'absent']
+        default: present
+      index:
+        description:
+          - Index to send the data to, C(index).
+        type: str
+      sourcetype:
+        description:
+          - Source type of the data, C(sourcetype).
+        type: str
+      ignore_older_than:
+        description:
+          - Skip the files that were not modified within this duration, C(ignoreOlderThan), for example V(7d).
+          - Files that are skipped are not counted by the scan estimate.
+        type: str
+      whitelist:
+        description:
+          - Regular expression the full path of a file must match to be read, C(whitelist).
+        type: str
+      blacklist:
+        description:
+          - Regular expression of full paths of files to skip, C(blacklist).
+        type: str
+      recursive:
+        description:
+          - Read the files of the subdirectories, C(recursive).
+        type: bool
+      follow_tail:
+        description:
+          - Start reading new files at their end, C(followTail). Only for V(monitor) inputs.
+        type: bool
+      crc_salt:
+        description:
+          - Value added to the CRC of the file headers, C(crcSalt). V(<SOURCE>) adds the full path of the file.
+        type: str
+      disabled:
+        description:
+          - Disable the input, C(disabled).
+        type: bool
+
+  exclusive:
+    description:
+      - Remove the C([monitor://]) and C([batch://]) stanzas of the managed C(inputs.conf) that are not in O(inputs).
+    type: bool
+    default: false
+
+  app:
+    description:
+      - Write the inputs to C($SPLUNK_HOME/etc/apps/<app>/local/inputs.conf) instead of
+        C($SPLUNK_HOME/etc/system/local/inputs.conf).
+    type: str
+
+  splunk_home:
+    description:
+      - Installation directory of the forwarder instance to configure.
+    type: path
+    default: /opt/splunkforwarder
+
+  scan_file_limit:
+    description:
+      - Warn when a monitor input would track more than this number of files.
+      - The scan stops after this number of files, or after ten times as many directory entries, so its cost is bounded
+        even on very large trees.
+      - V(0) disables the scan.
+    type: int
+    default: 10000
+
+  username:
+    description:
+      - Username for the Splunk admin account, used to reload the monitor inputs.
+    type: str
+    required: true
+
+  password:
+    description:
+      - Password for the Splunk admin account, used to reload the monitor inputs.
+    type: str
+    required: true
+
+  command_trace:
+    description:
+      - Record every command run by the module and return the records in RV(command_trace).
+      - Each record contains the command argv with credentials redacted, the start offset and duration
+        in seconds, the return code and the size of stdout and stderr in bytes.
+    type: bool
+    default: false
+
+  command_trace_path:
+    description:
+      - Path of a file on the target host to append the command trace to as JSON lines.
+      - Each line holds one command record, plus the process id of the module run.
+      - Can be used independently of O(command_trace).
+    type: path
+
+notes:
+  - This module only works on RHEL 8, 9, and 10 systems.
+  - Splunk Universal Forwarder is expected to be installed in V(/opt/splunkforwarder) with RPM package,
+    or in O(splunk_home).
+  - The changes are applied by reloading the monitor inputs of the running splunkd. When the reload fails, Splunk is restarted.
+    When splunkd is not running, the changes are applied on its next start.
+  - Set the E(SPLUNK_UF_PROFILE_DIR) environment variable to profile the module run with cProfile. A V(.pstats) file and a V(.txt)
+    summary of the top E(SPLUNK_UF_PROFILE_TOP) functions (default V(25)) by cumulative time are written to that directory on the target.
+"""
+
+EXAMPLES = r"""
+- name: Monitor the application logs of the last week
+  splunk.enterprise.splunk_universal_forwarder_linux_inputs:
+    username: admin
+    password: "changeme123"
+    inputs:
+      - path: /var/log/app
+        index: app
+        sourcetype: app:log
+        whitelist: '\.log$'
+        ignore_older_than: 7d
+      - path: /var/log/secure
+        index: security
+        sourcetype: linux_secure
+
+- name: Index dropped files once and delete them
+  splunk.enterprise.splunk_universal_forwarder_linux_inputs:
+    username: admin
+    password: "changeme123"
+    app: batch_uploads
+    inputs:
+      - path: /var/spool/splunk/drop
+        type: batch
+        index: uploads
+
+- name: Remove an input and every other unmanaged file input
+  splunk.enterprise.splunk_universal_forwarder_linux_inputs:
+    username: admin
+    password: "changeme123"
+    exclusive: true
+    inputs:
+      - path: /var/log/messages
+        sourcetype: syslog
+      - path: /var/log/old_app
+        state: absent
+"""
+
+RETURN = r"""
+conf_changes:
+  description:
+    - Settings changed in C(inputs.conf), with their effective value before and after the change.
+    - In check mode, the settings that would be changed.
+  type: list
+  elements: dict
+  returned: always
+  sample: [{"file": "inputs.conf", "stanza": "monitor:///var/log/app", "key": "ignoreOlderThan", "before": null, "after": "7d"}]
+
+scan_estimates:
+  description:
+    - Number of files each present monitor input would track, from a bounded scan of its path.
+    - C(truncated) is V(true) when the scan stopped at its limit, the input then tracks at least C(files) files.
+      The scan stops after more than O(scan_file_limit) files, or after ten times as many directory entries
+      when most of them are filtered out or are directories.
+  type: list
+  elements: dict
+  returned: when O(scan_file_limit) is not V(0)
+  sample: [{"stanza": "monitor:///var/log/app", "files": 120, "truncated": false}]
+
+applied_by:
+  description: How the changes were applied to the running splunkd.
+  type: str
+  returned: when changed and not in check mode
+  sample: "reload"
+  choices: ['reload', 'restart', 'next_start']
+
+inputs_conf:
+  description: Path of the managed C(inputs.conf).
+  type: str
+  returned: always
+  sample: "/opt/splunkforwarder/etc/system/local/inputs.conf"
+
+command_trace:
+  description: Commands run by the module, in execution order.
+  type: list
+  elements: dict
+  returned: when O(command_trace=true)
+  sample: [{"argv": ["/opt/splunkforwarder/bin/splunk", "_internal", "call", "/services/data/inputs/monitor/_reload", "-method", "POST"], "start": 0.012, "duration": 0.611, "rc": 0, "stdout_bytes": 120, "stderr_bytes": 0}]
+"""
+
+
+import os
+import re
+import time
+from collections import deque
+
+from ansible.module_utils.basic import AnsibleModule
+
+from ..module_utils.splunk_uf_linux_utils import (
+    apply_conf_settings,
+    check_rhel_version,
+    enable_command_trace,
+    format_conf_value,
+    get_conf_dirs,
+    get_conf_layer_dirs,
+    parse_conf_duration,
+    read_conf,
+    reload_or_restart,
+    run_profiled,
+)
+
+SPLUNK_HOME = "/opt/splunkforwarder"
+# Directory entries visited per allowed file before the scan estimate gives up
+SCAN_ENTRY_FACTOR = 10
+
+# Map of the input suboptions to the keys of their inputs.conf stanza
+INPUT_SETTINGS_KEYS = {
+    "index": "index",
+    "sourcetype": "sourcetype",
+    "ignore_older_than": "ignoreOlderThan",
+    "whitelist": "whitelist",
+    "blacklist": "blacklist",
+    "recursive": "recursive",
+    "follow_tail": "followTail",
+    "crc_salt": "crcSalt",
+    "disabled": "disabled",
+}
+FILE_INPUT_TYPES = ["monitor", "batch"]
+
+
+def build_input_stanza(module: AnsibleModule, input_spec: dict) -> tuple:
+    """Return the stanza name and settings of an input, None settings when absent."""
+    path = input_spec["path"].rstrip("/") or "/"
+    if not os.path.isabs(path):
+        module.fail_json(msg=f"Input path '{path}' must be absolute")
+    stanza_name = f"{input_spec['type']}://{path}"
+    if input_spec["state"] == "absent":
+        return stanza_name, None
+    if input_spec["type"] == "batch" and input_spec["follow_tail"] is not None:
+        module.fail_json(msg=f"follow_tail is not supported by the batch input {path}")
+    if input_spec["ignore_older_than"] is not None:
+        try:
+            parse_conf_duration(input_spec["ignore_older_than"])
+        except ValueError as e:
+            module.fail_json(msg=f"Invalid ignore_older_than of input {path}: {str(e)}")
+    for option in ("whitelist", "blacklist"):
+        if input_spec[option] is not None:
+            try:
+                re.compile(input_spec[option])
+            except re.error as e:
+                module.fail_json(msg=f"Invalid {option} of input {path}: {str(e)}")
+    stanza = {
+        conf_key: format_conf_value(input_spec[option])
+        for option, conf_key in INPUT_SETTINGS_KEYS.items()
+        if input_spec[option] is not None
+    }
+    if input_spec["type"] == "batch":
+        stanza["move_policy"] = "sinkhole"
+    return stanza_name, stanza
+
+
+def build_inputs_settings(
+    module: AnsibleModule, inputs: list, exclusive: bool, local_dir: str
+) -> dict:
+    """Map the inputs option to inputs.conf stanzas."""
+    stanzas = {}
+    for input_spec in inputs:
+        stanza_name, stanza = build_input_stanza(module, input_spec)
+        if stanza_name in stanzas:
+            module.fail_json(msg=f"Duplicate input [{stanza_name}]")
+        stanzas[stanza_name] = stanza
+    if exclusive:
+        for existing in read_conf(os.path.join(local_dir, "inputs.conf")):
+            if (
+                existing.split("://", 1)[0] in FILE_INPUT_TYPES
+                and existing not in stanzas
+            ):
+                stanzas[existing] = None
+    return {"inputs.conf": stanzas}
+
+
+def monitor_path_regex(path: str):
+    """Translate a monitor path with * and ... wildcards to a regex of full paths."""
+    pattern = ""
+    for part in re.split(r"(\.\.\.|\*)", path):
+        if part == "...":
+            pattern += ".*"
+        elif part == "*":
+            pattern += "[^/]*"
+        else:
+            pattern += re.escape(part)
+    return re.compile(pattern + "(/.*)?$")
+
+
+def estimate_monitored_files(stanza: dict, path: str, limit: int, now=None) -> dict:
+    """Count the files a monitor input tracks, stopping after limit files.
+
+    The walk is breadth first with os.scandir and visits at most
+    SCAN_ENTRY_FACTOR times limit directory entries, so the cost is bounded
+    on huge trees. Files filtered out by whitelist, blacklist and
+    ignoreOlderThan are not counted.
+    """
+    wildcard = re.search(r"\*|\.\.\.", path)
+    if wildcard:
+        base = os.path.dirname(path[: wildcard.start()]) or "/"
+        path_regex = monitor_path_regex(path)
+        recursive = True
+    else:
+        base = path
+        path_regex = None
+        recursive = stanza.get("recursive", "true").lower() not in (
+            "false",
+            "0",
+            "no",
+            "f",
+        )
+    whitelist = re.compile(stanza["whitelist"]) if stanza.get("whitelist") else None
+    blacklist = re.compile(stanza["blacklist"]) if stanza.get("blacklist") else None
+    cutoff = None
+    if stanza.get("ignoreOlderThan"):
+        cutoff = (now or time.time()) - parse_conf_duration(stanza["ignoreOlderThan"])
+
+    def counted(file_path: str, mtime) -> bool:
+        if path_regex and not path_regex.match(file_path):
+            return False
+        if whitelist and not whitelist.search(file_path):
+            return False
+        if blacklist and blacklist.search(file_path):
+            return False
+        if cutoff is not None and mtime is not None and mtime < cutoff:
+            return False
+        return True
+
+    files = 0
+    if os.path.isfile(base):
+        files = (
+            1
+            if counted(base, os.path.getmtime(base) if cutoff is not None else None)
+            else 0
+        )
+        return dict(files=files, truncated=False)
+
+    entries = 0
+    max_entries = limit * SCAN_ENTRY_FACTOR
+    pending = deque([base])
+    while pending:
+        directory = pending.popleft()
+        try:
+            iterator = os.scandir(directory)
+        except OSError:
+            continue
+        with iterator:
+            for entry in iterator:
+                entries += 1
+                if files > limit or entries > max_entries:
+                    return dict(files=files, truncated=True)
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive:
+                            pending.append(entry.path)
+                    elif entry.is_file():
+                        mtime = entry.stat().st_mtime if cutoff is not None else None
+                        if counted(entry.path, mtime):
+                            files += 1
+                except OSError:
+                    continue
+    return dict(files=files, truncated=False)
+
+
+def run_module() -> None:
+    module = AnsibleModule(
+        argument_spec=dict(
+            inputs=dict(
+                type="list",
+                elements="dict",
+                required=True,
+                options=dict(
+                    path=dict(type="str", required=True),
+                    type=dict(type="str", default="monitor", choices=FILE_INPUT_TYPES),
+                    state=dict(
+                        type="str", default="present", choices=["present", "absent"]
+                    ),
+                    index=dict(type="str"),
+                    sourcetype=dict(type="str"),
+                    ignore_older_than=dict(type="str"),
+                    whitelist=dict(type="str"),
+                    blacklist=dict(type="str"),
+                    recursive=dict(type="bool"),
+                    follow_tail=dict(type="bool"),
+                    crc_salt=dict(type="str"),
+                    disabled=dict(type="bool"),
+                ),
+            ),
+            exclusive=dict(type="bool", default=False),
+            app=dict(type="str"),
+            splunk_home=dict(type="path", default=SPLUNK_HOME),
+            scan_file_limit=dict(type="int", default=10000),
+            username=dict(type="str", required=True),
+            password=dict(type="str", no_log=True, required=True),
+            command_trace=dict(type="bool", default=False),
+            command_trace_path=dict(type="path"),
+        ),
+        supports_check_mode=True,
+    )
+
+    enable_command_trace(
+        module,
+        module.params["command_trace"],
+        module.params["command_trace_path"],
+    )
+
+    splunk_home = module.params["splunk_home"]
+    app = module.params["app"]
+    scan_file_limit = module.params["scan_file_limit"]
+
+    if not os.path.exists(os.path.join(splunk_home, "bin", "splunk")):
+        module.fail_json(
+            msg=f"Splunk Universal Forwarder is not installed in {splunk_home}"
+        )
+    if app and (app in (".", "..") or "/" in app):
+        module.fail_json(msg=f"Invalid app name '{app}'")
+
+    rhel_version = check_rhel_version(module)
+    module.log(f"RHEL version: {rhel_version}")
+
+    local_dir, default_dir = get_conf_dirs(splunk_home, app)
+    result = dict(
+        changed=False,
+        inputs_conf=os.path.join(local_dir, "inputs.conf"),
+    )
+
+    conf_settings = build_inputs_settings(
+        module,
+        module.params["inputs"],
+        module.params["exclusive"],
+        local_dir,
+    )
+
+    if scan_file_limit:
+        result["scan_estimates"] = []
+        current = read_conf(result["inputs_conf"])
+        for stanza_name, stanza in conf_settings["inputs.conf"].items():
+            if stanza is None or not stanza_name.startswith("monitor://"):
+                continue
+            # Settings that are not managed keep filtering the files
+            effective = dict(current.get(stanza_name, {}), **stanza)
+            estimate = estimate_monitored_files(
+                effective, stanza_name.split("://", 1)[1], scan_file_limit
+            )
+            result["scan_estimates"].append(dict(estimate, stanza=stanza_name))
+            if estimate["files"] > scan_file_limit:
+                module.warn(
+                    f"[{stanza_name}] tracks more than {scan_file_limit} files, "
+                    "narrow it with whitelist, blacklist or ignore_older_than",
+                )
+            elif estimate["truncated"]:
+                # The entry budget ran out before the file limit was reached
+                module.warn(
+                    f"[{stanza_name}] has more than {scan_file_limit * SCAN_ENTRY_FACTOR} "
+                    f"entries to scan, {estimate['files']} tracked files were counted "
+                    "before the scan stopped, narrow it with whitelist, blacklist or "
+                    "ignore_older_than",
+                )
+
+    # The inputs of etc/system/local override every app, those of an app only its defaults
+    default_dirs = [default_dir] if app else get_conf_layer_dirs(splunk_home)
+    conf_changes = apply_conf_settings(module, local_dir, conf_settings, default_dirs)
+    result["conf_changes"] = conf_changes
+    if conf_changes:
+        result["changed"] = True
+        if not module.check_mode:
+            result["applied_by"] = reload_or_restart(
+                module,
+                splunk_home,
+                conf_changes,
+                module.params["username"],
+                module.params["password"],
+            )
+
+    module.exit_json(**result)
+
+
+def main() -> None:
+    run_profiled(run_module, "splunk_universal_forwarder_linux_inputs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+# Copyright (c) Ansible Project
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""Helpers shared by the benchmark fixtures and benchmarks."""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import contextlib
+import functools
+import hashlib
+import http.server
+import io
+import json
+import os
+import sys
+import tarfile
+import threading
+import time
+from pathlib import Path
+
+FAKE_CLI = Path(__file__).resolve().parent / "fakes" / "fake_cli.py"
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@contextlib.contextmanager
+def serve_directory(directory: Path, handler=QuietHandler):
+    """Serve a directory over HTTP on a random local port."""
+    server = http.server.ThreadingHTTPServer(
+        ("127.0.0.1", 0),
+        functools.partial(handler, directory=str(directory)),
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def write_wrapper(path: Path, tool: str) -> None:
+    path.write_text(
+        f'#!/bin/sh\nFAKE_SELF="$0" exec "{sys.executable}" "{FAKE_CLI}" {tool} "$@"\n'
+    )
+    path.chmod(0o755)
+
+
+def run_main(module, args: dict):
+    """Run a module entry point in-process and return its result and wall time."""
+    from ansible.module_utils import basic
+
+    try:
+        from ansible.module_utils.testing import patch_module_args
+    except ImportError:
+
+        @contextlib.contextmanager
+        def patch_module_args(module_args):
+            buffer = json.dumps(dict(ANSIBLE_MODULE_ARGS=module_args)).encode()
+            original = basic._ANSIBLE_ARGS
+            basic._ANSIBLE_ARGS = buffer
+            try:
+                yield
+            finally:
+                basic._ANSIBLE_ARGS = original
+
+    stdout = io.StringIO()
+    start = time.perf_counter()
+    with patch_module_args(args), contextlib.redirect_stdout(stdout):
+        try:
+            module.main()
+        except SystemExit:
+            pass
+    wall = time.perf_counter() - start
+    output = stdout.getvalue().strip().splitlines()
+    return json.loads(output[-1]), wall
+
+
+class FakeHost:
+    """A simulated RHEL host with fake rpm, splunk, systemctl and systemd-run executables."""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.splunk_home = root / "opt" / "splunkforwarder"
+        self.download_dir = root / "opt"
+        self.artifacts = root / "artifacts"
+        self.bin_dir = root / "bin"
+        self.proc_dir = root / "proc"
+        self.systemd_dir = root / "etc" / "systemd" / "system"
+        self.state_path = root / "state.json"
+        self.sleeps = []
+        # KB sent to the indexer in each metrics sample written while the module sleeps, 0 when not forwarding
+        self.forwarding_kb = 0
+        for path in (
+            self.splunk_home,
+            self.artifacts,
+            self.bin_dir,
+            self.proc_dir / "pressure",
+            self.systemd_dir,
+        ):
+            path.mkdir(parents=True, exist_ok=True)
+        for tool in ("rpm", "systemctl", "systemd-run"):
+            write_wrapper(self.bin_dir / tool, tool)
+        self.splunk_wrapper = root / "splunk"
+        write_wrapper(self.splunk_wrapper, "splunk")
+        self.save_state(
+            dict(
+                installed=False,
+                version=None,
+                release=None,
+                arch=None,
+                running=False,
+                boot_start=False,
+                forward_servers=[],
+            ),
+        )
+        self.set_load(0.0)
+
+    def set_load(
+        self, loadavg: float, cpu_pressure: float = 0.0, io_pressure: float = 0.0
+    ) -> None:
+        """Write the load average and the pressure stall information of the host."""
+        (self.proc_dir / "loadavg").write_text(
+            f"{loadavg:.2f} {loadavg:.2f} {loadavg:.2f} 2/512 4242\n"
+        )
+        for resource, value in (("cpu", cpu_pressure), ("io", io_pressure)):
+            (self.proc_dir / "pressure" / resource).write_text(
+                f"some avg10={value:.2f} avg60={value:.2f} avg300={value:.2f} total=123456\n"
+                "full avg10=0.00 avg60=0.00 avg300=0.00 total=0\n",
+            )
+
+    @property
+    def state(self) -> dict:
+        with open(self.state_path, "r") as f:
+            return json.load(f)
+
+    def save_state(self, state: dict) -> None:
+        with open(self.state_path, "w") as f:
+            json.dump(state, f)
+
+    def publish(self, version: str, release: str, arch: str = "x86_64") -> None:
+        """Publish an artifact and its checksum on the download server."""
+        filename = f"splunkforwarder-{version}-{release}.{arch}.rpm"
+        target = self.artifacts / version / "linux"
+        target.mkdir(parents=True, exist_ok=True)
+        content = json.dumps(dict(version=version, release=release, arch=arch)).encode()
+        (target / filename).write_bytes(content)
+        digest = hashlib.sha512(content).hexdigest()
+        (target / f"{filename}.sha512").write_text(f"SHA512({filename})= {digest}\n")
+
+    def publish_tarball(self, version: str, release: str) -> None:
+        """Publish a tarball with the fake splunk executable and its checksum on the download server."""
+        filename = f"splunkforwarder-{version}-{release}-linux-amd64.tgz"
+        target = self.artifacts / version / "linux"
+        target.mkdir(parents=True, exist_ok=True)
+        files = {
+            "bin/splunk": (self.splunk_wrapper.read_bytes(), 0o755),
+            "etc/splunk.version": (
+                f"VERSION={version}\nBUILD={release}\n".encode(),
+                0o644,
+            ),
+            "etc/system/default/server.conf": (
+                f"[general]\n# {version}\n".encode(),
+                0o644,
+            ),
+        }
+        with tarfile.open(target / filename, "w:gz") as tar:
+            for name, (content, mode) in files.items():
+                info = tarfile.TarInfo(f"splunkforwarder/{name}")
+                info.size = len(content)
+                info.mode = mode
+                tar.addfile(info, io.BytesIO(content))
+        digest = hashlib.sha512((target / filename).read_bytes()).hexdigest()
+        (target / f"{filename}.sha512").write_text(f"SHA512({filename})= {digest}\n")
+
+    def write_pid_file(self, home: Path) -> None:
+        """Record the benchmark process as the running splunkd of an instance."""
+        run_dir = home / "var" / "run" / "splunk"
+        run_dir.mkdir(parents=True, exist_ok=True)
+        (run_dir / "splunkd.pid").write_text(f"{os.getpid()}\n")
+
+    def seed_tarball_installed(self, version: str, release: str) -> Path:
+        """Put the host in the state left by a tarball install, with local settings and a fishbucket."""
+        install_dir = self.splunk_home.parent / f"{self.splunk_home.name}-{version}"
+        (install_dir / "bin").mkdir(parents=True)
+        (install_dir / "bin" / "splunk").write_bytes(self.splunk_wrapper.read_bytes())
+        (install_dir / "bin" / "splunk").chmod(0o755)
+        local_dir = install_dir / "etc" / "system" / "local"
+        local_dir.mkdir(parents=True)
+        (install_dir / "etc" / "splunk.version").write_text(
+            f"VERSION={version}\nBUILD={release}\n"
+        )
+        (install_dir / "etc" / "passwd").write_text(":admin:x::\n")
+        (local_dir / "outputs.conf").write_text("[tcpout]\ndefaultGroup = default\n")
+        fishbucket = (
+            install_dir / "var" / "lib" / "splunk" / "fishbucket" / "splunk_private_db"
+        )
+        fishbucket.mkdir(parents=True)
+        (fishbucket / "btree_records.dat").write_bytes(b"\0" * 4096)
+        self.splunk_home.rmdir()
+        self.splunk_home.symlink_to(install_dir)
+        self.write_pid_file(install_dir)
+        state = self.state
+        state.update(running=True, boot_start=True)
+        self.save_state(state)
+        return install_dir
+
+    def seed_installed(self, version: str, release: str, forward_servers=None) -> None:
+        """Put the host in the state left by a previous successful install."""
+        bin_dir = self.splunk_home / "bin"
+        bin_dir.mkdir(parents=True, exist_ok=True)
+        (bin_dir / "splunk").write_bytes(self.splunk_wrapper.read_bytes())
+        (bin_dir / "splunk").chmod(0o755)
+        (self.splunk_home / "etc").mkdir(parents=True, exist_ok=True)
+        (self.splunk_home / "etc" / "passwd").write_text(":admin:x::\n")
+        self.write_pid_file(self.splunk_home)
+        state = self.state
+        state.update(
+            installed=True,
+            version=version,
+            release=release,
+            arch="x86_64",
+            running=True,
+            boot_start=True,
+            forward_servers=list(forward_servers or []),
+        )
+        self.save_state(state)
+
+    def record_sleep(self, seconds) -> None:
+        self.sleeps.append(seconds)
+        if self.forwarding_kb and self.state["running"]:
+            # splunkd writes its metrics samples while the module waits
+            log_dir = self.splunk_home / "var" / "log" / "splunk"
+            log_dir.mkdir(parents=True, exist_ok=True)
+            with open(log_dir / "metrics.log", "a") as f:
+                f.write(
+                    "10-19-2026 10:00:00.000 +0000 INFO  Metrics - group=tcpout_connections, "
+                    "name=default-autolb-group:10.0.0.1:9997:0, sourcePort=8089, destIp=10.0.0.1, destPort=9997, "
+                    f"_tcp_Bps=1530.13, _tcp_KBps=1.49, _tcp_avg_thruput=1.49, kb={self.forwarding_kb}\n",
+                )
+
+
+def measure(func, min_rounds: int = 5, max_time: float = 0.5) -> dict:
+    """Call func repeatedly and return timing statistics in seconds."""
+    timings = []
+    deadline = time.perf_counter() + max_time
+    while len(timings) < min_rounds or time.perf_counter() < deadline:
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return dict(
+        rounds=len(timings),
+        min_s=round(timings[0], 6),
+        median_s=round(timings[len(timings) // 2], 6),
+        mean_s=round(sum(timings) / len(timings), 6),
+    )
@@ -0,0 +1,158 @@
+# Copyright (c) Ansible Project
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""Shared fixtures for the performance benchmark suite.
+
+The suite is opt-in so that unit test runs stay fast: its tests are skipped
+unless SPLUNK_UF_BENCH=1 is set. Benchmarks record their metrics through the ``bench_record`` fixture. The
+collected results are written as JSON to the path in SPLUNK_UF_BENCH_RESULTS
+at the end of the session, and gated metrics are compared against
+``baseline.json``. Set SPLUNK_UF_BENCH_UPDATE_BASELINE=1 to rewrite the
+baseline from the current run instead of comparing against it.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import json
+import os
+import platform
+import time
+from pathlib import Path
+
+import pytest
+from bench_helpers import FakeHost, serve_directory
+
+BENCH_DIR = Path(__file__).resolve().parent
+BASELINE_PATH = BENCH_DIR / "baseline.json"
+
+# Latency multiplier applied to the simulated commands, 1.0 is a real host
+LATENCY_SCALE = float(os.environ.get("SPLUNK_UF_BENCH_LATENCY_SCALE", "0.01"))
+# Allowed relative wall time regression, on top of an absolute slack in seconds
+WALL_TOLERANCE = float(os.environ.get("SPLUNK_UF_BENCH_WALL_TOLERANCE", "1.0"))
+WALL_SLACK = 0.5
+UPDATE_BASELINE = os.environ.get("SPLUNK_UF_BENCH_UPDATE_BASELINE") == "1"
+RUN_BENCHMARKS = os.environ.get("SPLUNK_UF_BENCH") == "1" or UPDATE_BASELINE
+# Metrics that do not depend on the speed of the machine are compared exactly
+EXACT_METRICS = ["subprocesses", "sleep_s"]
+
+
+def pytest_collection_modifyitems(config, items):
+    """Skip the benchmarks unless they are requested."""
+    if RUN_BENCHMARKS:
+        return
+    skip = pytest.mark.skip(reason="set SPLUNK_UF_BENCH=1 to run the benchmarks")
+    for item in items:
+        if BENCH_DIR in Path(str(item.fspath)).resolve().parents:
+            item.add_marker(skip)
+
+
+def load_baseline() -> dict:
+    if not BASELINE_PATH.exists():
+        return {}
+    with open(BASELINE_PATH, "r") as f:
+        return json.load(f)
+
+
+@pytest.fixture(scope="session")
+def bench_results():
+    """Collect benchmark metrics for the whole session."""
+    results = {}
+    yield results
+    baseline = load_baseline()
+    if UPDATE_BASELINE and results:
+        for name, metrics in results.items():
+            gated = {k: v for k, v in metrics.items() if k in metrics.get("gated", [])}
+            if gated:
+                baseline[name] = gated
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(dict(sorted(baseline.items())), f, indent=2)
+            f.write("\n")
+    results_path = os.environ.get("SPLUNK_UF_BENCH_RESULTS")
+    if results_path:
+        with open(results_path, "w") as f:
+            json.dump(
+                dict(
+                    timestamp=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                    python=platform.python_version(),
+                    platform=platform.platform(),
+                    latency_scale=LATENCY_SCALE,
+                    results=results,
+                ),
+                f,
+                indent=2,
+            )
+
+
+def check_regression(name: str, metrics: dict, gated: list) -> list:
+    """Compare gated metrics against the baseline and return the regressions."""
+    expected = load_baseline().get(name)
+    if UPDATE_BASELINE or not expected:
+        return []
+    regressions = []
+    for key in gated:
+        if key not in expected:
+            continue
+        limit = expected[key]
+        if key not in EXACT_METRICS:
+            limit = round(expected[key] * (1 + WALL_TOLERANCE) + WALL_SLACK, 6)
+        if metrics[key] > limit:
+            regressions.append(
+                f"{key}: {metrics[key]} > {limit} (baseline {expected[key]})"
+            )
+    return regressions
+
+
+@pytest.fixture
+def bench_record(bench_results):
+    """Record the metrics of a benchmark and fail on a baseline regression."""
+
+    def record(name: str, gated=None, **metrics):
+        gated = list(gated or [])
+        bench_results[name] = dict(metrics, gated=gated)
+        regressions = check_regression(name, metrics, gated)
+        if regressions:
+            pytest.fail(f"Performance regression in {name}: " + "; ".join(regressions))
+
+    return record
+
+
+@pytest.fixture
+def fake_host(tmp_path, monkeypatch):
+    """Point the Linux modules at a simulated host and a local artifact server."""
+    from plugins.module_utils import splunk_uf_linux_utils as utils
+    from plugins.modules import splunk_conf as conf_module
+    from plugins.modules import splunk_universal_forwarder_linux as linux_module
+    from plugins.modules import splunk_universal_forwarder_linux_info as info_module
+    from plugins.modules import splunk_universal_forwarder_linux_inputs as inputs_module
+
+    host = FakeHost(tmp_path)
+    monkeypatch.setenv(
+        "PATH", f"{host.bin_dir}{os.pathsep}{os.environ.get('PATH', '')}"
+    )
+    monkeypatch.setenv("FAKE_STATE", str(host.state_path))
+    monkeypatch.setenv("FAKE_SPLUNK_HOME", str(host.splunk_home))
+    monkeypatch.setenv("FAKE_SPLUNK_WRAPPER", str(host.splunk_wrapper))
+    monkeypatch.setenv("FAKE_SYSTEMD_DIR", str(host.systemd_dir))
+    monkeypatch.setenv("FAKE_LATENCY_SCALE", str(LATENCY_SCALE))
+    monkeypatch.setenv("SPLUNK_HOME", str(host.splunk_home))
+    monkeypatch.setenv("no_proxy", "127.0.0.1,localhost")
+    monkeypatch.setenv("NO_PROXY", "127.0.0.1,localhost")
+    # The modules wait for splunkd with fixed sleeps, record them instead
+    monkeypatch.setattr(time, "sleep", host.record_sleep)
+    monkeypatch.setattr(utils, "LOADAVG_PATH", str(host.proc_dir / "loadavg"))
+    monkeypatch.setattr(utils, "PRESSURE_DIR", str(host.proc_dir / "pressure"))
+    monkeypatch.setattr(utils, "SYSTEMD_UNIT_DIR", str(host.systemd_dir))
+    for module in (linux_module, info_module, conf_module, inputs_module):
+        monkeypatch.setattr(module, "SPLUNK_HOME", str(host.splunk_home))
+        monkeypatch.setattr(module, "check_rhel_version", lambda module: "9")
+    monkeypatch.setattr(linux_module, "DOWNLOAD_DIR", str(host.download_dir))
+    with serve_directory(host.artifacts) as url:
+        monkeypatch.setattr(linux_module, "DOWNLOAD_BASE_URL", url)
+        host.linux_module = linux_module
+        host.info_module = info_module
+        host.inputs_module = inputs_module
+        host.conf_module = conf_module
+        yield host
@@ -0,0 +1,70 @@
+# Copyright (c) Ansible Project
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""Run the module download-and-verify path in a fresh interpreter.
+
+Usage: download_probe.py <artifact url> <destination dir> <chunk size>
+
+Prints a JSON object with the download and verification times and the peak
+resident set size of the process before and after the transfer, so that the
+memory cost of the download is not hidden by the benchmark runner.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import json
+import os
+import resource
+import sys
+import time
+
+from plugins.modules.splunk_universal_forwarder_linux import (
+    download_file,
+    verify_checksum,
+)
+
+
+class ProbeModule:
+    check_mode = False
+
+    def log(self, msg):
+        pass
+
+    def warn(self, msg):
+        pass
+
+    def fail_json(self, msg, **kwargs):
+        print(json.dumps(dict(failed=True, msg=msg)))
+        sys.exit(1)
+
+
+def main() -> None:
+    url, dest_dir, chunk_size = sys.argv[1], sys.argv[2], int(sys.argv[3])
+    module = ProbeModule()
+    rpm_path = os.path.join(dest_dir, os.path.basename(url))
+    checksum_path = f"{rpm_path}.sha512"
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    download_file(module, url, rpm_path, chunk_size=chunk_size)
+    download_file(module, f"{url}.sha512", checksum_path)
+    downloaded = time.perf_counter()
+    verify_checksum(module, rpm_path, checksum_path)
+    verified = time.perf_counter()
+    print(
+        json.dumps(
+            dict(
+                failed=False,
+                download_s=round(downloaded - start, 4),
+                time_to_verified_s=round(verified - start, 4),
+                rss_before_kb=rss_before,
+                rss_peak_kb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            ),
+        ),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+# Copyright (c) Ansible Project
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""Simulated rpm, splunk, systemctl and systemd-run executables for the benchmark suite.
+
+Invoked as ``fake_cli.py <tool> [args...]`` by the wrapper scripts the
+benchmark fixtures place on PATH. The simulated host state is kept in the JSON
+file named by FAKE_STATE, and the Splunk installation lives in
+FAKE_SPLUNK_HOME. A splunk executable copied into another installation
+directory, as named by FAKE_SELF, acts on that instance, with its own state
+under "instances". Unit files of boot-start are written to FAKE_SYSTEMD_DIR.
+Every call sleeps for a per-command latency multiplied by
+FAKE_LATENCY_SCALE so that the relative cost of each CLI call resembles a real
+host.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import base64
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+import uuid
+
+# Approximate latencies, in seconds, of the real commands on an idle host
+LATENCIES = {
+    ("rpm", "-qa"): 0.25,
+    ("rpm", "-q"): 0.15,
+    ("rpm", "-i"): 6.0,
+    ("rpm", "-e"): 3.0,
+    ("splunk", "start"): 6.0,
+    ("splunk", "stop"): 3.0,
+    ("splunk", "restart"): 9.0,
+    ("splunk", "status"): 0.4,
+    ("splunk", "enable"): 0.8,
+    ("splunk", "disable"): 0.8,
+    ("splunk", "list"): 0.6,
+    ("splunk", "add"): 0.7,
+    ("splunk", "remove"): 0.7,
+    ("splunk", "set"): 0.7,
+    ("splunk", "show-decrypted"): 0.5,
+    ("splunk", "_internal"): 0.6,
+    ("splunk", "clone-prep-clear-config"): 0.5,
+    ("systemctl", None): 0.1,
+    ("systemd-run", None): 0.1,
+}
+
+
+def load_state() -> dict:
+    with open(os.environ["FAKE_STATE"], "r") as f:
+        return json.load(f)
+
+
+def save_state(state: dict) -> None:
+    with open(os.environ["FAKE_STATE"], "w") as f:
+        json.dump(state, f)
+
+
+def simulate_latency(tool: str, args: list) -> None:
+    command = args[0] if args else None
+    latency = LATENCIES.get((tool, command), LATENCIES.get((tool, None), 0.1))
+    time.sleep(latency * float(os.environ.get("FAKE_LATENCY_SCALE", "0")))
+
+
+def splunk_home() -> str:
+    return os.environ["FAKE_SPLUNK_HOME"]
+
+
+def instance_home() -> str:
+    """Return the installation directory of the splunk executable that was called."""
+    executable = os.environ.get("FAKE_SELF", "")
+    if not executable.endswith(os.path.join("bin", "splunk")):
+        return splunk_home()
+    return os.path.dirname(os.path.dirname(os.path.abspath(executable)))
+
+
+def instance_state(state: dict, home: str) -> dict:
+    """Return the state of the instance in home, the versioned directories of a tarball belong to their link."""
+    key = re.sub(r"-\d+(\.\d+)+$", "", home)
+    if key == splunk_home():
+        return state
+    return state.setdefault("instances", {}).setdefault(
+        key,
+        dict(running=False, boot_start=False, forward_servers=[]),
+    )
+
+
+def unit_name(home: str, args: list) -> str:
+    """Name the boot-start unit like splunk, from its flag or SPLUNK_SERVER_NAME of splunk-launch.conf."""
+    if "-systemd-unit-file-name" in args:
+        return args[args.index("-systemd-unit-file-name") + 1]
+    try:
+        with open(os.path.join(home, "etc", "splunk-launch.conf"), "r") as f:
+            match = re.search(r"^SPLUNK_SERVER_NAME\s*=\s*(\S+)", f.read(), re.M)
+    except OSError:
+        match = None
+    return match.group(1) if match else "SplunkForwarder"
+
+
+def write_pid_file(home: str, running: bool) -> None:
+    """Record the pid of a live process as splunkd, or remove the record."""
+    path = os.path.join(home, "var", "run", "splunk", "splunkd.pid")
+    if running:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(f"{os.getppid()}\n")
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def encrypt_secrets(home: str) -> None:
+    """Encrypt clear-text pass4SymmKey values on start, like splunkd does."""
+    path = os.path.join(home, "etc", "system", "local", "outputs.conf")
+    if not os.path.exists(path):
+        return
+    with open(path, "r") as f:
+        content = f.read()
+
+    def encrypt(match):
+        if match.group(2).startswith("$7$"):
+            return match.group(0)
+        return (
+            match.group(1) + "$7$" + base64.b64encode(match.group(2).encode()).decode()
+        )
+
+    with open(path, "w") as f:
+        f.write(re.sub(r"^(pass4SymmKey\s*=\s*)(.*)$", encrypt, content, flags=re.M))
+
+
+def write_instance_guid(home: str) -> None:
+    """Generate the GUID of the instance when it has none, like splunkd does on start."""
+    path = os.path.join(home, "etc", "instance.cfg")
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            if re.search(r"^guid\s*=", f.read(), flags=re.M):
+                return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(f"[general]\nguid = {uuid.uuid4()}\n")
+
+
+def remove_conf_key(path: str, key: str) -> None:
+    """Remove every line setting key from a .conf file."""
+    if not os.path.exists(path):
+        return
+    with open(path, "r") as f:
+        content = f.read()
+    with open(path, "w") as f:
+        f.write(re.sub(rf"^{key}\s*=.*\n?", "", content, flags=re.M))
+
+
+def write_forward_servers(home: str, servers: list) -> None:
+    """Write the forward servers to the default-autolb-group of outputs.conf, like splunk does."""
+    path = os.path.join(home, "etc", "system", "local", "outputs.conf")
+    content = ""
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            content = f.read()
+    content = re.sub(
+        r"^\[tcpout:default-autolb-group\]\n(?:[^\[\n].*\n?|\n)*",
+        "",
+        content,
+        flags=re.M,
+    )
+    if servers:
+        if content and not content.endswith("\n"):
+            content += "\n"
+        content += f"[tcpout:default-autolb-group]\nserver = {','.join(servers)}\n"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def rpm(args: list) -> int:
+    state = load_state()
+    package = f"splunkforwarder-{state.get('version')}-{state.get('release')}.{state.get('arch')}"
+    if args[0] == "-qa":
+        if state["installed"]:
+            print(package)
+        return 0
+    if args[0] == "-q":
+        if not state["installed"]:
+            print("package splunkforwarder is not installed")
+            return 1
+        fields = {"%{VERSION}": "version", "%{RELEASE}": "release", "%{ARCH}": "arch"}
+        output = args[2]
+        for placeholder, key in fields.items():
+            output = output.replace(placeholder, state[key])
+        sys.stdout.write(output)
+        return 0
+    if args[0] == "-i":
+        if state["installed"]:
+            sys.stderr.write(f"package {package} is already installed\n")
+            return 1
+        with open(args[1], "r") as f:
+            artifact = json.load(f)
+        bin_dir = os.path.join(splunk_home(), "bin")
+        os.makedirs(bin_dir, exist_ok=True)
+        shutil.copy(os.environ["FAKE_SPLUNK_WRAPPER"], os.path.join(bin_dir, "splunk"))
+        state.update(
+            installed=True,
+            version=artifact["version"],
+            release=artifact["release"],
+            arch=artifact["arch"],
+            running=False,
+        )
+        save_state(state)
+        return 0
+    if args[0] == "-e":
+        if not state["installed"]:
+            sys.stderr.write("error: package splunkforwarder is not installed\n")
+            return 1
+        shutil.rmtree(os.path.join(splunk_home(), "bin"), ignore_errors=True)
+        state.update(installed=False, running=False)
+        save_state(state)
+        return 0
+    sys.stderr.write(f"rpm: unsupported arguments {args}\n")
+    return 2
+
+
+def splunk(args: list) -> int:
+    state = load_state()
+    home = instance_home()
+    instance = instance_state(state, home)
+    command = args[0]
+    if command in ("start", "restart"):
+        instance["running"] = True
+        save_state(state)
+        write_pid_file(home, True)
+        write_instance_guid(home)
+        encrypt_secrets(home)
+        return 0
+    if command == "stop":
+        instance["running"] = False
+        save_state(state)
+        write_pid_file(home, False)
+        return 0
+    if command == "status":
+        if instance["running"]:
+            print("splunkd is running (PID: 4242).")
+            return 0
+        print("splunkd is not running.")
+        return 3
+    if command in ("enable", "disable") and args[1] == "boot-start":
+        instance["boot_start"] = command == "enable"
+        save_state(state)
+        systemd_dir = os.environ.get("FAKE_SYSTEMD_DIR")
+        if systemd_dir:
+            unit_path = os.path.join(systemd_dir, f"{unit_name(home, args)}.service")
+            if command == "enable":
+                with open(unit_path, "w") as f:
+                    f.write(
+                        f"[Service]\nExecStart={home}/bin/splunk _internal_launch_under_systemd\n"
+                    )
+            elif os.path.exists(unit_path):
+                os.remove(unit_path)
+        return 0
+    if command == "list" and args[1] == "forward-server":
+        print("Active forwards:")
+        print("\tNone")
+        print("Configured but inactive forwards:")
+        for server in instance["forward_servers"] or ["None"]:
+            print(f"\t{server}")
+        return 0
+    if command in ("add", "remove") and args[1] == "forward-server":
+        server = args[2]
+        if command == "add":
+            if server in instance["forward_servers"]:
+                sys.stderr.write(f"Forwarding to {server} already exists\n")
+                return 22
+            instance["forward_servers"].append(server)
+        else:
+            if server not in instance["forward_servers"]:
+                sys.stderr.write(f"Forwarding to {server} does not exist\n")
+                return 22
+            instance["forward_servers"].remove(server)
+        save_state(state)
+        write_forward_servers(home, instance["forward_servers"])
+        return 0
+    if command == "set" and args[1] == "deploy-poll":
+        local_dir = os.path.join(home, "etc", "system", "local")
+        os.makedirs(local_dir, exist_ok=True)
+        with open(os.path.join(local_dir, "deploymentclient.conf"), "w") as f:
+            f.write(f"[target-broker:deploymentServer]\ntargetUri = {args[2]}\n")
+        return 0
+    if command == "_internal" and args[1] == "call":
+        if not instance["running"]:
+            sys.stderr.write("splunkd is not running.\n")
+            return 1
+        state.setdefault("reloads", []).append(args[2])
+        save_state(state)
+        return 0
+    if command == "clone-prep-clear-config":
+        if instance["running"]:
+            sys.stderr.write(
+                "splunkd must be stopped to run clone-prep-clear-config.\n"
+            )
+            return 1
+        remove_conf_key(os.path.join(home, "etc", "instance.cfg"), "guid")
+        remove_conf_key(
+            os.path.join(home, "etc", "system", "local", "server.conf"), "serverName"
+        )
+        remove_conf_key(
+            os.path.join(home, "etc", "system", "local", "inputs.conf"), "host"
+        )
+        return 0
+    if command == "show-decrypted" and args[1] == "--value":
+        print(base64.b64decode(args[2].removeprefix("$7$")).decode())
+        return 0
+    sys.stderr.write(f"splunk: unsupported arguments {args}\n")
+    return 2
+
+
+def systemctl(args: list) -> int:
+    return 0
+
+
+def systemd_run(args: list) -> int:
+    """Start the command of a transient service and return without waiting for it, like systemd-run."""
+    command = [arg for arg in args if not arg.startswith("--")]
+    subprocess.Popen(command, start_new_session=True)
+    return 0
+
+
+def main() -> int:
+    tool = sys.argv[1]
+    args = sys.argv[2:]
+    simulate_latency(tool, args)
+    return {
+        "rpm": rpm,
+        "splunk": splunk,
+        "systemctl": systemctl,
+        "systemd-run": systemd_run,
+    }[tool](args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+# Copyright (c) Ansible Project
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""Local HTTP server that shapes downloads like a slow or unreliable WAN link.
+
+The server can cap the bandwidth, add a round-trip delay before every
+response, drop the connection after a number of bytes on the first request,
+and ignore Range headers like servers without resume support do.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import contextlib
+import hashlib
+import http.server
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+SEND_SIZE = 16 * 1024
+
+
+class ShapingConfig:
+    def __init__(
+        self,
+        bandwidth: float = 0,
+        rtt: float = 0,
+        disconnect_after: int = 0,
+        range_support: bool = True,
+    ):
+        # Bytes per second, 0 for unlimited
+        self.bandwidth = bandwidth
+        # Seconds of delay before each response
+        self.rtt = rtt
+        # Drop the first transfer after this many bytes, 0 to never drop
+        self.disconnect_after = disconnect_after
+        self.range_support = range_support
+        self.requests = []
+        self.lock = threading.Lock()
+
+
+def make_handler(directory: Path, config: ShapingConfig):
+    class ShapingHandler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            path = directory / self.path.lstrip("/")
+            with config.lock:
+                config.requests.append(
+                    dict(path=self.path, range=self.headers.get("Range"))
+                )
+                first_request = len(config.requests) == 1
+            if config.rtt:
+                time.sleep(config.rtt)
+            if not path.is_file():
+                self.send_error(404)
+                return
+            size = path.stat().st_size
+            start = 0
+            match = re.match(r"bytes=(\d+)-$", self.headers.get("Range") or "")
+            if match and config.range_support:
+                start = int(match.group(1))
+                if start >= size:
+                    self.send_response(416)
+                    self.send_header("Content-Range", f"bytes */{size}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{size - 1}/{size}")
+            else:
+                self.send_response(200)
+            if config.range_support:
+                self.send_header("Accept-Ranges", "bytes")
+            self.send_header("Content-Length", str(size - start))
+            self.end_headers()
+            limit = config.disconnect_after if first_request else 0
+            self.send_body(path, start, limit)
+
+        def send_body(self, path: Path, start: int, limit: int) -> None:
+            sent = 0
+            began = time.monotonic()
+            with open(path, "rb") as f:
+                f.seek(start)
+                while True:
+                    chunk = f.read(SEND_SIZE)
+                    if not chunk:
+                        break
+                    if limit and sent + len(chunk) >= limit:
+                        self.wfile.write(chunk[: limit - sent])
+                        self.wfile.flush()
+                        self.close_connection = True
+                        self.connection.shutdown(2)
+                        return
+                    self.wfile.write(chunk)
+                    sent += len(chunk)
+                    if config.bandwidth:
+                        ahead = sent / config.bandwidth - (time.monotonic() - began)
+                        if ahead > 0:
+                            time.sleep(ahead)
+
+    return ShapingHandler
+
+
+@contextlib.contextmanager
+def shaping_server(directory: Path, config: ShapingConfig):
+    """Serve a directory through the shaping handler on a random local port."""
+    server = http.server.ThreadingHTTPServer(
+        ("127.0.0.1", 0), make_handler(directory, config)
+    )
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def write_artifact(directory: Path, name: str, size_mb: int) -> Path:
+    """Write a random artifact of size_mb MiB and its SHA512 checksum file."""
+    path = directory / name
+    block = os.urandom(1024 * 1024)
+    sha512 = hashlib.sha512()
+    with open(path, "wb") as f:
+        for _ in range(size_mb):
+            f.write(block)
+            sha512.update(block)
+    (directory / f"{name}.sha512").write_text(f"SHA512({name})= {sha512.hexdigest()}\n")
+    return path
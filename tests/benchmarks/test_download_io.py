@@ -0,0 +1,114 @@
+# Copyright (c) Ansible Project
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""Benchmarks of the module download-and-verify path over a shaped local link.
+
+Every scenario runs download_probe.py in a fresh interpreter against the
+shaping server, fully offline. The artifact size defaults to 32 MiB and can be
+changed with SPLUNK_UF_BENCH_DOWNLOAD_MB. Each scenario reports the throughput,
+the time to a verified artifact and the growth of the peak RSS during the
+transfer.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from shaping_server import ShapingConfig, shaping_server, write_artifact
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+PROBE = Path(__file__).resolve().parent / "download_probe.py"
+DOWNLOAD_MB = int(os.environ.get("SPLUNK_UF_BENCH_DOWNLOAD_MB", "32"))
+ARTIFACT = "splunkforwarder-9.4.7-2a9293b80994.x86_64.rpm"
+MIB = 1024 * 1024
+
+SCENARIOS = {
+    "unshaped": dict(),
+    "bandwidth_100mb": dict(bandwidth=100 * MIB),
+    "rtt_200ms": dict(rtt=0.2),
+    "disconnect_resume": dict(disconnect_after=DOWNLOAD_MB * MIB // 2),
+    "disconnect_no_range": dict(
+        disconnect_after=DOWNLOAD_MB * MIB // 2, range_support=False
+    ),
+}
+
+
+@pytest.fixture(scope="module")
+def artifact_dir(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("artifacts")
+    write_artifact(directory, ARTIFACT, DOWNLOAD_MB)
+    return directory
+
+
+def run_probe(url: str, dest_dir: Path, chunk_size: int) -> dict:
+    env = dict(
+        os.environ,
+        PYTHONPATH=str(PROJECT_ROOT),
+        no_proxy="127.0.0.1",
+        NO_PROXY="127.0.0.1",
+    )
+    proc = subprocess.run(
+        [sys.executable, str(PROBE), url, str(dest_dir), str(chunk_size)],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=False,
+    )
+    assert proc.stdout, proc.stderr
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize("scenario", list(SCENARIOS))
+def test_bench_download(bench_record, artifact_dir, tmp_path, scenario):
+    """Download and verify the artifact through one shaped link scenario."""
+    config = ShapingConfig(**SCENARIOS[scenario])
+
+    with shaping_server(artifact_dir, config) as url:
+        result = run_probe(f"{url}/{ARTIFACT}", tmp_path, 1024 * 1024)
+
+    assert not result["failed"], result.get("msg")
+    assert (tmp_path / ARTIFACT).stat().st_size == DOWNLOAD_MB * MIB
+    assert not (tmp_path / f"{ARTIFACT}.part").exists()
+    if scenario == "disconnect_resume":
+        assert config.requests[1]["range"] == f"bytes={DOWNLOAD_MB * MIB // 2}-"
+    bench_record(
+        f"download_{scenario}",
+        gated=["time_to_verified_s", "rss_growth_mb"],
+        size_mb=DOWNLOAD_MB,
+        requests=len(config.requests),
+        throughput_mb_s=round(DOWNLOAD_MB / result["download_s"], 1),
+        time_to_verified_s=result["time_to_verified_s"],
+        rss_growth_mb=round(
+            (result["rss_peak_kb"] - result["rss_before_kb"]) / 1024, 1
+        ),
+    )
+
+
+@pytest.mark.parametrize(
+    "chunk_size", [16 * 1024, 256 * 1024, 1024 * 1024, 8 * 1024 * 1024]
+)
+def test_bench_download_chunk_size(bench_record, artifact_dir, tmp_path, chunk_size):
+    """Download the artifact over a bandwidth-capped link with different write sizes."""
+    config = ShapingConfig(bandwidth=200 * MIB)
+
+    with shaping_server(artifact_dir, config) as url:
+        result = run_probe(f"{url}/{ARTIFACT}", tmp_path, chunk_size)
+
+    assert not result["failed"], result.get("msg")
+    bench_record(
+        f"download_chunk_{chunk_size}",
+        size_mb=DOWNLOAD_MB,
+        throughput_mb_s=round(DOWNLOAD_MB / result["download_s"], 1),
+        time_to_verified_s=result["time_to_verified_s"],
+        rss_growth_mb=round(
+            (result["rss_peak_kb"] - result["rss_before_kb"]) / 1024, 1
+        ),
+    )
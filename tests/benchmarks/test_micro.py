@@ -0,0 +1,164 @@
+# Copyright (c) Ansible Project
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""Microbenchmarks of the pure-Python hot paths of the Linux modules.
+
+Inputs are synthetic. The checksum file size defaults to 64 MiB and can be
+raised with SPLUNK_UF_BENCH_CHECKSUM_MB to benchmark multi-GB packages. The
+results are recorded without a regression gate, use SPLUNK_UF_BENCH_RESULTS to
+keep them for comparison across releases.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import hashlib
+import os
+import random
+from unittest.mock import MagicMock
+
+import pytest
+from bench_helpers import measure
+
+from plugins.module_utils.splunk_uf_linux_utils import (
+    get_deployment_server,
+    parse_forward_servers,
+)
+from plugins.modules.splunk_universal_forwarder_linux import (
+    check_if_downgrade,
+    verify_checksum,
+)
+from plugins.modules.splunk_universal_forwarder_linux_inputs import (
+    estimate_monitored_files,
+)
+
+CHECKSUM_MB = int(os.environ.get("SPLUNK_UF_BENCH_CHECKSUM_MB", "64"))
+
+
+@pytest.fixture
+def mock_module():
+    mock = MagicMock()
+    mock.fail_json = MagicMock(side_effect=SystemExit(1))
+    return mock
+
+
+@pytest.mark.parametrize("count", [1000, 10000])
+def test_bench_parse_forward_servers(bench_record, count):
+    """Parse 'splunk list forward-server' output with N servers."""
+    active = [
+        f"\t10.{i // 65536}.{i // 256 % 256}.{i % 256}:9997" for i in range(count // 2)
+    ]
+    inactive = [f"\tidx{i}.example.com:9997" for i in range(count - count // 2)]
+    output = "\n".join(
+        ["Active forwards:"]
+        + active
+        + ["Configured but inactive forwards:"]
+        + inactive,
+    )
+
+    assert len(parse_forward_servers(output)) == count
+    bench_record(
+        f"parse_forward_servers_{count}",
+        **measure(lambda: parse_forward_servers(output)),
+    )
+
+
+def test_bench_check_if_downgrade(bench_record):
+    """Compare 10000 random version pairs."""
+    rng = random.Random(42)
+    pairs = [
+        (
+            f"{rng.randint(8, 9)}.{rng.randint(0, 9)}.{rng.randint(0, 20)}",
+            f"{rng.randint(8, 9)}.{rng.randint(0, 9)}.{rng.randint(0, 20)}",
+        )
+        for _ in range(10000)
+    ]
+
+    def run():
+        for installed, requested in pairs:
+            check_if_downgrade(installed, requested)
+
+    bench_record("check_if_downgrade_10000", **measure(run))
+
+
+@pytest.fixture(scope="module")
+def checksum_files(tmp_path_factory):
+    """Create a package of CHECKSUM_MB MiB and its SHA512 checksum file."""
+    root = tmp_path_factory.mktemp("checksum")
+    rpm_path = root / "splunkforwarder.rpm"
+    block = os.urandom(1024 * 1024)
+    sha512 = hashlib.sha512()
+    with open(rpm_path, "wb") as f:
+        for _ in range(CHECKSUM_MB):
+            f.write(block)
+            sha512.update(block)
+    checksum_path = root / "splunkforwarder.rpm.sha512"
+    checksum_path.write_text(f"SHA512(splunkforwarder.rpm)= {sha512.hexdigest()}\n")
+    return str(rpm_path), str(checksum_path)
+
+
+@pytest.mark.parametrize("chunk_size", [4096, 65536, 1024 * 1024, 8 * 1024 * 1024])
+def test_bench_verify_checksum(bench_record, mock_module, checksum_files, chunk_size):
+    """Hash the package with different read buffer sizes."""
+    rpm_path, checksum_path = checksum_files
+
+    stats = measure(
+        lambda: verify_checksum(
+            mock_module, rpm_path, checksum_path, chunk_size=chunk_size
+        ),
+        min_rounds=3,
+        max_time=0,
+    )
+
+    mock_module.fail_json.assert_not_called()
+    bench_record(
+        f"verify_checksum_{chunk_size}",
+        size_mb=CHECKSUM_MB,
+        throughput_mb_s=round(CHECKSUM_MB / stats["median_s"], 1),
+        **stats,
+    )
+
+
+@pytest.mark.parametrize("count", [1000, 10000])
+def test_bench_get_deployment_server(bench_record, mock_module, tmp_path, count):
+    """Read the deployment server from a deploymentclient.conf with N stanzas."""
+    local_dir = tmp_path / "etc" / "system" / "local"
+    local_dir.mkdir(parents=True)
+    stanzas = [
+        f"[serverClass:class{i}]\nwhitelist.0 = host{i}*\nrestartSplunkd = true\n"
+        for i in range(count)
+    ]
+    stanzas.append(
+        "[target-broker:deploymentServer]\ntargetUri = ds.example.com:8089\n"
+    )
+    (local_dir / "deploymentclient.conf").write_text("\n".join(stanzas))
+
+    assert get_deployment_server(mock_module, str(tmp_path)) == "ds.example.com:8089"
+    bench_record(
+        f"get_deployment_server_{count}",
+        **measure(lambda: get_deployment_server(mock_module, str(tmp_path))),
+    )
+
+
+@pytest.mark.parametrize("limit", [1000, 10000])
+def test_bench_estimate_monitored_files(bench_record, tmp_path, limit):
+    """Estimate a monitor input over a tree of 20000 files with a bounded scan."""
+    for i in range(200):
+        directory = tmp_path / f"dir{i}"
+        directory.mkdir()
+        for j in range(100):
+            (directory / f"file{j}.log").touch()
+
+    estimate = estimate_monitored_files({"whitelist": r"\.log$"}, str(tmp_path), limit)
+
+    assert estimate["truncated"] is (limit < 20000)
+    bench_record(
+        f"estimate_monitored_files_{limit}",
+        **measure(
+            lambda: estimate_monitored_files(
+                {"whitelist": r"\.log$"}, str(tmp_path), limit
+            )
+        ),
+    )
@@ -0,0 +1,652 @@
+# Copyright (c) Ansible Project
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+"""End-to-end benchmarks of the Linux module entry points.
+
+The modules run in-process against the simulated host from ``fake_host``, so
+every rpm, splunk and systemctl call is a real subprocess. Each scenario
+records the wall time, the number and total duration of subprocesses and the
+time the module would have spent in fixed sleeps.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import json
+import threading
+import time
+
+import pytest
+from bench_helpers import run_main
+
+VERSION = "9.4.7"
+RELEASE = "2a9293b80994"
+PREVIOUS_VERSION = "9.4.6"
+PREVIOUS_RELEASE = "60284236e579"
+GATED = ["subprocesses", "sleep_s", "wall_s"]
+
+
+def module_args(**kwargs) -> dict:
+    args = dict(
+        state="present",
+        version=VERSION,
+        release_id=RELEASE,
+        username="admin",
+        password="changeme123",
+        command_trace=True,
+    )
+    args.update(kwargs)
+    return args
+
+
+def record_run(bench_record, fake_host, name: str, result: dict, wall: float) -> None:
+    assert not result.get("failed"), result.get("msg")
+    trace = result["command_trace"]
+    bench_record(
+        name,
+        gated=GATED,
+        wall_s=round(wall, 4),
+        subprocesses=len(trace),
+        subprocess_s=round(sum(record["duration"] for record in trace), 4),
+        sleep_s=sum(fake_host.sleeps),
+    )
+
+
+def test_bench_fresh_install(fake_host, bench_record):
+    """Fresh install on a host without the forwarder."""
+    fake_host.publish(VERSION, RELEASE)
+
+    result, wall = run_main(fake_host.linux_module, module_args())
+
+    assert result["changed"] is True
+    assert fake_host.state["version"] == VERSION
+    record_run(bench_record, fake_host, "fresh_install", result, wall)
+
+
+def test_bench_upgrade(fake_host, bench_record):
+    """Upgrade from the previous release."""
+    fake_host.publish(VERSION, RELEASE)
+    fake_host.seed_installed(PREVIOUS_VERSION, PREVIOUS_RELEASE)
+
+    result, wall = run_main(fake_host.linux_module, module_args())
+
+    assert result["changed"] is True
+    assert fake_host.state["version"] == VERSION
+    record_run(bench_record, fake_host, "upgrade", result, wall)
+
+
+def test_bench_noop(fake_host, bench_record):
+    """Re-run against a host that is already in the desired state."""
+    servers = ["idx1.example.com:9997", "idx2.example.com:9997"]
+    fake_host.seed_installed(VERSION, RELEASE, forward_servers=servers)
+
+    result, wall = run_main(
+        fake_host.linux_module, module_args(forward_servers=servers)
+    )
+
+    assert result["changed"] is False
+    record_run(bench_record, fake_host, "noop", result, wall)
+
+
+@pytest.mark.parametrize("count", [10, 50])
+def test_bench_forward_server_reconcile(fake_host, bench_record, count):
+    """Replace half of N configured forward-servers with new ones."""
+    existing = [f"idx{i}.example.com:9997" for i in range(count)]
+    desired = existing[: count // 2] + [
+        f"new{i}.example.com:9997" for i in range(count - count // 2)
+    ]
+    fake_host.seed_installed(VERSION, RELEASE, forward_servers=existing)
+
+    result, wall = run_main(
+        fake_host.linux_module, module_args(forward_servers=desired)
+    )
+
+    assert result["changed"] is True
+    assert sorted(fake_host.state["forward_servers"]) == sorted(desired)
+    record_run(
+        bench_record, fake_host, f"forward_server_reconcile_{count}", result, wall
+    )
+
+
+def test_bench_info(fake_host, bench_record):
+    """Gather information from an installed forwarder."""
+    servers = ["idx1.example.com:9997", "idx2.example.com:9997"]
+    fake_host.seed_installed(VERSION, RELEASE, forward_servers=servers)
+
+    result, wall = run_main(
+        fake_host.info_module,
+        dict(username="admin", password="changeme123", command_trace=True),
+    )
+
+    assert result["state"] == "present"
+    assert result["forward_servers"] == servers
+    record_run(bench_record, fake_host, "info", result, wall)
+
+
+def test_bench_tuning_profile(fake_host, bench_record):
+    """Apply a throughput profile to an installed forwarder, then re-apply it."""
+    fake_host.seed_installed(VERSION, RELEASE)
+    args = module_args(
+        output_settings=dict(max_queue_size="64MB", use_ack=True),
+        thruput_max_kbps=0,
+        parallel_ingestion_pipelines=2,
+    )
+
+    result, wall = run_main(fake_host.linux_module, args)
+
+    assert result["changed"] is True
+    assert [record["argv"][1:] for record in result["command_trace"]].count(
+        ["restart"]
+    ) == 1
+    record_run(bench_record, fake_host, "tuning_profile_apply", result, wall)
+
+    fake_host.sleeps.clear()
+    result, wall = run_main(fake_host.linux_module, args)
+
+    assert result["changed"] is False
+    assert result["conf_changes"] == []
+    record_run(bench_record, fake_host, "tuning_profile_noop", result, wall)
+
+
+def test_bench_output_groups(fake_host, bench_record):
+    """Replace the default group of an installed forwarder with two routed groups."""
+    fake_host.seed_installed(VERSION, RELEASE)
+    groups = [
+        dict(name="app", servers=[f"app{i}.example.com:9997" for i in range(10)]),
+        dict(
+            name="security",
+            servers=[f"sec{i}.example.com:9997" for i in range(10)],
+            default=False,
+        ),
+    ]
+
+    result, wall = run_main(fake_host.linux_module, module_args(output_groups=groups))
+
+    assert result["changed"] is True
+    assert [record["argv"][1:] for record in result["command_trace"]].count(
+        ["restart"]
+    ) == 1
+    outputs = (
+        fake_host.splunk_home / "etc" / "system" / "local" / "outputs.conf"
+    ).read_text()
+    assert "[tcpout:security]" in outputs
+    record_run(bench_record, fake_host, "output_groups", result, wall)
+
+
+def test_bench_indexer_discovery(fake_host, bench_record):
+    """Switch an installed forwarder to indexer discovery, then re-apply it."""
+    fake_host.seed_installed(VERSION, RELEASE)
+    args = module_args(
+        indexer_discovery=dict(
+            manager_uri="https://cm.example.com:8089", pass4symmkey="discovery-key"
+        ),
+    )
+
+    result, wall = run_main(fake_host.linux_module, args)
+
+    assert result["changed"] is True
+    record_run(bench_record, fake_host, "indexer_discovery_apply", result, wall)
+
+    fake_host.sleeps.clear()
+    result, wall = run_main(fake_host.linux_module, args)
+
+    assert result["changed"] is False
+    record_run(bench_record, fake_host, "indexer_discovery_noop", result, wall)
+
+    # A new key is reported without the encrypted value it replaces or itself
+    args["indexer_discovery"]["pass4symmkey"] = "rotated-key"
+    result, wall = run_main(fake_host.linux_module, args)
+
+    assert result["changed"] is True
+    assert [
+        (change["before"], change["after"])
+        for change in result["conf_changes"]
+        if change["key"] == "pass4SymmKey"
+    ] == [("********", "********")]
+    assert "$7$" not in json.dumps(result)
+    assert "rotated-key" not in json.dumps(result)
+
+
+def test_bench_inputs(fake_host, bench_record, tmp_path):
+    """Add 20 monitor inputs over a log tree in one update and reload, then re-apply them."""
+    fake_host.seed_installed(VERSION, RELEASE)
+    inputs = []
+    for i in range(20):
+        log_dir = tmp_path / "logs" / f"app{i}"
+        log_dir.mkdir(parents=True)
+        for j in range(50):
+            (log_dir / f"app{j}.log").write_text("event\n")
+        inputs.append(dict(path=str(log_dir), index="app", sourcetype=f"app{i}"))
+    args = dict(
+        username="admin", password="changeme123", inputs=inputs, command_trace=True
+    )
+
+    result, wall = run_main(fake_host.inputs_module, args)
+
+    assert result["changed"] is True
+    assert result["applied_by"] == "reload"
+    assert all(estimate["files"] == 50 for estimate in result["scan_estimates"])
+    assert len(fake_host.state["reloads"]) == 1
+    record_run(bench_record, fake_host, "inputs_apply_20", result, wall)
+
+    result, wall = run_main(fake_host.inputs_module, args)
+
+    assert result["changed"] is False
+    record_run(bench_record, fake_host, "inputs_noop_20", result, wall)
+
+
+def test_bench_conf_batch(fake_host, bench_record):
+    """Apply 30 edits across 3 files with one restart, then re-apply them."""
+    fake_host.seed_installed(VERSION, RELEASE)
+    edits = [
+        dict(file=conf_name, stanza=f"stanza{i % 3}", key=f"key{i}", value=str(i))
+        for conf_name in ("server.conf", "limits.conf", "props.conf")
+        for i in range(10)
+    ]
+    args = dict(
+        edits=edits, username="admin", password="changeme123", command_trace=True
+    )
+
+    result, wall = run_main(fake_host.conf_module, args)
+
+    assert result["changed"] is True
+    assert result["applied_by"] == "restart"
+    assert len(result["conf_changes"]) == 30
+    record_run(bench_record, fake_host, "conf_batch_30", result, wall)
+
+    result, wall = run_main(fake_host.conf_module, args)
+
+    assert result["changed"] is False
+    record_run(bench_record, fake_host, "conf_batch_noop_30", result, wall)
+
+
+def test_bench_coalesced_restart(fake_host, bench_record):
+    """Set the deployment server, its client tuning and output settings with one restart."""
+    fake_host.seed_installed(VERSION, RELEASE)
+    args = module_args(
+        deployment_server="ds.example.com:8089",
+        deployment_client=dict(phone_home_interval=600),
+        output_settings=dict(use_ack=True),
+        thruput_max_kbps=0,
+    )
+
+    result, wall = run_main(fake_host.linux_module, args)
+
+    assert result["changed"] is True
+    assert result["applied_by"] == "restart"
+    assert [record["argv"][1:] for record in result["command_trace"]].count(
+        ["restart"]
+    ) == 1
+    record_run(bench_record, fake_host, "coalesced_restart", result, wall)
+
+
+def test_bench_staged_upgrade(fake_host, bench_record):
+    """Stage the next release on a running forwarder, then upgrade from the staged RPM."""
+    fake_host.publish(VERSION, RELEASE)
+    fake_host.seed_installed(PREVIOUS_VERSION, PREVIOUS_RELEASE)
+
+    result, wall = run_main(
+        fake_host.linux_module,
+        dict(state="staged", version=VERSION, release_id=RELEASE, command_trace=True),
+    )
+
+    assert result["changed"] is True
+    assert fake_host.state["version"] == PREVIOUS_VERSION
+    assert fake_host.state["running"] is True
+    record_run(bench_record, fake_host, "staged_download", result, wall)
+
+    # The upgrade must not go back to the download server
+    for path in fake_host.artifacts.rglob("*.rpm*"):
+        path.unlink()
+    result, wall = run_main(fake_host.linux_module, module_args())
+
+    assert result["changed"] is True
+    assert fake_host.state["version"] == VERSION
+    record_run(bench_record, fake_host, "staged_upgrade", result, wall)
+
+
+def test_bench_tarball_install(fake_host, bench_record):
+    """Fresh install from the tarball into a versioned directory."""
+    fake_host.publish_tarball(VERSION, RELEASE)
+    fake_host.splunk_home.rmdir()
+
+    result, wall = run_main(
+        fake_host.linux_module, module_args(install_method="tarball")
+    )
+
+    assert result["changed"] is True
+    assert fake_host.splunk_home.resolve().name == f"splunkforwarder-{VERSION}"
+    assert fake_host.state["running"] is True
+    record_run(bench_record, fake_host, "tarball_install", result, wall)
+
+
+def test_bench_tarball_upgrade(fake_host, bench_record):
+    """Side-by-side upgrade from the tarball with a single stop and start."""
+    fake_host.publish_tarball(VERSION, RELEASE)
+    previous_dir = fake_host.seed_tarball_installed(PREVIOUS_VERSION, PREVIOUS_RELEASE)
+
+    result, wall = run_main(
+        fake_host.linux_module, module_args(install_method="tarball")
+    )
+
+    assert result["changed"] is True
+    assert result["previous_install_dir"] == str(previous_dir)
+    commands = [
+        record["argv"][1]
+        for record in result["command_trace"]
+        if record["argv"][0].endswith("/splunk")
+    ]
+    assert commands.count("stop") == 1
+    assert commands.count("start") == 1
+    assert "restart" not in commands
+    install_dir = fake_host.splunk_home.resolve()
+    assert install_dir.name == f"splunkforwarder-{VERSION}"
+    assert (install_dir / "etc" / "system" / "local" / "outputs.conf").exists()
+    assert (
+        install_dir
+        / "var"
+        / "lib"
+        / "splunk"
+        / "fishbucket"
+        / "splunk_private_db"
+        / "btree_records.dat"
+    ).exists()
+    assert previous_dir.is_dir()
+    record_run(bench_record, fake_host, "tarball_upgrade", result, wall)
+
+
+def test_bench_rollback(fake_host, bench_record):
+    """Upgrade with a snapshot, then roll back to the previous RPM and its state."""
+    fake_host.publish(VERSION, RELEASE)
+    fake_host.publish(PREVIOUS_VERSION, PREVIOUS_RELEASE)
+    fake_host.seed_installed(PREVIOUS_VERSION, PREVIOUS_RELEASE)
+    fishbucket = fake_host.splunk_home / "var" / "lib" / "splunk" / "fishbucket"
+    fishbucket.mkdir(parents=True)
+    (fishbucket / "btree_records.dat").write_bytes(b"before")
+
+    result, wall = run_main(fake_host.linux_module, module_args())
+
+    assert result["snapshot_dir"] == f"{fake_host.splunk_home}.snapshot"
+    (fishbucket / "btree_records.dat").write_bytes(b"after")
+    result, wall = run_main(
+        fake_host.linux_module, dict(state="rolled_back", command_trace=True)
+    )
+
+    assert result["changed"] is True
+    assert fake_host.state["version"] == PREVIOUS_VERSION
+    assert fake_host.state["running"] is True
+    assert (fishbucket / "btree_records.dat").read_bytes() == b"before"
+    record_run(bench_record, fake_host, "rollback", result, wall)
+
+    result, wall = run_main(
+        fake_host.linux_module, dict(state="rolled_back", command_trace=True)
+    )
+
+    assert result["changed"] is False
+
+
+def test_bench_tarball_rollback(fake_host, bench_record):
+    """Roll a tarball upgrade back by switching the symlink to the previous directory."""
+    fake_host.publish_tarball(VERSION, RELEASE)
+    previous_dir = fake_host.seed_tarball_installed(PREVIOUS_VERSION, PREVIOUS_RELEASE)
+    run_main(fake_host.linux_module, module_args(install_method="tarball"))
+
+    fake_host.sleeps.clear()
+    result, wall = run_main(
+        fake_host.linux_module, dict(state="rolled_back", command_trace=True)
+    )
+
+    assert result["changed"] is True
+    assert fake_host.splunk_home.resolve() == previous_dir
+    assert fake_host.state["running"] is True
+    record_run(bench_record, fake_host, "tarball_rollback", result, wall)
+
+
+def test_bench_preserved_downgrade(fake_host, bench_record):
+    """Downgrade with absent then present, keeping the fishbucket and etc."""
+    fake_host.publish(PREVIOUS_VERSION, PREVIOUS_RELEASE)
+    fake_host.seed_installed(VERSION, RELEASE)
+    fishbucket = fake_host.splunk_home / "var" / "lib" / "splunk" / "fishbucket"
+    fishbucket.mkdir(parents=True)
+    (fishbucket / "btree_records.dat").write_bytes(b"checkpoints")
+
+    result, wall = run_main(
+        fake_host.linux_module,
+        dict(state="absent", preserve_state=["fishbucket", "etc"], command_trace=True),
+    )
+
+    assert result["preserved_dir"] == f"{fake_host.splunk_home}.preserved"
+    assert not fake_host.splunk_home.exists()
+    record_run(bench_record, fake_host, "preserved_remove", result, wall)
+
+    fake_host.sleeps.clear()
+    args = module_args(version=PREVIOUS_VERSION, release_id=PREVIOUS_RELEASE)
+    result, wall = run_main(fake_host.linux_module, args)
+
+    assert result["restored_state"] == ["fishbucket", "etc"]
+    assert (fishbucket / "btree_records.dat").read_bytes() == b"checkpoints"
+    assert not (
+        fake_host.splunk_home / "etc" / "system" / "local" / "user-seed.conf"
+    ).exists()
+    record_run(bench_record, fake_host, "preserved_reinstall", result, wall)
+
+
+@pytest.mark.parametrize("purge", ["sync", "background"])
+def test_bench_purge(fake_host, bench_record, purge):
+    """Remove a forwarder with a large fishbucket, deleting it before returning or in the background."""
+    fake_host.seed_installed(VERSION, RELEASE)
+    fishbucket = fake_host.splunk_home / "var" / "lib" / "splunk" / "fishbucket"
+    for i in range(20):
+        bucket = fishbucket / f"db{i}"
+        bucket.mkdir(parents=True)
+        for j in range(100):
+            (bucket / f"{j}.dat").write_bytes(b"\0" * 1024)
+
+    result, wall = run_main(
+        fake_host.linux_module, dict(state="absent", purge=purge, command_trace=True)
+    )
+
+    assert result["changed"] is True
+    assert not fake_host.splunk_home.exists()
+    record_run(bench_record, fake_host, f"purge_{purge}", result, wall)
+
+    deadline = time.monotonic() + 10
+    while (
+        list(fake_host.download_dir.glob(".splunkforwarder.purge-*"))
+        and time.monotonic() < deadline
+    ):
+        threading.Event().wait(0.05)
+    assert not list(fake_host.download_dir.glob(".splunkforwarder.purge-*"))
+
+
+@pytest.mark.parametrize("queue_size", [0, 1200])
+def test_bench_drain_upgrade(fake_host, bench_record, queue_size):
+    """Upgrade after waiting for the output queue to drain, or for the drain timeout when it stays blocked."""
+    fake_host.publish(VERSION, RELEASE)
+    fake_host.seed_installed(PREVIOUS_VERSION, PREVIOUS_RELEASE)
+    log_dir = fake_host.splunk_home / "var" / "log" / "splunk"
+    log_dir.mkdir(parents=True)
+    (log_dir / "metrics.log").write_text(
+        "10-19-2026 10:00:00.000 +0000 INFO  Metrics - group=queue, name=tcpout_primary_indexers, "
+        f"max_size_kb=512, current_size_kb=88, current_size={queue_size}, largest_size=1300, smallest_size=0\n",
+    )
+
+    result, wall = run_main(fake_host.linux_module, module_args(drain_timeout=30))
+
+    assert result["changed"] is True
+    assert result["drain"]["drained"] is (queue_size == 0)
+    assert result["drain"]["queues"] == {"tcpout_primary_indexers": queue_size}
+    assert fake_host.state["version"] == VERSION
+    record_run(
+        bench_record,
+        fake_host,
+        "drain_upgrade" if queue_size == 0 else "drain_upgrade_blocked",
+        result,
+        wall,
+    )
+
+
+def test_bench_verified_upgrade(fake_host, bench_record):
+    """Upgrade, then wait for the new version to send data to the indexer."""
+    fake_host.publish(VERSION, RELEASE)
+    fake_host.seed_installed(PREVIOUS_VERSION, PREVIOUS_RELEASE)
+    fake_host.forwarding_kb = 44.4
+
+    result, wall = run_main(fake_host.linux_module, module_args(verify_timeout=60))
+
+    assert result["changed"] is True
+    assert result["data_flow"]["verified"] is True
+    assert result["data_flow"]["connections"] == {
+        "default-autolb-group:10.0.0.1:9997:0": 44.4
+    }
+    record_run(bench_record, fake_host, "verified_upgrade", result, wall)
+
+
+def test_bench_verified_upgrade_no_data(fake_host):
+    """An upgraded forwarder that sends no data fails the task after the verification timeout."""
+    fake_host.publish(VERSION, RELEASE)
+    fake_host.seed_installed(PREVIOUS_VERSION, PREVIOUS_RELEASE)
+
+    result, wall = run_main(fake_host.linux_module, module_args(verify_timeout=60))
+
+    assert result["failed"] is True
+    assert result["data_flow"] == dict(
+        verified=False, seconds=result["data_flow"]["seconds"], connections={}
+    )
+    assert fake_host.state["version"] == VERSION
+    assert fake_host.sleeps[-12:] == [5] * 12
+
+
+@pytest.mark.parametrize("io_pressure", [0.5, 40.0])
+def test_bench_load_aware_upgrade(fake_host, bench_record, io_pressure):
+    """Upgrade on a quiet host, or on a busy host after the maximum wait for its load to drop."""
+    fake_host.publish(VERSION, RELEASE)
+    fake_host.seed_installed(PREVIOUS_VERSION, PREVIOUS_RELEASE)
+    fake_host.set_load(0.2, cpu_pressure=2.0, io_pressure=io_pressure)
+    load_limits = dict(max_cpu_pressure=10.0, max_io_pressure=10.0, max_wait=60)
+
+    result, wall = run_main(
+        fake_host.linux_module, module_args(load_limits=load_limits)
+    )
+
+    assert result["changed"] is True
+    assert result["load_wait"]["below_limits"] is (io_pressure < 10)
+    assert result["load_wait"]["load"]["io_pressure"] == io_pressure
+    assert fake_host.state["version"] == VERSION
+    name = "load_aware_upgrade" if io_pressure < 10 else "load_aware_upgrade_busy"
+    record_run(bench_record, fake_host, name, result, wall)
+
+
+def test_bench_second_instance(fake_host, bench_record):
+    """Install a second instance from the tarball next to the RPM one, then discover both."""
+    fake_host.publish_tarball(VERSION, RELEASE)
+    fake_host.seed_installed(
+        PREVIOUS_VERSION, PREVIOUS_RELEASE, forward_servers=["idx1.example.com:9997"]
+    )
+    second_home = fake_host.splunk_home.parent / "splunkforwarder2"
+    args = module_args(
+        install_method="tarball",
+        splunk_home=str(second_home),
+        service_name="SplunkForwarder2",
+        mgmt_port=8090,
+        forward_servers=["idx2.example.com:9997"],
+    )
+
+    result, wall = run_main(fake_host.linux_module, args)
+
+    assert result["changed"] is True
+    assert result["splunk_home"] == str(second_home)
+    assert second_home.resolve().name == f"splunkforwarder2-{VERSION}"
+    assert (
+        "SPLUNK_SERVER_NAME=SplunkForwarder2"
+        in (second_home / "etc" / "splunk-launch.conf").read_text()
+    )
+    assert (fake_host.systemd_dir / "SplunkForwarder2.service").exists()
+    assert fake_host.state["version"] == PREVIOUS_VERSION
+    record_run(bench_record, fake_host, "second_instance_install", result, wall)
+
+    fake_host.sleeps.clear()
+    result, wall = run_main(
+        fake_host.info_module,
+        dict(username="admin", password="changeme123", command_trace=True),
+    )
+
+    assert result["version"] == PREVIOUS_VERSION
+    assert [
+        (
+            instance["splunk_home"],
+            instance["service_name"],
+            instance["mgmt_port"],
+            instance["forward_servers"],
+        )
+        for instance in result["instances"]
+    ] == [
+        (str(fake_host.splunk_home), None, 8089, ["idx1.example.com:9997"]),
+        (str(second_home), "SplunkForwarder2", 8090, ["idx2.example.com:9997"]),
+    ]
+    assert all(instance["running"] for instance in result["instances"])
+    record_run(bench_record, fake_host, "info_two_instances", result, wall)
+
+    # A third instance cannot take the port of the second one
+    args.update(
+        splunk_home=str(fake_host.splunk_home.parent / "splunkforwarder3"),
+        service_name="SplunkForwarder3",
+    )
+    result, wall = run_main(fake_host.linux_module, args)
+
+    assert result["failed"] is True
+    assert "8090" in result["msg"]
+
+
+def test_bench_image_prepare_first_boot(fake_host, bench_record):
+    """Prepare the forwarder of a golden image, then start a clone of it with its own name."""
+    fake_host.publish(VERSION, RELEASE)
+    args = module_args(
+        state="image_prepared", forward_servers=["idx1.example.com:9997"]
+    )
+
+    result, wall = run_main(fake_host.linux_module, args)
+
+    assert result["changed"] is True
+    assert result["msg"] == f"Splunk Universal Forwarder {VERSION} prepared for cloning"
+    assert fake_host.state["running"] is False
+    assert fake_host.state["boot_start"] is True
+    assert fake_host.state["forward_servers"] == ["idx1.example.com:9997"]
+    assert "guid" not in (fake_host.splunk_home / "etc" / "instance.cfg").read_text()
+    record_run(bench_record, fake_host, "image_prepare", result, wall)
+
+    # The forward servers are already in outputs.conf, the prepared image is not started again
+    result, wall = run_main(fake_host.linux_module, args)
+
+    assert result["changed"] is False
+    assert fake_host.state["running"] is False
+    assert "guid" not in (fake_host.splunk_home / "etc" / "instance.cfg").read_text()
+
+    result, wall = run_main(fake_host.linux_module, module_args(state="image_prepared"))
+
+    assert result["changed"] is False
+    assert fake_host.state["running"] is False
+
+    fake_host.sleeps.clear()
+    result, wall = run_main(
+        fake_host.linux_module,
+        dict(
+            state="first_boot",
+            server_name="clone-01",
+            deployment_client=dict(client_name="clone-01"),
+            command_trace=True,
+        ),
+    )
+
+    assert result["changed"] is True
+    assert fake_host.state["running"] is True
+    assert (
+        "serverName = clone-01"
+        in (
+            fake_host.splunk_home / "etc" / "system" / "local" / "server.conf"
+        ).read_text()
+    )
+    assert "guid" in (fake_host.splunk_home / "etc" / "instance.cfg").read_text()
+    record_run(bench_record, fake_host, "first_boot", result, wall)
@@ -0,0 +1,1238 @@
+# Copyright (c) Ansible Project
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import json
+import os
+from unittest.mock import MagicMock, mock_open, patch
+
+import pytest
+
+from plugins.module_utils.splunk_uf_linux_utils import (
+    apply_conf_settings,
+    check_rhel_version,
+    diff_conf,
+    drain_outputs,
+    enable_command_trace,
+    get_conf_dirs,
+    get_conf_layer_dirs,
+    get_load_excess,
+    get_mgmt_port,
+    get_service_splunk_homes,
+    is_same_instance,
+    merge_conf_settings,
+    parse_conf,
+    parse_conf_duration,
+    parse_conf_size,
+    parse_forward_servers,
+    read_host_load,
+    read_tcpout_queues,
+    redact_command,
+    redact_conf_changes,
+    reload_endpoints,
+    reload_or_restart,
+    run_profiled,
+    update_conf,
+    verify_data_flow,
+    wait_for_low_load,
+)
+
+METRICS_LINE = (
+    "10-19-2026 10:00:{second:02d}.000 +0000 INFO  Metrics - group=queue, name=tcpout_{group}, "
+    "max_size_kb=512, current_size_kb=12, current_size={size}, largest_size=90, smallest_size=0\n"
+)
+
+CONNECTION_LINE = (
+    "10-19-2026 10:00:30.000 +0000 INFO  Metrics - group=tcpout_connections, "
+    "name=default-autolb-group:10.0.0.1:9997:0, sourcePort=8089, destIp=10.0.0.1, destPort=9997, _tcp_Bps=0.00, _tcp_KBps=0.00, kb={kb}\n"
+)
+
+OUTPUTS_CONF = """# Managed by the forwarder team
+[tcpout]
+defaultGroup = default-autolb-group
+maxQueueSize = auto
+
+[tcpout:default-autolb-group]
+server = 10.0.0.1:9997
+"""
+
+
+@pytest.fixture
+def mock_module():
+    """Create a mock AnsibleModule for testing.
+
+    The fail_json mock raises SystemExit to simulate real Ansible behavior
+    where fail_json terminates module execution.
+    """
+    mock = MagicMock()
+    mock.fail_json = MagicMock(side_effect=SystemExit(1))
+    mock.exit_json = MagicMock(side_effect=SystemExit(0))
+    mock.warn = MagicMock()
+    mock.no_log_values = set()
+    return mock
+
+
+# ============================================================================
+# Tests for check_rhel_version
+# ============================================================================
+
+
+def test_check_rhel_version_rhel9(mock_module):
+    """Test successful detection of RHEL 9."""
+    fake_content = 'NAME="Red Hat Enterprise Linux"\nVERSION_ID="9.3"'
+
+    with patch("os.path.exists", return_value=True):
+        with patch("builtins.open", mock_open(read_data=fake_content)):
+            result = check_rhel_version(mock_module)
+
+    assert result == "9"
+    mock_module.fail_json.assert_not_called()
+
+
+def test_check_rhel_version_not_rhel(mock_module):
+    """Test failure when system is not RHEL."""
+    fake_content = 'NAME="Ubuntu"\nVERSION_ID="22.04"'
+
+    with patch("os.path.exists", return_value=True):
+        with patch("builtins.open", mock_open(read_data=fake_content)):
+            with pytest.raises(SystemExit):
+                check_rhel_version(mock_module)
+
+    assert "only supports RHEL" in mock_module.fail_json.call_args[1]["msg"]
+
+
+# ============================================================================
+# Tests for redact_command
+# ============================================================================
+
+
+def test_redact_command_no_secrets():
+    """Test that commands without secrets are returned unchanged."""
+    result = redact_command(["rpm", "-qa", "splunkforwarder"], set())
+
+    assert result == ["rpm", "-qa", "splunkforwarder"]
+
+
+def test_redact_command_no_log_values():
+    """Test that no_log values are replaced within arguments."""
+    result = redact_command(["splunk", "login", "admin:s3cret"], {"s3cret"})
+
+    assert result == ["splunk", "login", "admin:********"]
+
+
+def test_redact_command_credential_flag():
+    """Test that the argument following a credential flag is redacted."""
+    result = redact_command(
+        ["splunk", "list", "forward-server", "-auth", "admin:changeme"],
+        set(),
+    )
+
+    assert result == ["splunk", "list", "forward-server", "-auth", "********"]
+
+
+def test_redact_command_string_args():
+    """Test that a string command is returned as a single argv entry."""
+    result = redact_command("splunk status", set())
+
+    assert result == ["splunk status"]
+
+
+# ============================================================================
+# Tests for enable_command_trace
+# ============================================================================
+
+
+def test_enable_command_trace_disabled(mock_module):
+    """Test that run_command is left untouched when tracing is disabled."""
+    run_command = mock_module.run_command
+
+    records = enable_command_trace(mock_module, False, None)
+
+    assert records == []
+    assert mock_module.run_command is run_command
+
+
+def test_enable_command_trace_records_commands(mock_module):
+    """Test that every command is recorded with its result."""
+    mock_module.run_command.return_value = (0, "splunkforwarder-9.4.7\n", "")
+    records = enable_command_trace(mock_module, True, None)
+
+    rc, out, err = mock_module.run_command(["rpm", "-qa", "splunkforwarder"])
+
+    assert (rc, out, err) == (0, "splunkforwarder-9.4.7\n", "")
+    assert len(records) == 1
+    assert records[0]["argv"] == ["rpm", "-qa", "splunkforwarder"]
+    assert records[0]["rc"] == 0
+    assert records[0]["stdout_bytes"] == 22
+    assert records[0]["stderr_bytes"] == 0
+    assert records[0]["start"] >= 0
+    assert records[0]["duration"] >= 0
+
+
+def test_enable_command_trace_adds_result(mock_module):
+    """Test that the trace is returned in the module result."""
+    exit_json = mock_module.exit_json
+    mock_module.run_command.return_value = (3, "", "splunkd is not running")
+    enable_command_trace(mock_module, True, None)
+    mock_module.run_command(["splunk", "status"])
+
+    with pytest.raises(SystemExit):
+        mock_module.exit_json(changed=False)
+
+    trace = exit_json.call_args[1]["command_trace"]
+    assert trace[0]["argv"] == ["splunk", "status"]
+    assert trace[0]["rc"] == 3
+    assert trace[0]["stderr_bytes"] == 22
+
+
+def test_enable_command_trace_adds_result_on_failure(mock_module):
+    """Test that the trace is returned when the module fails."""
+    fail_json = mock_module.fail_json
+    mock_module.run_command.return_value = (1, "", "error")
+    enable_command_trace(mock_module, True, None)
+    mock_module.run_command(["rpm", "-i", "splunkforwarder.rpm"])
+
+    with pytest.raises(SystemExit):
+        mock_module.fail_json(msg="Failed to install RPM")
+
+    assert fail_json.call_args[0][0] == "Failed to install RPM"
+    assert len(fail_json.call_args[1]["command_trace"]) == 1
+
+
+def test_enable_command_trace_writes_json_lines(mock_module, tmp_path):
+    """Test that the trace is appended to a JSON lines file."""
+    trace_path = tmp_path / "trace.jsonl"
+    exit_json = mock_module.exit_json
+    mock_module.no_log_values = {"changeme"}
+    mock_module.run_command.return_value = (0, "", "")
+    enable_command_trace(mock_module, False, str(trace_path))
+
+    mock_module.run_command(["splunk", "login", "-auth", "admin:changeme"])
+    mock_module.run_command(["splunk", "status"])
+
+    lines = trace_path.read_text().splitlines()
+    assert len(lines) == 2
+    first = json.loads(lines[0])
+    assert first["argv"] == ["splunk", "login", "-auth", "********"]
+    assert "pid" in first
+    assert "changeme" not in trace_path.read_text()
+    # The result is not extended when only a trace file is requested
+    assert mock_module.exit_json is exit_json
+
+
+def test_enable_command_trace_write_failure_warns_once(mock_module, tmp_path):
+    """Test that an unwritable trace file only produces a single warning."""
+    trace_path = tmp_path / "missing" / "trace.jsonl"
+    mock_module.run_command.return_value = (0, "", "")
+    enable_command_trace(mock_module, False, str(trace_path))
+
+    mock_module.run_command(["splunk", "status"])
+    mock_module.run_command(["splunk", "status"])
+
+    mock_module.warn.assert_called_once()
+    assert "Failed to write command trace" in mock_module.warn.call_args[0][0]
+
+
+# ============================================================================
+# Tests for run_profiled
+# ============================================================================
+
+
+def test_run_profiled_disabled(monkeypatch):
+    """Test that the entry point is called directly without the environment variable."""
+    monkeypatch.delenv("SPLUNK_UF_PROFILE_DIR", raising=False)
+    run_module = MagicMock()
+
+    with patch("cProfile.Profile") as profile:
+        run_profiled(run_module, "splunk_universal_forwarder_linux")
+
+    run_module.assert_called_once_with()
+    profile.assert_not_called()
+
+
+def test_run_profiled_writes_profile(monkeypatch, tmp_path):
+    """Test that a pstats file and summary are written when enabled."""
+    monkeypatch.setenv("SPLUNK_UF_PROFILE_DIR", str(tmp_path / "profile"))
+    monkeypatch.setenv("SPLUNK_UF_PROFILE_TOP", "5")
+
+    def run_module():
+        raise SystemExit(0)
+
+    with pytest.raises(SystemExit):
+        run_profiled(run_module, "splunk_universal_forwarder_linux")
+
+    pstats_files = list((tmp_path / "profile").glob("*.pstats"))
+    summary_files = list((tmp_path / "profile").glob("*.txt"))
+    assert len(pstats_files) == 1
+    assert pstats_files[0].name.startswith("splunk_universal_forwarder_linux-")
+    assert len(summary_files) == 1
+    assert "cumulative" in summary_files[0].read_text()
+
+
+def test_run_profiled_write_failure_ignored(monkeypatch, tmp_path):
+    """Test that a profile write failure does not change the module outcome."""
+    blocker = tmp_path / "blocker"
+    blocker.write_text("")
+    monkeypatch.setenv("SPLUNK_UF_PROFILE_DIR", str(blocker / "profile"))
+    run_module = MagicMock()
+
+    run_profiled(run_module, "splunk_universal_forwarder_linux")
+
+    run_module.assert_called_once_with()
+
+
+# ============================================================================
+# Tests for parse_forward_servers
+# ============================================================================
+
+
+def test_parse_forward_servers_active_and_inactive():
+    """Test that servers from both sections are returned in order."""
+    output = """Active forwards:
+    10.0.0.1:9997
+Configured but inactive forwards:
+    10.0.0.2:9997
+"""
+
+    assert parse_forward_servers(output) == ["10.0.0.1:9997", "10.0.0.2:9997"]
+
+
+def test_parse_forward_servers_none():
+    """Test that 'None' placeholders are ignored."""
+    output = "Active forwards:\n\tNone\nConfigured but inactive forwards:\n\tNone\n"
+
+    assert parse_forward_servers(output) == []
+
+
+def test_parse_forward_servers_ignores_lines_before_header():
+    """Test that lines before the first section header are ignored."""
+    output = "Splunk username: admin\nActive forwards:\n\t10.0.0.1:9997\n"
+
+    assert parse_forward_servers(output) == ["10.0.0.1:9997"]
+
+
+# ============================================================================
+# Tests for parse_conf
+# ============================================================================
+
+
+def test_parse_conf_stanzas():
+    """Test that stanzas and keys are parsed and comments ignored."""
+    result = parse_conf(OUTPUTS_CONF)
+
+    assert result == {
+        "tcpout": {"defaultGroup": "default-autolb-group", "maxQueueSize": "auto"},
+        "tcpout:default-autolb-group": {"server": "10.0.0.1:9997"},
+    }
+
+
+def test_parse_conf_global_settings():
+    """Test that settings before the first stanza belong to [default]."""
+    result = parse_conf("host = web01\n[monitor:///var/log]\nindex = main\n")
+
+    assert result == {
+        "default": {"host": "web01"},
+        "monitor:///var/log": {"index": "main"},
+    }
+
+
+# ============================================================================
+# Tests for update_conf
+# ============================================================================
+
+
+def test_update_conf_replaces_and_adds_keys():
+    """Test that existing keys are replaced in place and new keys appended to the stanza."""
+    result = update_conf(
+        OUTPUTS_CONF, {"tcpout": {"maxQueueSize": "64MB", "useACK": "true"}}
+    )
+
+    assert (
+        result
+        == """# Managed by the forwarder team
+[tcpout]
+defaultGroup = default-autolb-group
+maxQueueSize = 64MB
+useACK = true
+
+[tcpout:default-autolb-group]
+server = 10.0.0.1:9997
+"""
+    )
+
+
+def test_update_conf_removes_key_and_stanza():
+    """Test that None removes a key, or a whole stanza."""
+    result = update_conf(
+        OUTPUTS_CONF,
+        {"tcpout": {"maxQueueSize": None}, "tcpout:default-autolb-group": None},
+    )
+
+    assert (
+        result
+        == """# Managed by the forwarder team
+[tcpout]
+defaultGroup = default-autolb-group
+
+"""
+    )
+
+
+def test_update_conf_adds_stanza():
+    """Test that a new stanza is appended at the end of the file."""
+    result = update_conf(OUTPUTS_CONF, {"tcpout:security": {"server": "10.1.0.1:9997"}})
+
+    assert result.endswith(
+        "server = 10.0.0.1:9997\n\n[tcpout:security]\nserver = 10.1.0.1:9997\n"
+    )
+
+
+def test_update_conf_separator():
+    """Test that keys can be written without spaces around the separator."""
+    result = update_conf(
+        "[splunkd]\nrootCategory=INFO,A1\n",
+        {"splunkd": {"rootCategory": "WARN,A1"}},
+        "=",
+    )
+
+    assert result == "[splunkd]\nrootCategory=WARN,A1\n"
+
+
+def test_update_conf_empty_file():
+    """Test that settings can be written to a new file."""
+    assert update_conf("", {"thruput": {"maxKBps": "0"}}) == "[thruput]\nmaxKBps = 0\n"
+
+
+# ============================================================================
+# Tests for diff_conf
+# ============================================================================
+
+
+def test_diff_conf_reports_changes():
+    """Test that only differing values are reported with before and after."""
+    current = parse_conf(OUTPUTS_CONF)
+
+    result = diff_conf(
+        current,
+        {"tcpout": {"maxQueueSize": "64MB", "defaultGroup": "default-autolb-group"}},
+    )
+
+    assert result == [
+        dict(stanza="tcpout", key="maxQueueSize", before="auto", after="64MB")
+    ]
+
+
+def test_diff_conf_uses_default_values():
+    """Test that a desired value equal to the default is not a change."""
+    defaults = {"tcpout": {"useACK": "false", "autoLBFrequency": "30"}}
+
+    result = diff_conf(
+        {}, {"tcpout": {"useACK": "false", "autoLBFrequency": "10"}}, defaults
+    )
+
+    assert result == [
+        dict(stanza="tcpout", key="autoLBFrequency", before="30", after="10")
+    ]
+
+
+def test_diff_conf_boolean_synonyms():
+    """Test that boolean values are compared by meaning."""
+    current = {"tcpout": {"useACK": "1", "compressed": "False"}}
+
+    result = diff_conf(current, {"tcpout": {"useACK": "true", "compressed": "false"}})
+
+    assert result == []
+
+
+def test_diff_conf_stanza_removal():
+    """Test that removing a stanza reports every key it held."""
+    current = parse_conf(OUTPUTS_CONF)
+
+    result = diff_conf(
+        current, {"tcpout:default-autolb-group": None, "tcpout:absent": None}
+    )
+
+    assert result == [
+        dict(
+            stanza="tcpout:default-autolb-group",
+            key="server",
+            before="10.0.0.1:9997",
+            after=None,
+        ),
+    ]
+
+
+# ============================================================================
+# Tests for apply_conf_settings
+# ============================================================================
+
+
+def test_apply_conf_settings_writes_changes(mock_module, tmp_path):
+    """Test that changed settings are written and reported per file."""
+    mock_module.check_mode = False
+    (tmp_path / "outputs.conf").write_text(OUTPUTS_CONF)
+
+    result = apply_conf_settings(
+        mock_module,
+        str(tmp_path),
+        {
+            "outputs.conf": {"tcpout": {"maxQueueSize": "64MB"}},
+            "limits.conf": {"thruput": {"maxKBps": "0"}},
+        },
+    )
+
+    assert result == [
+        dict(
+            file="outputs.conf",
+            stanza="tcpout",
+            key="maxQueueSize",
+            before="auto",
+            after="64MB",
+        ),
+        dict(
+            file="limits.conf", stanza="thruput", key="maxKBps", before=None, after="0"
+        ),
+    ]
+    assert "maxQueueSize = 64MB" in (tmp_path / "outputs.conf").read_text()
+    assert (tmp_path / "limits.conf").read_text() == "[thruput]\nmaxKBps = 0\n"
+    assert oct((tmp_path / "limits.conf").stat().st_mode & 0o777) == "0o600"
+
+
+@pytest.mark.skipif(os.geteuid() != 0, reason="changing file owners needs root")
+def test_apply_conf_settings_new_app_local_owner(mock_module, tmp_path):
+    """Test that a created app local directory and its file take the owner of the app directory."""
+    mock_module.check_mode = False
+    app_dir = tmp_path / "etc" / "apps" / "org_outputs"
+    app_dir.mkdir(parents=True)
+    os.chown(app_dir, 1234, 1235)
+    local_dir = app_dir / "local"
+
+    apply_conf_settings(
+        mock_module,
+        str(local_dir),
+        {"outputs.conf": {"tcpout": {"useACK": "true"}}},
+    )
+
+    for path in (local_dir, local_dir / "outputs.conf"):
+        assert (path.stat().st_uid, path.stat().st_gid) == (1234, 1235)
+
+
+def test_get_conf_dirs_system():
+    """Test that the managed files are in etc/system by default."""
+    assert get_conf_dirs("/opt/splunkforwarder", None) == (
+        "/opt/splunkforwarder/etc/system/local",
+        "/opt/splunkforwarder/etc/system/default",
+    )
+
+
+def test_get_conf_dirs_app():
+    """Test that the managed files are in the app directories when an app is given."""
+    assert get_conf_dirs("/opt/splunkforwarder", "logs") == (
+        "/opt/splunkforwarder/etc/apps/logs/local",
+        "/opt/splunkforwarder/etc/apps/logs/default",
+    )
+
+
+def test_get_conf_layer_dirs(tmp_path):
+    """Test that app local directories come before app default ones, then system/default."""
+    for app in ("search", "SplunkUniversalForwarder", "deploy_outputs"):
+        (tmp_path / "etc" / "apps" / app).mkdir(parents=True)
+    (tmp_path / "etc" / "apps" / "README").touch()
+    apps_dir = tmp_path / "etc" / "apps"
+
+    assert get_conf_layer_dirs(str(tmp_path)) == [
+        str(apps_dir / "SplunkUniversalForwarder" / "local"),
+        str(apps_dir / "deploy_outputs" / "local"),
+        str(apps_dir / "search" / "local"),
+        str(apps_dir / "SplunkUniversalForwarder" / "default"),
+        str(apps_dir / "deploy_outputs" / "default"),
+        str(apps_dir / "search" / "default"),
+        str(tmp_path / "etc" / "system" / "default"),
+    ]
+
+
+def test_apply_conf_settings_app_override(mock_module, tmp_path):
+    """Test that a value equal to system/default is written when an app overrides it."""
+    mock_module.check_mode = False
+    app_dir = tmp_path / "etc" / "apps" / "deploy_outputs" / "local"
+    app_dir.mkdir(parents=True)
+    (app_dir / "outputs.conf").write_text("[tcpout]\nuseACK = true\n")
+    system_default = tmp_path / "etc" / "system" / "default"
+    system_default.mkdir(parents=True)
+    (system_default / "outputs.conf").write_text("[tcpout]\nuseACK = false\n")
+    local_dir = tmp_path / "etc" / "system" / "local"
+
+    result = apply_conf_settings(
+        mock_module,
+        str(local_dir),
+        {"outputs.conf": {"tcpout": {"useACK": "false"}}},
+        get_conf_layer_dirs(str(tmp_path)),
+    )
+
+    assert result == [
+        dict(
+            file="outputs.conf",
+            stanza="tcpout",
+            key="useACK",
+            before="true",
+            after="false",
+        ),
+    ]
+    assert (local_dir / "outputs.conf").read_text() == "[tcpout]\nuseACK = false\n"
+
+
+def test_apply_conf_settings_idempotent(mock_module, tmp_path):
+    """Test that unchanged settings leave the file untouched."""
+    mock_module.check_mode = False
+    (tmp_path / "outputs.conf").write_text(OUTPUTS_CONF)
+    mtime = (tmp_path / "outputs.conf").stat().st_mtime_ns
+
+    result = apply_conf_settings(
+        mock_module,
+        str(tmp_path),
+        {"outputs.conf": {"tcpout": {"maxQueueSize": "auto"}}},
+    )
+
+    assert result == []
+    assert (tmp_path / "outputs.conf").stat().st_mtime_ns == mtime
+
+
+def test_apply_conf_settings_only_writes_changed_keys(mock_module, tmp_path):
+    """Test that settings already effective through the default file are not written."""
+    mock_module.check_mode = False
+    default_dir = tmp_path / "default"
+    local_dir = tmp_path / "local"
+    default_dir.mkdir()
+    (default_dir / "outputs.conf").write_text(
+        "[tcpout]\nuseACK = false\nautoLBFrequency = 30\n"
+    )
+
+    apply_conf_settings(
+        mock_module,
+        str(local_dir),
+        {"outputs.conf": {"tcpout": {"useACK": "false", "autoLBFrequency": "10"}}},
+        [str(default_dir)],
+    )
+
+    assert (
+        local_dir / "outputs.conf"
+    ).read_text() == "[tcpout]\nautoLBFrequency = 10\n"
+
+
+def test_apply_conf_settings_check_mode(mock_module, tmp_path):
+    """Test that check mode reports changes without writing."""
+    mock_module.check_mode = True
+
+    result = apply_conf_settings(
+        mock_module, str(tmp_path), {"outputs.conf": {"tcpout": {"useACK": "true"}}}
+    )
+
+    assert len(result) == 1
+    assert not (tmp_path / "outputs.conf").exists()
+
+
+# ============================================================================
+# Tests for merge_conf_settings
+# ============================================================================
+
+
+def test_merge_conf_settings():
+    """Test that settings are merged per file, stanza and key."""
+    target = {"outputs.conf": {"tcpout": {"useACK": "true"}}}
+
+    merge_conf_settings(
+        target, {"outputs.conf": {"tcpout": {"compressed": "true"}, "tcpout:old": None}}
+    )
+
+    assert target == {
+        "outputs.conf": {
+            "tcpout": {"useACK": "true", "compressed": "true"},
+            "tcpout:old": None,
+        },
+    }
+
+
+# ============================================================================
+# Tests for parse_conf_size
+# ============================================================================
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    [
+        ("512", 512),
+        ("10KB", 10240),
+        ("64MB", 64 * 1024**2),
+        ("5gb", 5 * 1024**3),
+        (" 1TB ", 1024**4),
+    ],
+)
+def test_parse_conf_size(value, expected):
+    """Test that sizes with and without units are converted to bytes."""
+    assert parse_conf_size(value) == expected
+
+
+@pytest.mark.parametrize("value", ["", "auto", "1.5GB", "10 PB", "-1MB"])
+def test_parse_conf_size_invalid(value):
+    """Test that invalid sizes raise ValueError."""
+    with pytest.raises(ValueError):
+        parse_conf_size(value)
+
+
+# ============================================================================
+# Tests for parse_conf_duration
+# ============================================================================
+
+
+@pytest.mark.parametrize(
+    "value,expected", [("30s", 30), ("15m", 900), ("24h", 86400), ("7d", 604800)]
+)
+def test_parse_conf_duration(value, expected):
+    """Test that durations are converted to seconds."""
+    assert parse_conf_duration(value) == expected
+
+
+@pytest.mark.parametrize("value", ["", "7", "7 days", "1w"])
+def test_parse_conf_duration_invalid(value):
+    """Test that invalid durations raise ValueError."""
+    with pytest.raises(ValueError):
+        parse_conf_duration(value)
+
+
+# ============================================================================
+# Tests for reload_endpoints
+# ============================================================================
+
+
+def test_reload_endpoints(mock_module):
+    """Test that every endpoint is called with the credentials in the environment."""
+    mock_module.run_command.return_value = (0, "", "")
+
+    result = reload_endpoints(
+        mock_module,
+        "/opt/splunkforwarder",
+        "admin",
+        "secret",
+        ["/a/_reload", "/b/_reload"],
+    )
+
+    assert result is True
+    assert [call[0][0][3] for call in mock_module.run_command.call_args_list] == [
+        "/a/_reload",
+        "/b/_reload",
+    ]
+    assert (
+        mock_module.run_command.call_args[1]["environ_update"]["SPLUNK_PASSWORD"]
+        == "secret"
+    )
+
+
+def test_reload_endpoints_failure(mock_module):
+    """Test that a failed reload stops and returns False."""
+    mock_module.run_command.return_value = (1, "", "error")
+
+    assert (
+        reload_endpoints(
+            mock_module,
+            "/opt/splunkforwarder",
+            "admin",
+            "secret",
+            ["/a/_reload", "/b/_reload"],
+        )
+        is False
+    )
+    assert mock_module.run_command.call_count == 1
+    mock_module.warn.assert_called_once()
+
+
+# ============================================================================
+# Tests for reload_or_restart
+# ============================================================================
+
+
+def test_reload_or_restart_reload(mock_module):
+    """Test that reloadable files are reloaded without a restart."""
+    mock_module.run_command.return_value = (0, "", "")
+
+    changes = [
+        dict(file="inputs.conf", stanza="monitor:///var/log/app", key="index"),
+        dict(file="inputs.conf", stanza="batch:///var/spool", key="index"),
+    ]
+
+    assert (
+        reload_or_restart(
+            mock_module, "/opt/splunkforwarder", changes, "admin", "secret"
+        )
+        == "reload"
+    )
+    assert mock_module.run_command.call_count == 1
+
+
+def test_reload_or_restart_not_reloadable(mock_module):
+    """Test that a setting without a reload endpoint restarts Splunk once."""
+    mock_module.run_command.return_value = (0, "", "")
+    changes = [
+        dict(file="inputs.conf", stanza="monitor:///var/log/app", key="index"),
+        dict(file="inputs.conf", stanza="udp://514", key="queueSize"),
+    ]
+
+    result = reload_or_restart(
+        mock_module, "/opt/splunkforwarder", changes, "admin", "secret"
+    )
+
+    assert result == "restart"
+    assert [call[0][0][1] for call in mock_module.run_command.call_args_list] == [
+        "status",
+        "restart",
+    ]
+
+
+def test_reload_or_restart_reload_failure(mock_module):
+    """Test that Splunk is restarted when the reload fails."""
+    mock_module.run_command.side_effect = [
+        (1, "", "error"),
+        (0, "running", ""),
+        (0, "", ""),
+    ]
+
+    changes = [dict(file="inputs.conf", stanza="monitor:///var/log/app", key="index")]
+
+    assert (
+        reload_or_restart(
+            mock_module, "/opt/splunkforwarder", changes, "admin", "secret"
+        )
+        == "restart"
+    )
+    assert mock_module.run_command.call_args[0][0] == [
+        "/opt/splunkforwarder/bin/splunk",
+        "restart",
+    ]
+
+
+def test_reload_or_restart_not_running(mock_module):
+    """Test that a stopped Splunk is not started."""
+    mock_module.run_command.return_value = (3, "splunkd is not running", "")
+
+    changes = [dict(file="outputs.conf", stanza="tcpout", key="useACK")]
+
+    assert (
+        reload_or_restart(mock_module, "/opt/splunkforwarder", changes) == "next_start"
+    )
+    assert mock_module.run_command.call_count == 1
+
+
+def test_reload_or_restart_before_restart(mock_module):
+    """Test that before_restart is called before the restart only."""
+    calls = []
+    mock_module.run_command.side_effect = lambda args, **kwargs: calls.append(
+        args[1]
+    ) or (0, "", "")
+
+    changes = [dict(file="outputs.conf", stanza="tcpout", key="useACK")]
+
+    reload_or_restart(
+        mock_module,
+        "/opt/splunkforwarder",
+        changes,
+        before_restart=lambda: calls.append("drain"),
+    )
+
+    assert calls == ["status", "drain", "restart"]
+
+
+# ============================================================================
+# Tests for read_tcpout_queues
+# ============================================================================
+
+
+def test_read_tcpout_queues_latest_sample(tmp_path):
+    """Test that the latest sample of each tcpout queue wins."""
+    path = tmp_path / "metrics.log"
+    path.write_text(
+        METRICS_LINE.format(second=0, group="primary", size=40)
+        + "10-19-2026 10:00:00.000 +0000 INFO  Metrics - group=queue, name=parsingqueue, current_size=7\n"
+        + METRICS_LINE.format(second=30, group="primary", size=0)
+        + METRICS_LINE.format(second=30, group="backup", size=3),
+    )
+
+    queues, offset = read_tcpout_queues(str(path))
+
+    assert queues == {"tcpout_primary": 0, "tcpout_backup": 3}
+    assert offset == path.stat().st_size
+
+
+def test_read_tcpout_queues_offset(tmp_path):
+    """Test that only the lines written after the offset are read."""
+    path = tmp_path / "metrics.log"
+    path.write_text(METRICS_LINE.format(second=0, group="primary", size=40))
+    queues, offset = read_tcpout_queues(str(path))
+    with path.open("a") as f:
+        f.write(METRICS_LINE.format(second=30, group="backup", size=2))
+
+    assert read_tcpout_queues(str(path), offset) == (
+        {"tcpout_backup": 2},
+        path.stat().st_size,
+    )
+
+
+def test_read_tcpout_queues_tail(tmp_path):
+    """Test that a large file is only read from its end, skipping the partial first line."""
+    path = tmp_path / "metrics.log"
+    path.write_text(
+        METRICS_LINE.format(second=0, group="old", size=9)
+        + "10-19-2026 10:00:00.000 +0000 INFO  Metrics - group=pipeline, name=parsing, cpu_seconds=0\n"
+        * 5000
+        + METRICS_LINE.format(second=30, group="primary", size=1),
+    )
+
+    queues, offset = read_tcpout_queues(str(path))
+
+    assert queues == {"tcpout_primary": 1}
+
+
+def test_read_tcpout_queues_missing(tmp_path):
+    """Test that a missing metrics.log has no queues."""
+    assert read_tcpout_queues(str(tmp_path / "metrics.log")) == ({}, None)
+
+
+# ============================================================================
+# Tests for drain_outputs
+# ============================================================================
+
+
+def test_drain_outputs_empty(mock_module, tmp_path):
+    """Test that empty queues do not wait."""
+    log_dir = tmp_path / "var" / "log" / "splunk"
+    log_dir.mkdir(parents=True)
+    (log_dir / "metrics.log").write_text(
+        METRICS_LINE.format(second=0, group="primary", size=0)
+    )
+
+    with patch("plugins.module_utils.splunk_uf_linux_utils.time.sleep") as sleep:
+        result = drain_outputs(mock_module, str(tmp_path), 30)
+
+    assert result["drained"] is True
+    assert result["queues"] == {"tcpout_primary": 0}
+    sleep.assert_not_called()
+
+
+def test_drain_outputs_drains(mock_module, tmp_path):
+    """Test that the queues are polled until a new sample shows them empty."""
+    log_dir = tmp_path / "var" / "log" / "splunk"
+    log_dir.mkdir(parents=True)
+    path = log_dir / "metrics.log"
+    path.write_text(METRICS_LINE.format(second=0, group="primary", size=40))
+
+    def sample(seconds):
+        with path.open("a") as f:
+            f.write(METRICS_LINE.format(second=30, group="primary", size=0))
+
+    with patch(
+        "plugins.module_utils.splunk_uf_linux_utils.time.sleep", side_effect=sample
+    ) as sleep:
+        result = drain_outputs(mock_module, str(tmp_path), 30)
+
+    assert result["drained"] is True
+    assert sleep.call_count == 1
+    mock_module.warn.assert_not_called()
+
+
+def test_drain_outputs_timeout(mock_module, tmp_path):
+    """Test that blocked queues are waited for until the timeout, with a warning."""
+    log_dir = tmp_path / "var" / "log" / "splunk"
+    log_dir.mkdir(parents=True)
+    (log_dir / "metrics.log").write_text(
+        METRICS_LINE.format(second=0, group="primary", size=40)
+    )
+
+    with patch("plugins.module_utils.splunk_uf_linux_utils.time.sleep") as sleep:
+        result = drain_outputs(mock_module, str(tmp_path), 12, poll_interval=5)
+
+    assert result["drained"] is False
+    assert result["queues"] == {"tcpout_primary": 40}
+    assert sleep.call_count == 3
+    mock_module.warn.assert_called_once()
+
+
+def test_drain_outputs_no_metrics(mock_module, tmp_path):
+    """Test that a forwarder without metrics.log has nothing to drain."""
+    assert drain_outputs(mock_module, str(tmp_path), 30)["drained"] is True
+
+
+# ============================================================================
+# Tests for verify_data_flow
+# ============================================================================
+
+
+@pytest.fixture
+def metrics_log(tmp_path):
+    """Create the metrics.log of a forwarder in tmp_path."""
+    log_dir = tmp_path / "var" / "log" / "splunk"
+    log_dir.mkdir(parents=True)
+    return log_dir / "metrics.log"
+
+
+def test_verify_data_flow_verified(mock_module, tmp_path, metrics_log):
+    """Test that a sample showing data sent after the call verifies the data flow."""
+    metrics_log.write_text("")
+    samples = iter(
+        [CONNECTION_LINE.format(kb="0.00"), CONNECTION_LINE.format(kb="12.5")]
+    )
+
+    def sample(seconds):
+        with metrics_log.open("a") as f:
+            f.write(next(samples))
+
+    with patch(
+        "plugins.module_utils.splunk_uf_linux_utils.time.sleep", side_effect=sample
+    ) as sleep:
+        result = verify_data_flow(mock_module, str(tmp_path), 60)
+
+    assert result["verified"] is True
+    assert result["connections"] == {"default-autolb-group:10.0.0.1:9997:0": 12.5}
+    assert sleep.call_count == 2
+
+
+def test_verify_data_flow_ignores_earlier_samples(mock_module, tmp_path, metrics_log):
+    """Test that samples written before the call do not verify the data flow."""
+    metrics_log.write_text(CONNECTION_LINE.format(kb="80.0"))
+
+    with patch("plugins.module_utils.splunk_uf_linux_utils.time.sleep") as sleep:
+        result = verify_data_flow(mock_module, str(tmp_path), 12, poll_interval=5)
+
+    assert result["verified"] is False
+    assert result["connections"] == {}
+    assert sleep.call_count == 3
+
+
+def test_verify_data_flow_checks_before_waiting(mock_module, tmp_path, metrics_log):
+    """Test that data already sent when the file is first read verifies without a wait."""
+    metrics_log.write_text("")
+    getsize = os.path.getsize
+    sizes = []
+
+    def size(path):
+        # the sample lands between the offset being taken and the first read
+        sizes.append(getsize(path))
+        if len(sizes) == 1:
+            metrics_log.write_text(CONNECTION_LINE.format(kb="4.2"))
+        return sizes[0] if len(sizes) == 1 else getsize(path)
+
+    with patch(
+        "plugins.module_utils.splunk_uf_linux_utils.os.path.getsize", side_effect=size
+    ), patch("plugins.module_utils.splunk_uf_linux_utils.time.sleep") as sleep:
+        result = verify_data_flow(mock_module, str(tmp_path), 60)
+
+    assert result["verified"] is True
+    sleep.assert_not_called()
+
+
+def test_verify_data_flow_caps_last_wait(mock_module, tmp_path, metrics_log):
+    """Test that the last wait ends at the timeout instead of a full poll interval later."""
+    metrics_log.write_text("")
+    clock = [100.0]
+
+    def sleep(seconds):
+        clock[0] += seconds
+
+    with patch(
+        "plugins.module_utils.splunk_uf_linux_utils.time.monotonic",
+        side_effect=lambda: clock[0],
+    ), patch(
+        "plugins.module_utils.splunk_uf_linux_utils.time.sleep", side_effect=sleep
+    ) as sleeper:
+        result = verify_data_flow(mock_module, str(tmp_path), 12, poll_interval=5)
+
+    assert result["verified"] is False
+    assert [c.args[0] for c in sleeper.call_args_list] == [5, 5, 2]
+    assert result["seconds"] == 12
+
+
+def test_verify_data_flow_new_file(mock_module, tmp_path, metrics_log):
+    """Test that a metrics.log created after the call is read from its start."""
+
+    def sample(seconds):
+        metrics_log.write_text(CONNECTION_LINE.format(kb="3.1"))
+
+    with patch(
+        "plugins.module_utils.splunk_uf_linux_utils.time.sleep", side_effect=sample
+    ):
+        result = verify_data_flow(mock_module, str(tmp_path), 60)
+
+    assert result["verified"] is True
+
+
+# ============================================================================
+# Tests for read_host_load, get_load_excess and wait_for_low_load
+# ============================================================================
+
+
+@pytest.fixture
+def proc_dir(tmp_path, monkeypatch):
+    """Point the host load sources at tmp_path."""
+    (tmp_path / "pressure").mkdir()
+    monkeypatch.setattr(
+        "plugins.module_utils.splunk_uf_linux_utils.LOADAVG_PATH",
+        str(tmp_path / "loadavg"),
+    )
+    monkeypatch.setattr(
+        "plugins.module_utils.splunk_uf_linux_utils.PRESSURE_DIR",
+        str(tmp_path / "pressure"),
+    )
+    monkeypatch.setattr(
+        "plugins.module_utils.splunk_uf_linux_utils.os.cpu_count", lambda: 4
+    )
+    return tmp_path
+
+
+def write_pressure(proc_dir, resource, avg10):
+    (proc_dir / "pressure" / resource).write_text(
+        f"some avg10={avg10} avg60=1.00 avg300=0.50 total=123456\nfull avg10=0.00 avg60=0.00 avg300=0.00 total=0\n",
+    )
+
+
+def test_read_host_load(proc_dir):
+    """Test that the load average is divided by the CPUs and the pressure is the some avg10 value."""
+    (proc_dir / "loadavg").write_text("6.00 4.00 2.00 3/812 90210\n")
+    write_pressure(proc_dir, "cpu", "12.50")
+    write_pressure(proc_dir, "io", "3.25")
+
+    assert read_host_load() == dict(
+        load_per_cpu=1.5, cpu_pressure=12.5, io_pressure=3.25
+    )
+
+
+def test_read_host_load_without_pressure(proc_dir):
+    """Test that a kernel without pressure stall information only reports the load average."""
+    (proc_dir / "loadavg").write_text("1.00 1.00 1.00 1/100 1\n")
+
+    assert read_host_load() == dict(
+        load_per_cpu=0.25, cpu_pressure=None, io_pressure=None
+    )
+
+
+def test_get_load_excess():
+    """Test that only the values above a set limit are reported."""
+    load = dict(load_per_cpu=1.5, cpu_pressure=None, io_pressure=3.0)
+    limits = dict(max_load_per_cpu=1.0, max_cpu_pressure=5.0, max_io_pressure=None)
+
+    assert get_load_excess(load, limits) == ["load_per_cpu 1.5 > 1.0"]
+
+
+def test_wait_for_low_load_drops(mock_module, proc_dir):
+    """Test that the wait ends as soon as the load drops below the limits."""
+    (proc_dir / "loadavg").write_text("0.40 0.40 0.40 1/100 1\n")
+    write_pressure(proc_dir, "io", "30.00")
+
+    with patch(
+        "plugins.module_utils.splunk_uf_linux_utils.time.sleep",
+        side_effect=lambda seconds: write_pressure(proc_dir, "io", "2.00"),
+    ) as sleep:
+        result = wait_for_low_load(mock_module, dict(max_io_pressure=10.0), 600)
+
+    assert result["below_limits"] is True
+    assert result["load"] == dict(load_per_cpu=0.1, cpu_pressure=None, io_pressure=2.0)
+    assert sleep.call_count == 1
+
+
+def test_wait_for_low_load_max_wait(mock_module, proc_dir):
+    """Test that a busy host is waited for until max_wait, with a warning."""
+    (proc_dir / "loadavg").write_text("16.00 16.00 16.00 1/100 1\n")
+
+    with patch("plugins.module_utils.splunk_uf_linux_utils.time.sleep") as sleep:
+        result = wait_for_low_load(
+            mock_module, dict(max_load_per_cpu=2.0), 25, poll_interval=10
+        )
+
+    assert result["below_limits"] is False
+    assert sleep.call_count == 3
+    mock_module.warn.assert_called_once()
+
+
+# ============================================================================
+# Tests for get_mgmt_port, get_service_splunk_homes and is_same_instance
+# ============================================================================
+
+
+def test_get_mgmt_port(tmp_path):
+    """Test that the port is read from mgmtHostPort, with 8089 as default."""
+    assert get_mgmt_port(str(tmp_path)) == 8089
+
+    local_dir = tmp_path / "etc" / "system" / "local"
+    local_dir.mkdir(parents=True)
+    (local_dir / "web.conf").write_text("[settings]\nmgmtHostPort = 127.0.0.1:8090\n")
+
+    assert get_mgmt_port(str(tmp_path)) == 8090
+
+
+def test_get_service_splunk_homes(tmp_path, monkeypatch):
+    """Test that only the services running bin/splunk are mapped to their $SPLUNK_HOME."""
+    monkeypatch.setattr(
+        "plugins.module_utils.splunk_uf_linux_utils.SYSTEMD_UNIT_DIR", str(tmp_path)
+    )
+    (tmp_path / "SplunkForwarder.service").write_text(
+        "[Service]\nExecStart=/opt/splunkforwarder/bin/splunk _internal_launch_under_systemd\n",
+    )
+    (tmp_path / "SplunkForwarder2.service").write_text(
+        "[Service]\nExecStart=/data/uf2/bin/splunk _internal_launch_under_systemd\n",
+    )
+    (tmp_path / "sshd.service").write_text("[Service]\nExecStart=/usr/sbin/sshd -D\n")
+
+    assert get_service_splunk_homes() == {
+        "SplunkForwarder": "/opt/splunkforwarder",
+        "SplunkForwarder2": "/data/uf2",
+    }
+
+
+@pytest.mark.parametrize(
+    "path, expected",
+    [
+        ("/opt/splunkforwarder", True),
+        ("/opt/splunkforwarder/", True),
+        ("/opt/splunkforwarder-9.4.7", True),
+        ("/opt/splunkforwarder-2", False),
+        ("/opt/splunkforwarder2", False),
+    ],
+)
+def test_is_same_instance(path, expected):
+    """Test that the versioned directories belong to their instance, other instances do not."""
+    assert is_same_instance(path, "/opt/splunkforwarder") is expected
+
+
+# ============================================================================
+# Tests for redact_conf_changes
+# ============================================================================
+
+
+def test_redact_conf_changes():
+    """Test that only the values of credential keys are masked."""
+    changes = [
+        dict(
+            file="outputs.conf",
+            stanza="tcpout",
+            key="sslPassword",
+            before=None,
+            after="s3cret",
+        ),
+        dict(
+            file="server.conf",
+            stanza="general",
+            key="pass4SymmKey",
+            before="$7$abc",
+            after="key",
+        ),
+        dict(
+            file="limits.conf", stanza="thruput", key="maxKBps", before="256", after="0"
+        ),
+    ]
+
+    assert [(c["before"], c["after"]) for c in redact_conf_changes(changes)] == [
+        (None, "********"),
+        ("********", "********"),
+        ("256", "0"),
+    ]
+    assert changes[0]["after"] == "s3cret"
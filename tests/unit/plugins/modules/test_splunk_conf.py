@@ -0,0 +1,100 @@
+# Copyright (c) Ansible Project
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from plugins.modules.splunk_conf import build_conf_edits
+
+
+@pytest.fixture
+def mock_module():
+    """Create a mock AnsibleModule for testing.
+
+    The fail_json mock raises SystemExit to simulate real Ansible behavior
+    where fail_json terminates module execution.
+    """
+    mock = MagicMock()
+    mock.fail_json = MagicMock(side_effect=SystemExit(1))
+    mock.warn = MagicMock()
+    return mock
+
+
+def edit(file, stanza, key=None, value=None, state="present"):
+    return dict(file=file, stanza=stanza, key=key, value=value, state=state)
+
+
+# ============================================================================
+# Tests for build_conf_edits
+# ============================================================================
+
+
+def test_build_conf_edits(mock_module):
+    """Test that edits are grouped per file and stanza."""
+    result = build_conf_edits(
+        mock_module,
+        [
+            edit("outputs.conf", "tcpout", "useACK", True),
+            edit("outputs.conf", "tcpout", "maxQueueSize", state="absent"),
+            edit("limits.conf", "thruput", "maxKBps", 0),
+            edit("inputs.conf", "monitor:///var/log/old", state="absent"),
+        ],
+    )
+
+    assert result == {
+        "outputs.conf": {"tcpout": {"useACK": "true", "maxQueueSize": None}},
+        "limits.conf": {"thruput": {"maxKBps": "0"}},
+        "inputs.conf": {"monitor:///var/log/old": None},
+    }
+
+
+@pytest.mark.parametrize(
+    "edits",
+    [
+        [edit("../passwd", "tcpout", "useACK", "true")],
+        [edit("outputs.cfg", "tcpout", "useACK", "true")],
+        [edit("outputs.conf", "[tcpout]", "useACK", "true")],
+        [edit("outputs.conf", "tcpout")],
+        [edit("outputs.conf", "tcpout", "useACK")],
+        [edit("outputs.conf", "tcpout", "useACK", "true\n[other]")],
+        [
+            edit("outputs.conf", "tcpout", "useACK", "true"),
+            edit("outputs.conf", "tcpout", "useACK", "false"),
+        ],
+        [
+            edit("outputs.conf", "tcpout", "useACK", "true"),
+            edit("outputs.conf", "tcpout", state="absent"),
+        ],
+        [
+            edit("outputs.conf", "tcpout", state="absent"),
+            edit("outputs.conf", "tcpout", "useACK", "true"),
+        ],
+    ],
+)
+def test_build_conf_edits_invalid(mock_module, edits):
+    """Test that invalid or conflicting edits fail the module."""
+    with pytest.raises(SystemExit):
+        build_conf_edits(mock_module, edits)
+
+    mock_module.fail_json.assert_called_once()
+
+
+def test_build_conf_edits_hides_credentials(mock_module):
+    """Test that the value of a credential key is added to the no_log values."""
+    mock_module.no_log_values = set()
+
+    build_conf_edits(
+        mock_module,
+        [
+            edit("outputs.conf", "tcpout:group", "sslPassword", "s3cret"),
+            edit("outputs.conf", "tcpout:group", "server", "idx1:9997"),
+        ],
+    )
+
+    assert mock_module.no_log_values == {"s3cret"}
@@ -6,18 +6,55 @@ from __future__ import absolute_import, division, print_function
 
 __metaclass__ = type
 
+import hashlib
+import io
+import os
 from unittest.mock import MagicMock, mock_open, patch
 
 import pytest
 
+from plugins.module_utils.splunk_uf_linux_utils import get_deployment_server
 from plugins.modules.splunk_universal_forwarder_linux import (
+    OUTPUT_SETTINGS_KEYS,
+    build_deployment_client_settings,
+    build_deployment_server_settings,
+    build_indexer_discovery,
+    build_input_queue_settings,
+    build_instance_settings,
+    build_internal_logging_settings,
+    build_output_groups,
+    build_output_settings,
+    build_throughput_settings,
     check_if_downgrade,
+    check_instance_conflicts,
     check_rhel_version,
     check_splunk_service,
-    get_deployment_server,
+    configure_splunk,
+    copy_missing_files,
+    download_file,
+    fetch_package,
+    get_configured_forward_servers,
     get_existing_forward_servers,
     get_installed_version,
+    get_linked_version,
+    get_package_filename,
+    get_service_name,
+    host_splay,
+    is_package_staged,
     is_splunk_installed,
+    prepare_image,
+    preserve_splunk_state,
+    purge_splunk_home,
+    read_snapshot,
+    record_staged_package,
+    restore_splunk_state,
+    rollback_splunk,
+    snapshot_splunk_home,
+    start_stopped_splunk,
+    sweep_tombstones,
+    switch_splunk_home,
+    verify_after_change,
+    verify_checksum,
 )
 
 
@@ -304,6 +341,240 @@ def test_check_if_downgrade_complex_downgrade():
     assert result is True
 
 
+# ============================================================================
+# Tests for download_file
+# ============================================================================
+
+
+def fake_response(content, code=200, length=None):
+    """Create a fake open_url response streaming content."""
+    response = MagicMock()
+    stream = io.BytesIO(content)
+    response.read.side_effect = stream.read
+    response.getcode.return_value = code
+    response.headers = {
+        "Content-Length": str(len(content) if length is None else length)
+    }
+    return response
+
+
+def test_download_file_success(mock_module, tmp_path):
+    """Test that the file is streamed into place without a leftover part file."""
+    mock_module.check_mode = False
+    dest = tmp_path / "splunkforwarder.rpm"
+
+    with patch(
+        "plugins.modules.splunk_universal_forwarder_linux.open_url",
+        return_value=fake_response(b"x" * 1000),
+    ) as open_url:
+        download_file(
+            mock_module, "https://example.com/pkg.rpm", str(dest), chunk_size=64
+        )
+
+    assert dest.read_bytes() == b"x" * 1000
+    assert not (tmp_path / "splunkforwarder.rpm.part").exists()
+    assert open_url.call_args[1]["headers"] is None
+
+
+def test_download_file_check_mode(mock_module, tmp_path):
+    """Test that nothing is downloaded in check mode."""
+    mock_module.check_mode = True
+
+    with patch("plugins.modules.splunk_universal_forwarder_linux.open_url") as open_url:
+        download_file(
+            mock_module, "https://example.com/pkg.rpm", str(tmp_path / "pkg.rpm")
+        )
+
+    open_url.assert_not_called()
+
+
+def test_download_file_resumes_truncated_transfer(mock_module, tmp_path):
+    """Test that a dropped connection is resumed with a range request."""
+    mock_module.check_mode = False
+    dest = tmp_path / "splunkforwarder.rpm"
+    responses = [
+        fake_response(b"a" * 400, length=1000),
+        fake_response(b"b" * 600, code=206),
+    ]
+
+    with patch(
+        "plugins.modules.splunk_universal_forwarder_linux.open_url",
+        side_effect=responses,
+    ) as open_url:
+        download_file(mock_module, "https://example.com/pkg.rpm", str(dest))
+
+    assert dest.read_bytes() == b"a" * 400 + b"b" * 600
+    assert open_url.call_args[1]["headers"] == {"Range": "bytes=400-"}
+
+
+def test_download_file_restarts_without_range_support(mock_module, tmp_path):
+    """Test that the download restarts when the server ignores the range request."""
+    mock_module.check_mode = False
+    dest = tmp_path / "splunkforwarder.rpm"
+    (tmp_path / "splunkforwarder.rpm.part").write_bytes(b"stale")
+
+    with patch(
+        "plugins.modules.splunk_universal_forwarder_linux.open_url",
+        return_value=fake_response(b"fresh content"),
+    ):
+        download_file(mock_module, "https://example.com/pkg.rpm", str(dest))
+
+    assert dest.read_bytes() == b"fresh content"
+
+
+def test_download_file_fails_after_retries(mock_module, tmp_path):
+    """Test failure once every attempt has failed."""
+    mock_module.check_mode = False
+
+    with patch(
+        "plugins.modules.splunk_universal_forwarder_linux.open_url",
+        side_effect=OSError("connection refused"),
+    ) as open_url:
+        with pytest.raises(SystemExit):
+            download_file(
+                mock_module,
+                "https://example.com/pkg.rpm",
+                str(tmp_path / "pkg.rpm"),
+                retries=2,
+            )
+
+    assert open_url.call_count == 2
+    assert "connection refused" in mock_module.fail_json.call_args[1]["msg"]
+    assert not (tmp_path / "pkg.rpm").exists()
+
+
+# ============================================================================
+# Tests for verify_checksum
+# ============================================================================
+
+
+def write_package(tmp_path, content, checksum=None):
+    """Write a package and its checksum file, returning both paths."""
+    rpm_path = tmp_path / "splunkforwarder.rpm"
+    rpm_path.write_bytes(content)
+    checksum = checksum or hashlib.sha512(content).hexdigest()
+    checksum_path = tmp_path / "splunkforwarder.rpm.sha512"
+    checksum_path.write_text(f"SHA512(splunkforwarder.rpm)= {checksum}\n")
+    return str(rpm_path), str(checksum_path)
+
+
+def test_verify_checksum_success(mock_module, tmp_path):
+    """Test that a matching checksum is accepted regardless of chunk size."""
+    rpm_path, checksum_path = write_package(tmp_path, b"x" * 10000)
+
+    assert verify_checksum(mock_module, rpm_path, checksum_path) is True
+    assert verify_checksum(mock_module, rpm_path, checksum_path, chunk_size=7) is True
+    mock_module.fail_json.assert_not_called()
+
+
+def test_verify_checksum_mismatch(mock_module, tmp_path):
+    """Test failure when the package does not match the checksum."""
+    rpm_path, checksum_path = write_package(tmp_path, b"payload", checksum="ab" * 64)
+
+    with pytest.raises(SystemExit):
+        verify_checksum(mock_module, rpm_path, checksum_path)
+
+    assert "Checksum verification failed" in mock_module.fail_json.call_args[1]["msg"]
+
+
+def test_verify_checksum_unparsable(mock_module, tmp_path):
+    """Test failure when the checksum file has an unexpected format."""
+    rpm_path, checksum_path = write_package(tmp_path, b"payload")
+    (tmp_path / "splunkforwarder.rpm.sha512").write_text("not a checksum\n")
+
+    with pytest.raises(SystemExit):
+        verify_checksum(mock_module, rpm_path, checksum_path)
+
+    assert "Could not parse checksum file" in mock_module.fail_json.call_args[1]["msg"]
+
+
+# ============================================================================
+# Tests for is_package_staged, record_staged_package and fetch_package
+# ============================================================================
+
+
+def test_record_staged_package(mock_module, tmp_path):
+    """Test that a recorded package is staged until it changes."""
+    mock_module.check_mode = False
+    rpm_path, checksum_path = write_package(tmp_path, b"payload")
+
+    assert is_package_staged(rpm_path, checksum_path) is False
+    record_staged_package(mock_module, rpm_path, checksum_path)
+    assert is_package_staged(rpm_path, checksum_path) is True
+
+    with open(rpm_path, "ab") as f:
+        f.write(b"tampered")
+    assert is_package_staged(rpm_path, checksum_path) is False
+
+
+def test_is_package_staged_checksum_changed(mock_module, tmp_path):
+    """Test that a new checksum file invalidates the staged package."""
+    mock_module.check_mode = False
+    rpm_path, checksum_path = write_package(tmp_path, b"payload")
+    record_staged_package(mock_module, rpm_path, checksum_path)
+
+    (tmp_path / "splunkforwarder.rpm.sha512").write_text(
+        f"SHA512(splunkforwarder.rpm)= {'ab' * 64}\n"
+    )
+
+    assert is_package_staged(rpm_path, checksum_path) is False
+
+
+def test_fetch_package_staged(mock_module, tmp_path):
+    """Test that a staged package is neither downloaded nor verified again."""
+    mock_module.check_mode = False
+    rpm_path, checksum_path = write_package(tmp_path, b"payload")
+    record_staged_package(mock_module, rpm_path, checksum_path)
+
+    with patch(
+        "plugins.modules.splunk_universal_forwarder_linux.verify_checksum"
+    ) as mock_verify:
+        assert (
+            fetch_package(
+                mock_module,
+                "https://example.com/splunkforwarder.rpm",
+                rpm_path,
+                checksum_path,
+            )
+            is False
+        )
+
+    mock_verify.assert_not_called()
+
+
+# ============================================================================
+# Tests for get_configured_forward_servers
+# ============================================================================
+
+
+def test_get_configured_forward_servers(tmp_path):
+    """Test that the servers of every target group are read with the precedence of Splunk."""
+    local_dir = tmp_path / "etc" / "system" / "local"
+    local_dir.mkdir(parents=True)
+    (local_dir / "outputs.conf").write_text(
+        "[tcpout]\ndefaultGroup = default-autolb-group\n\n"
+        "[tcpout:default-autolb-group]\nserver = 10.0.0.1:9997, 10.0.0.2:9997\n\n"
+        "[tcpout-server://10.0.0.1:9997]\n"
+    )
+    app_dir = tmp_path / "etc" / "apps" / "org_outputs" / "default"
+    app_dir.mkdir(parents=True)
+    (app_dir / "outputs.conf").write_text(
+        "[tcpout:default-autolb-group]\nserver = 10.0.0.9:9997\n\n"
+        "[tcpout:backup]\nserver = 10.0.0.2:9997,10.0.0.3:9997\n"
+    )
+
+    assert get_configured_forward_servers(str(tmp_path)) == [
+        "10.0.0.1:9997",
+        "10.0.0.2:9997",
+        "10.0.0.3:9997",
+    ]
+
+
+def test_get_configured_forward_servers_none(tmp_path):
+    """Test that a forwarder without outputs.conf has no forward servers."""
+    assert get_configured_forward_servers(str(tmp_path)) == []
+
+
 # ============================================================================
 # Tests for get_existing_forward_servers
 # ============================================================================
@@ -452,6 +723,17 @@ def test_get_deployment_server_missing_uri(mock_module):
     assert result is None
 
 
+def test_get_deployment_server_other_stanza(mock_module):
+    """Test that a targetUri outside the deployment server stanza is ignored."""
+    fake_content = "[deployment-client]\ntargetUri = wrong:8089\n[target-broker:deploymentServer]\n"
+
+    with patch("os.path.exists", return_value=True):
+        with patch("builtins.open", mock_open(read_data=fake_content)):
+            result = get_deployment_server(mock_module, "/opt/splunkforwarder")
+
+    assert result is None
+
+
 # ============================================================================
 # Tests for check_splunk_service
 # ============================================================================
@@ -555,3 +837,1023 @@ def test_check_splunk_service_max_retries_exhausted(mock_module):
 
     assert result is False
     assert mock_module.run_command.call_count == 2
+
+
+# ============================================================================
+# Tests for build_output_settings
+# ============================================================================
+
+
+def test_build_output_settings(mock_module):
+    """Test that only specified settings are mapped to the [tcpout] stanza."""
+    result = build_output_settings(
+        mock_module,
+        dict(
+            max_queue_size="64MB",
+            auto_lb_frequency=None,
+            auto_lb_volume=1048576,
+            compressed=None,
+            use_ack=True,
+            connection_timeout=None,
+            write_timeout=None,
+            dns_resolution_interval=None,
+        ),
+    )
+
+    assert result == {
+        "outputs.conf": {
+            "tcpout": {
+                "maxQueueSize": "64MB",
+                "autoLBVolume": "1048576",
+                "useACK": "true",
+            },
+        },
+    }
+
+
+def test_build_output_settings_empty(mock_module):
+    """Test that no settings produce no configuration."""
+    assert (
+        build_output_settings(mock_module, dict(max_queue_size=None, use_ack=None))
+        == {}
+    )
+
+
+@pytest.mark.parametrize("max_queue_size", ["20000", "64MB", "1gb", "auto"])
+def test_build_output_settings_max_queue_size(mock_module, max_queue_size):
+    """Test that a number of events, a size in KB, MB or GB and auto are accepted."""
+    result = build_output_settings(mock_module, dict(max_queue_size=max_queue_size))
+
+    assert result == {"outputs.conf": {"tcpout": {"maxQueueSize": max_queue_size}}}
+
+
+@pytest.mark.parametrize("max_queue_size", ["64M", "64 megabytes", "1TB", "512B", ""])
+def test_build_output_settings_invalid_max_queue_size(mock_module, max_queue_size):
+    """Test that an invalid max_queue_size fails the module."""
+    with pytest.raises(SystemExit):
+        build_output_settings(mock_module, dict(max_queue_size=max_queue_size))
+
+    assert "max_queue_size" in mock_module.fail_json.call_args[1]["msg"]
+
+
+# ============================================================================
+# Tests for build_throughput_settings
+# ============================================================================
+
+
+def test_build_throughput_settings(mock_module):
+    """Test that the throughput options map to limits.conf and server.conf."""
+    result = build_throughput_settings(mock_module, 0, 2)
+
+    assert result == {
+        "limits.conf": {"thruput": {"maxKBps": "0"}},
+        "server.conf": {"general": {"parallelIngestionPipelines": "2"}},
+    }
+
+
+def test_build_throughput_settings_unset(mock_module):
+    """Test that unset options produce no configuration."""
+    assert build_throughput_settings(mock_module, None, None) == {}
+
+
+def test_configure_splunk_uf_app_thruput(mock_module, tmp_path):
+    """Test that an unlimited throughput overrides the 256 KBps cap of the SplunkUniversalForwarder app."""
+    mock_module.check_mode = False
+    etc = tmp_path / "etc"
+    (etc / "system" / "default").mkdir(parents=True)
+    (etc / "system" / "default" / "limits.conf").write_text("[thruput]\nmaxKBps = 0\n")
+    app_default = etc / "apps" / "SplunkUniversalForwarder" / "default"
+    app_default.mkdir(parents=True)
+    (app_default / "limits.conf").write_text("[thruput]\nmaxKBps = 256\n")
+
+    changes = configure_splunk(
+        mock_module, str(tmp_path), build_throughput_settings(mock_module, 0, None)
+    )
+
+    assert changes == [
+        dict(
+            file="limits.conf", stanza="thruput", key="maxKBps", before="256", after="0"
+        ),
+    ]
+    assert (etc / "system" / "local" / "limits.conf").read_text() == (
+        "[thruput]\nmaxKBps = 0\n"
+    )
+    assert (
+        configure_splunk(
+            mock_module, str(tmp_path), build_throughput_settings(mock_module, 0, None)
+        )
+        == []
+    )
+
+
+@pytest.mark.parametrize("max_kbps,pipelines", [(-1, None), (None, 0)])
+def test_build_throughput_settings_invalid(mock_module, max_kbps, pipelines):
+    """Test that invalid throughput values fail the module."""
+    with pytest.raises(SystemExit):
+        build_throughput_settings(mock_module, max_kbps, pipelines)
+
+    mock_module.fail_json.assert_called_once()
+
+
+# ============================================================================
+# Tests for build_output_groups
+# ============================================================================
+
+
+def output_group(name, servers, default=True, **settings):
+    group = dict(name=name, servers=servers, default=default)
+    group.update(dict.fromkeys(OUTPUT_SETTINGS_KEYS))
+    group.update(settings)
+    return group
+
+
+def test_build_output_groups(mock_module, tmp_path):
+    """Test that groups map to tcpout stanzas and stale groups are removed."""
+    local_dir = tmp_path / "etc" / "system" / "local"
+    local_dir.mkdir(parents=True)
+    (local_dir / "outputs.conf").write_text(
+        "[tcpout]\ndefaultGroup = default-autolb-group\n\n"
+        "[tcpout:default-autolb-group]\nserver = idx1:9997\n\n"
+        "[tcpout-server://idx1:9997]\n",
+    )
+
+    result = build_output_groups(
+        mock_module,
+        str(tmp_path),
+        [
+            output_group("app", ["app1:9997", "app2:9997"]),
+            output_group("security", ["sec1:9997"], default=False, use_ack=True),
+        ],
+    )
+
+    assert result == {
+        "outputs.conf": {
+            "tcpout:app": {"server": "app1:9997,app2:9997", "indexerDiscovery": None},
+            "tcpout:security": {
+                "server": "sec1:9997",
+                "indexerDiscovery": None,
+                "useACK": "true",
+            },
+            "tcpout:default-autolb-group": None,
+            "tcpout": {"defaultGroup": "app"},
+        },
+    }
+
+
+def test_build_output_groups_empty(mock_module, tmp_path):
+    """Test that an empty list removes defaultGroup."""
+    result = build_output_groups(mock_module, str(tmp_path), [])
+
+    assert result == {"outputs.conf": {"tcpout": {"defaultGroup": None}}}
+
+
+@pytest.mark.parametrize(
+    "groups",
+    [
+        [output_group("bad name", ["idx1:9997"])],
+        [output_group("app", ["idx1:9997"]), output_group("app", ["idx2:9997"])],
+        [output_group("app", [])],
+    ],
+)
+def test_build_output_groups_invalid(mock_module, tmp_path, groups):
+    """Test that invalid, duplicate or empty groups fail the module."""
+    with pytest.raises(SystemExit):
+        build_output_groups(mock_module, str(tmp_path), groups)
+
+    mock_module.fail_json.assert_called_once()
+
+
+def test_build_output_groups_indexer_discovery(mock_module, tmp_path):
+    """Test that a discovery group references the indexer discovery stanza."""
+    group = output_group("cluster", None, indexer_discovery=True)
+    discovery = dict(name="cm", manager_uri="https://cm:8089", pass4symmkey="secret")
+
+    result = build_output_groups(mock_module, str(tmp_path), [group], discovery)
+
+    assert result["outputs.conf"]["tcpout:cluster"] == {
+        "indexerDiscovery": "cm",
+        "server": None,
+    }
+
+
+def test_build_output_groups_indexer_discovery_unset(mock_module, tmp_path):
+    """Test that a discovery group requires the indexer_discovery option."""
+    group = output_group("cluster", None, indexer_discovery=True)
+
+    with pytest.raises(SystemExit):
+        build_output_groups(mock_module, str(tmp_path), [group])
+
+
+# ============================================================================
+# Tests for build_indexer_discovery
+# ============================================================================
+
+
+def write_outputs_conf(splunk_home, content):
+    local_dir = splunk_home / "etc" / "system" / "local"
+    local_dir.mkdir(parents=True)
+    (local_dir / "outputs.conf").write_text(content)
+
+
+def test_build_indexer_discovery(mock_module, tmp_path):
+    """Test that the discovery stanza is built and stale ones are removed."""
+    write_outputs_conf(
+        tmp_path, "[indexer_discovery:old]\nmanager_uri = https://old:8089\n"
+    )
+
+    result = build_indexer_discovery(
+        mock_module,
+        str(tmp_path),
+        dict(name="cm", manager_uri="https://cm:8089", pass4symmkey="secret"),
+    )
+
+    assert result == {
+        "outputs.conf": {
+            "indexer_discovery:cm": {
+                "manager_uri": "https://cm:8089",
+                "pass4SymmKey": "secret",
+            },
+            "indexer_discovery:old": None,
+        },
+    }
+    mock_module.run_command.assert_not_called()
+
+
+@pytest.mark.parametrize("decrypted,managed", [("secret", False), ("other", True)])
+def test_build_indexer_discovery_encrypted_key(
+    mock_module, tmp_path, decrypted, managed
+):
+    """Test that an encrypted key is only rewritten when it decrypts to another key."""
+    write_outputs_conf(tmp_path, "[indexer_discovery:cm]\npass4SymmKey = $7$abc\n")
+    (tmp_path / "bin").mkdir()
+    (tmp_path / "bin" / "splunk").write_text("")
+    mock_module.run_command.return_value = (0, f"{decrypted}\n", "")
+
+    result = build_indexer_discovery(
+        mock_module,
+        str(tmp_path),
+        dict(name="cm", manager_uri="https://cm:8089", pass4symmkey="secret"),
+    )
+
+    assert ("pass4SymmKey" in result["outputs.conf"]["indexer_discovery:cm"]) is managed
+    assert mock_module.run_command.call_args[0][0][1:] == [
+        "show-decrypted",
+        "--value",
+        "$7$abc",
+    ]
+
+
+def test_build_indexer_discovery_hides_stored_key(mock_module, tmp_path):
+    """Test that the stored key, encrypted and decrypted, is kept out of the module output."""
+    write_outputs_conf(tmp_path, "[indexer_discovery:cm]\npass4SymmKey = $7$abc\n")
+    (tmp_path / "bin").mkdir()
+    (tmp_path / "bin" / "splunk").write_text("")
+    mock_module.no_log_values = set()
+    mock_module.run_command.return_value = (0, "old-key\n", "")
+
+    build_indexer_discovery(
+        mock_module,
+        str(tmp_path),
+        dict(name="cm", manager_uri="https://cm:8089", pass4symmkey="secret"),
+    )
+
+    assert mock_module.no_log_values == {"$7$abc", "old-key"}
+
+
+# ============================================================================
+# Tests for build_deployment_server_settings
+# ============================================================================
+
+
+def test_build_deployment_server_settings_set():
+    """Test that a deployment server maps to the targetUri of its stanza."""
+    assert build_deployment_server_settings("ds.example.com:8089") == {
+        "deploymentclient.conf": {
+            "target-broker:deploymentServer": {"targetUri": "ds.example.com:8089"}
+        },
+    }
+
+
+def test_build_deployment_server_settings_remove():
+    """Test that an empty deployment server removes the client stanzas."""
+    assert build_deployment_server_settings("") == {
+        "deploymentclient.conf": {
+            "target-broker:deploymentServer": None,
+            "deployment-client": None,
+        },
+    }
+
+
+# ============================================================================
+# Tests for build_deployment_client_settings
+# ============================================================================
+
+
+def deployment_client(**settings):
+    options = dict(
+        phone_home_interval=None,
+        handshake_retry_interval=None,
+        client_name=None,
+        splay=None,
+    )
+    options.update(settings)
+    return options
+
+
+def test_host_splay_deterministic():
+    """Test that the splay is stable per host and within bounds."""
+    offsets = [host_splay(f"uf{i}.example.com", 300) for i in range(200)]
+
+    assert offsets == [host_splay(f"uf{i}.example.com", 300) for i in range(200)]
+    assert all(0 <= offset <= 300 for offset in offsets)
+    assert len(set(offsets)) > 100
+
+
+def test_build_deployment_client_settings(mock_module):
+    """Test that the options map to the [deployment-client] stanza."""
+    result = build_deployment_client_settings(
+        mock_module,
+        deployment_client(phone_home_interval=600, client_name="web"),
+    )
+
+    assert result == {
+        "deploymentclient.conf": {
+            "deployment-client": {
+                "phoneHomeIntervalInSecs": "600",
+                "clientName": "web",
+            },
+        },
+    }
+
+
+def test_build_deployment_client_settings_splay(mock_module):
+    """Test that the host splay is added to both intervals."""
+    with patch(
+        "plugins.modules.splunk_universal_forwarder_linux.socket.gethostname",
+        return_value="uf1",
+    ):
+        result = build_deployment_client_settings(
+            mock_module,
+            deployment_client(
+                phone_home_interval=600, handshake_retry_interval=60, splay=300
+            ),
+        )
+
+    offset = host_splay("uf1", 300)
+    assert result["deploymentclient.conf"]["deployment-client"] == {
+        "phoneHomeIntervalInSecs": str(600 + offset),
+        "handshakeRetryIntervalInSecs": str(60 + offset),
+    }
+
+
+def test_build_deployment_client_settings_splay_without_interval(mock_module):
+    """Test that a splay without an interval fails the module."""
+    with pytest.raises(SystemExit):
+        build_deployment_client_settings(mock_module, deployment_client(splay=300))
+
+    mock_module.fail_json.assert_called_once()
+
+
+# ============================================================================
+# Tests for build_input_queue_settings
+# ============================================================================
+
+
+def test_build_input_queue_settings(mock_module, tmp_path):
+    """Test that queue sizes map to the input stanza defined by an app."""
+    app_dir = tmp_path / "etc" / "apps" / "syslog" / "local"
+    app_dir.mkdir(parents=True)
+    (app_dir / "inputs.conf").write_text("[udp://514]\nsourcetype = syslog\n")
+
+    result = build_input_queue_settings(
+        mock_module,
+        str(tmp_path),
+        [dict(input="udp://514", queue_size="10MB", persistent_queue_size="1MB")],
+    )
+
+    assert result == {
+        "inputs.conf": {
+            "udp://514": {"queueSize": "10MB", "persistentQueueSize": "1MB"}
+        }
+    }
+    mock_module.warn.assert_not_called()
+
+
+def test_build_input_queue_settings_undefined_input(mock_module, tmp_path):
+    """Test that a warning is returned when no inputs.conf defines the input."""
+    build_input_queue_settings(
+        mock_module,
+        str(tmp_path),
+        [dict(input="tcp://9514", queue_size="10MB", persistent_queue_size=None)],
+    )
+
+    mock_module.warn.assert_called_once()
+
+
+@pytest.mark.parametrize(
+    "input_queue",
+    [
+        dict(input="monitor:///var/log", queue_size="10MB", persistent_queue_size=None),
+        dict(input="udp://514", queue_size="lots", persistent_queue_size=None),
+        dict(input="udp://514", queue_size=None, persistent_queue_size="1024TB"),
+    ],
+)
+def test_build_input_queue_settings_invalid(mock_module, tmp_path, input_queue):
+    """Test that unsupported inputs, invalid sizes and missing disk space fail the module."""
+    with pytest.raises(SystemExit):
+        build_input_queue_settings(mock_module, str(tmp_path), [input_queue])
+
+    mock_module.fail_json.assert_called_once()
+
+
+# ============================================================================
+# Tests for build_internal_logging_settings and configure_splunk
+# ============================================================================
+
+
+def test_build_internal_logging_settings_minimal():
+    """Test that the minimal profile filters internal indexes and unsets debug levels."""
+    result = build_internal_logging_settings("minimal")
+
+    assert result["outputs.conf"]["tcpout"]["forwardedindex.2.whitelist"] == "(_audit)"
+    assert result["outputs.conf"]["tcpout"]["forwardedindex.0.whitelist"] is None
+    assert result["log-local.cfg"]["splunkd"]["rootCategory"] == "WARN,A1"
+    assert result["log-local.cfg"]["splunkd"]["category.TcpOutputProc"] is None
+
+
+def test_build_internal_logging_settings_default():
+    """Test that the default profile removes every managed key."""
+    result = build_internal_logging_settings("default")
+
+    assert all(value is None for value in result["outputs.conf"]["tcpout"].values())
+    assert all(value is None for value in result["log-local.cfg"]["splunkd"].values())
+
+
+def test_build_internal_logging_settings_debug():
+    """Test that the debug profile disables the index filters and raises the log levels."""
+    result = build_internal_logging_settings("debug")
+
+    assert result["outputs.conf"]["tcpout"] == {
+        "forwardedindex.0.whitelist": None,
+        "forwardedindex.1.blacklist": None,
+        "forwardedindex.2.whitelist": None,
+        "forwardedindex.filter.disable": "true",
+    }
+    assert result["log-local.cfg"]["splunkd"]["category.TcpOutputProc"] == "DEBUG"
+
+
+def test_configure_splunk_logging_files(mock_module, tmp_path):
+    """Test that log-local.cfg is written to etc and .conf files to etc/system/local."""
+    mock_module.check_mode = False
+
+    changes = configure_splunk(
+        mock_module, str(tmp_path), build_internal_logging_settings("minimal")
+    )
+
+    assert {change["file"] for change in changes} == {"outputs.conf", "log-local.cfg"}
+    assert (tmp_path / "etc" / "system" / "local" / "outputs.conf").read_text() == (
+        "[tcpout]\nforwardedindex.2.whitelist = (_audit)\n"
+    )
+    assert (tmp_path / "etc" / "log-local.cfg").read_text() == (
+        "[splunkd]\nrootCategory=WARN,A1\nappender.A1.maxFileSize=10000000\nappender.A1.maxBackupIndex=2\n"
+    )
+
+    changes = configure_splunk(
+        mock_module, str(tmp_path), build_internal_logging_settings("default")
+    )
+
+    assert len(changes) == 4
+    assert (tmp_path / "etc" / "log-local.cfg").read_text() == "[splunkd]\n"
+
+
+# ============================================================================
+# Tests for the tarball installation
+# ============================================================================
+
+
+def test_get_package_filename():
+    """Test the RPM and tarball filenames of a release."""
+    assert get_package_filename("9.4.7", "2a9293b80994", "x86_64", "rpm") == (
+        "splunkforwarder-9.4.7-2a9293b80994.x86_64.rpm"
+    )
+    assert get_package_filename("9.4.7", "2a9293b80994", "aarch64", "tarball") == (
+        "splunkforwarder-9.4.7-2a9293b80994-Linux-armv8.tgz"
+    )
+
+
+def test_get_linked_version(tmp_path):
+    """Test that the version is read from the directory the symlink points to."""
+    install_dir = tmp_path / "splunkforwarder-9.4.6"
+    (install_dir / "etc").mkdir(parents=True)
+    (install_dir / "etc" / "splunk.version").write_text(
+        "VERSION=9.4.6\nBUILD=60284236e579\n"
+    )
+    splunk_home = tmp_path / "splunkforwarder"
+
+    assert get_linked_version(str(splunk_home)) is None
+    splunk_home.symlink_to(install_dir)
+    assert get_linked_version(str(splunk_home)) == "9.4.6"
+
+
+def test_copy_missing_files(tmp_path):
+    """Test that only the files the new version does not ship are copied."""
+    src = tmp_path / "old"
+    (src / "system" / "local").mkdir(parents=True)
+    (src / "system" / "default").mkdir(parents=True)
+    (src / "system" / "local" / "outputs.conf").write_text("local\n")
+    (src / "system" / "default" / "server.conf").write_text("old default\n")
+    (src / "apps").symlink_to(src / "system")
+    dest = tmp_path / "new"
+    (dest / "system" / "default").mkdir(parents=True)
+    (dest / "system" / "default" / "server.conf").write_text("new default\n")
+
+    copy_missing_files(str(src), str(dest))
+
+    assert (dest / "system" / "local" / "outputs.conf").read_text() == "local\n"
+    assert (dest / "system" / "default" / "server.conf").read_text() == "new default\n"
+    assert (dest / "apps").is_symlink()
+
+
+def test_switch_splunk_home(mock_module, tmp_path):
+    """Test that the symlink is created, then repointed to the new directory."""
+    mock_module.check_mode = False
+    splunk_home = tmp_path / "splunkforwarder"
+    splunk_home.mkdir()
+    for version in ("9.4.6", "9.4.7"):
+        (tmp_path / f"splunkforwarder-{version}").mkdir()
+
+    switch_splunk_home(
+        mock_module, str(splunk_home), str(tmp_path / "splunkforwarder-9.4.6")
+    )
+    switch_splunk_home(
+        mock_module, str(splunk_home), str(tmp_path / "splunkforwarder-9.4.7")
+    )
+
+    assert splunk_home.is_symlink()
+    assert splunk_home.resolve().name == "splunkforwarder-9.4.7"
+    assert not (tmp_path / "splunkforwarder.link").exists()
+
+
+def test_purge_splunk_home_tarball(mock_module, tmp_path):
+    """Test that purging a tarball installation removes the link and every versioned directory."""
+    mock_module.check_mode = False
+    for version in ("9.4.6", "9.4.7"):
+        (tmp_path / f"splunkforwarder-{version}" / "bin").mkdir(parents=True)
+    (tmp_path / "splunkforwarder-9.4.7-2a9293b80994-linux-amd64.tgz").write_bytes(
+        b"tarball"
+    )
+    splunk_home = tmp_path / "splunkforwarder"
+    splunk_home.symlink_to(tmp_path / "splunkforwarder-9.4.7")
+
+    purge_splunk_home(mock_module, str(splunk_home))
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "splunkforwarder-9.4.7-2a9293b80994-linux-amd64.tgz"
+    ]
+
+
+# ============================================================================
+# Tests for snapshot_splunk_home and read_snapshot
+# ============================================================================
+
+
+def test_snapshot_splunk_home_tarball(mock_module, tmp_path):
+    """Test that a tarball snapshot only records the previous directory."""
+    mock_module.check_mode = False
+    snapshot_dir = tmp_path / "splunkforwarder.snapshot"
+    snapshot = dict(
+        version="9.4.6",
+        release_id=None,
+        cpu_arch="x86_64",
+        install_method="tarball",
+        install_dir="/x",
+    )
+
+    snapshot_splunk_home(
+        mock_module, str(tmp_path / "splunkforwarder"), str(snapshot_dir), snapshot
+    )
+
+    assert read_snapshot(str(snapshot_dir)) == snapshot
+    assert sorted(path.name for path in snapshot_dir.iterdir()) == ["snapshot.json"]
+    mock_module.run_command.assert_not_called()
+
+
+@pytest.mark.parametrize("check_mode", [False, True])
+def test_rollback_splunk_missing_install_dir(mock_module, tmp_path, check_mode):
+    """Test that a tarball rollback to a removed directory fails before splunkd is stopped."""
+    mock_module.check_mode = False
+    splunk_home = tmp_path / "splunkforwarder"
+    snapshot_splunk_home(
+        mock_module,
+        str(splunk_home),
+        f"{splunk_home}.snapshot",
+        dict(
+            version="9.4.6",
+            release_id=None,
+            cpu_arch="x86_64",
+            install_method="tarball",
+            install_dir=f"{splunk_home}-9.4.6",
+        ),
+    )
+    mock_module.check_mode = check_mode
+
+    with patch(
+        "plugins.modules.splunk_universal_forwarder_linux.get_current_version",
+        return_value="9.4.7",
+    ), patch(
+        "plugins.modules.splunk_universal_forwarder_linux.stop_splunk"
+    ) as mock_stop, pytest.raises(
+        SystemExit
+    ):
+        rollback_splunk(mock_module, str(splunk_home), str(tmp_path))
+
+    assert "no longer exists" in mock_module.fail_json.call_args.kwargs["msg"]
+    mock_stop.assert_not_called()
+    mock_module.run_command.assert_not_called()
+
+
+def test_read_snapshot_missing(tmp_path):
+    """Test that a directory without a description is not a snapshot."""
+    (tmp_path / "etc").mkdir()
+
+    assert read_snapshot(str(tmp_path)) is None
+
+
+# ============================================================================
+# Tests for preserve_splunk_state and restore_splunk_state
+# ============================================================================
+
+
+def test_preserve_and_restore_splunk_state(mock_module, tmp_path):
+    """Test that the fishbucket is moved out and back, and etc merged under the new files."""
+    mock_module.check_mode = False
+    splunk_home = tmp_path / "splunkforwarder"
+    fishbucket = splunk_home / "var" / "lib" / "splunk" / "fishbucket"
+    fishbucket.mkdir(parents=True)
+    (fishbucket / "btree_records.dat").write_bytes(b"checkpoints")
+    (splunk_home / "etc" / "system" / "local").mkdir(parents=True)
+    (splunk_home / "etc" / "system" / "local" / "outputs.conf").write_text("local\n")
+    preserved_dir = tmp_path / "splunkforwarder.preserved"
+
+    preserve_splunk_state(
+        mock_module, str(splunk_home), str(preserved_dir), ["fishbucket"]
+    )
+
+    assert not fishbucket.exists()
+    assert sorted(path.name for path in preserved_dir.iterdir()) == ["fishbucket"]
+
+    preserve_splunk_state(mock_module, str(splunk_home), str(preserved_dir), ["etc"])
+    (splunk_home / "etc" / "system" / "local").mkdir(parents=True)
+    (splunk_home / "etc" / "system" / "local" / "outputs.conf").write_text("shipped\n")
+
+    assert restore_splunk_state(mock_module, str(splunk_home), str(preserved_dir)) == [
+        "etc"
+    ]
+    assert (
+        splunk_home / "etc" / "system" / "local" / "outputs.conf"
+    ).read_text() == "shipped\n"
+    assert not preserved_dir.exists()
+
+
+def test_restore_splunk_state_nothing_preserved(mock_module, tmp_path):
+    """Test that nothing is restored without preserved state."""
+    assert (
+        restore_splunk_state(
+            mock_module, str(tmp_path / "splunkforwarder"), str(tmp_path / "missing")
+        )
+        == []
+    )
+
+
+def test_purge_splunk_home_background(mock_module, tmp_path):
+    """Test that a background purge renames the directory and deletes it with leftover tombstones."""
+    mock_module.check_mode = False
+    mock_module.run_command.return_value = (0, "", "")
+    splunk_home = tmp_path / "splunkforwarder"
+    (splunk_home / "var").mkdir(parents=True)
+    (tmp_path / ".splunkforwarder.purge-1-0").mkdir()
+
+    with patch("shutil.which", return_value="/usr/bin/systemd-run"):
+        purge_splunk_home(mock_module, str(splunk_home), background=True)
+
+    assert not splunk_home.exists()
+    argv = mock_module.run_command.call_args[0][0]
+    assert argv[0] == "systemd-run"
+    assert "--property=IOSchedulingClass=idle" in argv
+    first_path = argv.index("--one-file-system") + 1
+    tombstones = argv[first_path:]
+    assert str(tmp_path / ".splunkforwarder.purge-1-0") in tombstones
+    assert len(tombstones) == 2
+    assert all(os.path.isdir(tombstone) for tombstone in tombstones)
+
+
+def test_purge_splunk_home_sync_removes_tombstones(mock_module, tmp_path):
+    """Test that a synchronous purge also deletes the tombstones of interrupted background purges."""
+    mock_module.check_mode = False
+    splunk_home = tmp_path / "splunkforwarder"
+    (splunk_home / "var").mkdir(parents=True)
+    (tmp_path / ".splunkforwarder.purge-1-0" / "var").mkdir(parents=True)
+    (tmp_path / ".splunkforwarder2.purge-1-0").mkdir()
+
+    purge_splunk_home(mock_module, str(splunk_home))
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        ".splunkforwarder2.purge-1-0"
+    ]
+
+
+def test_purge_splunk_home_background_rename_failure(mock_module, tmp_path):
+    """Test that a failed rename fails the module and leaves no empty tombstone."""
+    mock_module.check_mode = False
+    splunk_home = tmp_path / "splunkforwarder"
+    splunk_home.mkdir()
+
+    with patch("pathlib.Path.rename", side_effect=OSError("Directory not empty")):
+        with pytest.raises(SystemExit):
+            purge_splunk_home(mock_module, str(splunk_home), background=True)
+
+    assert "Directory not empty" in mock_module.fail_json.call_args[1]["msg"]
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["splunkforwarder"]
+
+
+def test_sweep_tombstones(mock_module, tmp_path):
+    """Test that the tombstones of an instance are deleted in the background."""
+    mock_module.check_mode = False
+    mock_module.run_command.return_value = (0, "", "")
+    (tmp_path / ".splunkforwarder.purge-a1b2c3d4").mkdir()
+
+    with patch("shutil.which", return_value="/usr/bin/systemd-run"):
+        sweep_tombstones(mock_module, str(tmp_path / "splunkforwarder"))
+
+    argv = mock_module.run_command.call_args[0][0]
+    assert argv[-1] == str(tmp_path / ".splunkforwarder.purge-a1b2c3d4")
+
+
+def test_sweep_tombstones_none(mock_module, tmp_path):
+    """Test that nothing runs without tombstones."""
+    mock_module.check_mode = False
+
+    sweep_tombstones(mock_module, str(tmp_path / "splunkforwarder"))
+
+    mock_module.run_command.assert_not_called()
+
+
+def test_purge_splunk_home_background_without_systemd(mock_module, tmp_path):
+    """Test that the deletion runs in a detached niced process without systemd-run."""
+    mock_module.check_mode = False
+    splunk_home = tmp_path / "splunkforwarder"
+    splunk_home.mkdir()
+
+    with patch("shutil.which", return_value=None):
+        with patch("subprocess.Popen") as mock_popen:
+            purge_splunk_home(mock_module, str(splunk_home), background=True)
+
+    argv = mock_popen.call_args[0][0]
+    assert argv[:3] == ["nice", "-n", "19"]
+    assert "ionice" not in argv
+    assert mock_popen.call_args[1]["start_new_session"] is True
+    mock_module.run_command.assert_not_called()
+
+
+# ============================================================================
+# Tests for verify_after_change
+# ============================================================================
+
+
+@pytest.mark.parametrize(
+    "result",
+    [
+        dict(changed=False, msg="already installed"),
+        dict(changed=True, msg="configuration updated", applied_by="next_start"),
+    ],
+)
+def test_verify_after_change_skipped(mock_module, result):
+    """Test that an unchanged or stopped forwarder is not verified."""
+    mock_module.check_mode = False
+
+    with patch(
+        "plugins.modules.splunk_universal_forwarder_linux.verify_data_flow"
+    ) as verify:
+        verify_after_change(mock_module, "/opt/splunkforwarder", 60, result)
+
+    verify.assert_not_called()
+
+
+def test_verify_after_change_fails(mock_module):
+    """Test that the module fails with the verification result when no data was forwarded."""
+    mock_module.check_mode = False
+    data_flow = dict(verified=False, seconds=60.0, connections={})
+    result = dict(changed=True, msg="installed")
+
+    with patch(
+        "plugins.modules.splunk_universal_forwarder_linux.verify_data_flow",
+        return_value=data_flow,
+    ):
+        with pytest.raises(SystemExit):
+            verify_after_change(mock_module, "/opt/splunkforwarder", 60, result)
+
+    kwargs = mock_module.fail_json.call_args[1]
+    assert kwargs["data_flow"] == data_flow
+    assert kwargs["changed"] is True
+    assert "no data was forwarded" in kwargs["msg"]
+
+
+# ============================================================================
+# Tests for build_instance_settings, get_service_name and check_instance_conflicts
+# ============================================================================
+
+
+def test_build_instance_settings(mock_module):
+    """Test that the port goes to web.conf and a custom service name to splunk-launch.conf."""
+    result = build_instance_settings(mock_module, "/opt/uf2", "SplunkForwarder2", 8090)
+
+    assert result == {
+        "web.conf": {"settings": {"mgmtHostPort": "127.0.0.1:8090"}},
+        "splunk-launch.conf": {"default": {"SPLUNK_SERVER_NAME": "SplunkForwarder2"}},
+    }
+
+
+def test_build_instance_settings_default(mock_module):
+    """Test that the default instance needs no settings."""
+    assert (
+        build_instance_settings(
+            mock_module, "/opt/splunkforwarder", "SplunkForwarder", None
+        )
+        == {}
+    )
+
+
+def test_build_instance_settings_server_name(mock_module):
+    """Test that the server name goes to server.conf and to the default host of inputs.conf."""
+    result = build_instance_settings(
+        mock_module, "/opt/splunkforwarder", "SplunkForwarder", None, "clone-01"
+    )
+
+    assert result == {
+        "server.conf": {"general": {"serverName": "clone-01"}},
+        "inputs.conf": {"default": {"host": "clone-01"}},
+    }
+
+
+@pytest.mark.parametrize(
+    "service_name, mgmt_port", [("Splunk Forwarder", None), ("SplunkForwarder", 70000)]
+)
+def test_build_instance_settings_invalid(mock_module, service_name, mgmt_port):
+    """Test that an invalid service name or port fails the module."""
+    with pytest.raises(SystemExit):
+        build_instance_settings(mock_module, "/opt/uf2", service_name, mgmt_port)
+
+
+def test_get_service_name(tmp_path):
+    """Test that the service name comes from SPLUNK_SERVER_NAME, with SplunkForwarder as default."""
+    assert get_service_name(str(tmp_path)) == "SplunkForwarder"
+
+    (tmp_path / "etc").mkdir()
+    (tmp_path / "etc" / "splunk-launch.conf").write_text(
+        "SPLUNK_SERVER_NAME=SplunkForwarder2\n"
+    )
+
+    assert get_service_name(str(tmp_path)) == "SplunkForwarder2"
+
+
+@pytest.mark.parametrize(
+    "service_name, mgmt_port, fails",
+    [
+        ("SplunkForwarder", None, True),
+        ("SplunkForwarder3", 8090, True),
+        ("SplunkForwarder3", 8091, False),
+    ],
+)
+def test_check_instance_conflicts(
+    mock_module, tmp_path, service_name, mgmt_port, fails
+):
+    """Test that the service and port of another instance cannot be reused."""
+    other_home = tmp_path / "uf2"
+    (other_home / "etc" / "system" / "local").mkdir(parents=True)
+    (other_home / "etc" / "system" / "local" / "web.conf").write_text(
+        "[settings]\nmgmtHostPort = 127.0.0.1:8090\n"
+    )
+    services = {"SplunkForwarder": str(other_home)}
+
+    with patch(
+        "plugins.modules.splunk_universal_forwarder_linux.get_service_splunk_homes",
+        return_value=services,
+    ):
+        if fails:
+            with pytest.raises(SystemExit):
+                check_instance_conflicts(
+                    mock_module, str(tmp_path / "uf3"), service_name, mgmt_port
+                )
+        else:
+            check_instance_conflicts(
+                mock_module, str(tmp_path / "uf3"), service_name, mgmt_port
+            )
+
+
+def test_check_instance_conflicts_same_instance(mock_module, tmp_path):
+    """Test that the service of the instance itself is no conflict."""
+    services = {"SplunkForwarder2": f"{tmp_path}/uf2-9.4.7"}
+
+    with patch(
+        "plugins.modules.splunk_universal_forwarder_linux.get_service_splunk_homes",
+        return_value=services,
+    ):
+        check_instance_conflicts(
+            mock_module, f"{tmp_path}/uf2", "SplunkForwarder2", 8090
+        )
+
+    mock_module.fail_json.assert_not_called()
+
+
+# ============================================================================
+# Tests for prepare_image and start_stopped_splunk
+# ============================================================================
+
+
+def test_prepare_image_running(mock_module, tmp_path):
+    """Test that a running forwarder is stopped before its instance configuration is cleared."""
+    mock_module.check_mode = False
+    mock_module.run_command.side_effect = [
+        (0, "", ""),
+        (0, "", ""),
+        (3, "", ""),
+        (0, "", ""),
+    ]
+    splunk_bin = str(tmp_path / "bin" / "splunk")
+
+    assert prepare_image(mock_module, str(tmp_path)) is True
+
+    assert [call[0][0] for call in mock_module.run_command.call_args_list] == [
+        [splunk_bin, "status"],
+        [splunk_bin, "stop"],
+        [splunk_bin, "status"],
+        [splunk_bin, "clone-prep-clear-config"],
+    ]
+
+
+def test_prepare_image_stopped_with_guid(mock_module, tmp_path):
+    """Test that the GUID of a stopped forwarder is cleared."""
+    mock_module.check_mode = False
+    mock_module.run_command.side_effect = [(3, "", ""), (0, "", "")]
+    (tmp_path / "etc").mkdir()
+    (tmp_path / "etc" / "instance.cfg").write_text(
+        "[general]\nguid = 3F2504E0-4F89-11D3-9A0C-0305E82C3301\n"
+    )
+
+    assert prepare_image(mock_module, str(tmp_path)) is True
+
+    mock_module.run_command.assert_called_with(
+        [str(tmp_path / "bin" / "splunk"), "clone-prep-clear-config"],
+        check_rc=False,
+    )
+
+
+def test_prepare_image_already_prepared(mock_module, tmp_path):
+    """Test that a stopped forwarder without GUID and server name is left alone."""
+    mock_module.run_command.return_value = (3, "", "")
+    (tmp_path / "etc").mkdir()
+    (tmp_path / "etc" / "instance.cfg").write_text("[general]\n")
+
+    assert prepare_image(mock_module, str(tmp_path)) is False
+
+    mock_module.run_command.assert_called_once()
+
+
+def test_prepare_image_failure(mock_module, tmp_path):
+    """Test that a failed clone-prep-clear-config fails the module."""
+    mock_module.check_mode = False
+    mock_module.run_command.side_effect = [(3, "", ""), (1, "", "splunkd is running")]
+    (tmp_path / "etc").mkdir()
+    (tmp_path / "etc" / "instance.cfg").write_text(
+        "[general]\nguid = 3F2504E0-4F89-11D3-9A0C-0305E82C3301\n"
+    )
+
+    with pytest.raises(SystemExit):
+        prepare_image(mock_module, str(tmp_path))
+
+    assert "splunkd is running" in mock_module.fail_json.call_args[1]["msg"]
+
+
+def test_start_stopped_splunk_running(mock_module):
+    """Test that a running forwarder is not started again."""
+    mock_module.run_command.return_value = (0, "splunkd is running", "")
+
+    assert start_stopped_splunk(mock_module, "/opt/splunkforwarder") is False
+
+    mock_module.run_command.assert_called_once()
+
+
+def test_start_stopped_splunk(mock_module):
+    """Test that a stopped forwarder is started without prompting."""
+    mock_module.check_mode = False
+    mock_module.run_command.side_effect = [(3, "", ""), (0, "", ""), (0, "", "")]
+
+    assert start_stopped_splunk(mock_module, "/opt/splunkforwarder") is True
+
+    assert mock_module.run_command.call_args_list[1][0][0] == [
+        "/opt/splunkforwarder/bin/splunk",
+        "start",
+        "--accept-license",
+        "--answer-yes",
+        "--no-prompt",
+    ]
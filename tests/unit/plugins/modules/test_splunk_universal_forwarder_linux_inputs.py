@@ -0,0 +1,231 @@
+# Copyright (c) Ansible Project
+# GNU General Public License v3.0+ (see LICENSES/GPL-3.0-or-later.txt or https://www.gnu.org/licenses/gpl-3.0.txt)
+# SPDX-License-Identifier: GPL-3.0-or-later
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import os
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from plugins.modules.splunk_universal_forwarder_linux_inputs import (
+    INPUT_SETTINGS_KEYS,
+    build_input_stanza,
+    build_inputs_settings,
+    estimate_monitored_files,
+    monitor_path_regex,
+)
+
+
+@pytest.fixture
+def mock_module():
+    """Create a mock AnsibleModule for testing.
+
+    The fail_json mock raises SystemExit to simulate real Ansible behavior
+    where fail_json terminates module execution.
+    """
+    mock = MagicMock()
+    mock.fail_json = MagicMock(side_effect=SystemExit(1))
+    mock.warn = MagicMock()
+    return mock
+
+
+def input_spec(path, **settings):
+    spec = dict(path=path, type="monitor", state="present")
+    spec.update(dict.fromkeys(INPUT_SETTINGS_KEYS))
+    spec.update(settings)
+    return spec
+
+
+# ============================================================================
+# Tests for build_input_stanza
+# ============================================================================
+
+
+def test_build_input_stanza_monitor(mock_module):
+    """Test that a monitor input maps to its stanza keys."""
+    result = build_input_stanza(
+        mock_module,
+        input_spec(
+            "/var/log/app/",
+            index="app",
+            ignore_older_than="7d",
+            recursive=False,
+            follow_tail=True,
+        ),
+    )
+
+    assert result == (
+        "monitor:///var/log/app",
+        {
+            "index": "app",
+            "ignoreOlderThan": "7d",
+            "recursive": "false",
+            "followTail": "true",
+        },
+    )
+
+
+def test_build_input_stanza_batch(mock_module):
+    """Test that a batch input gets the sinkhole move policy."""
+    result = build_input_stanza(
+        mock_module, input_spec("/var/spool/drop", type="batch", index="uploads")
+    )
+
+    assert result == (
+        "batch:///var/spool/drop",
+        {"index": "uploads", "move_policy": "sinkhole"},
+    )
+
+
+def test_build_input_stanza_absent(mock_module):
+    """Test that an absent input removes its stanza."""
+    assert build_input_stanza(
+        mock_module, input_spec("/var/log/old", state="absent")
+    ) == (
+        "monitor:///var/log/old",
+        None,
+    )
+
+
+@pytest.mark.parametrize(
+    "spec",
+    [
+        input_spec("var/log"),
+        input_spec("/var/log", ignore_older_than="7 days"),
+        input_spec("/var/log", whitelist="(unclosed"),
+        input_spec("/var/spool", type="batch", follow_tail=True),
+    ],
+)
+def test_build_input_stanza_invalid(mock_module, spec):
+    """Test that invalid inputs fail the module."""
+    with pytest.raises(SystemExit):
+        build_input_stanza(mock_module, spec)
+
+    mock_module.fail_json.assert_called_once()
+
+
+# ============================================================================
+# Tests for build_inputs_settings
+# ============================================================================
+
+
+def test_build_inputs_settings_exclusive(mock_module, tmp_path):
+    """Test that exclusive removes the unlisted file inputs only."""
+    (tmp_path / "inputs.conf").write_text(
+        "[monitor:///var/log/old]\nindex = main\n\n[batch:///var/spool/old]\n\n[udp://514]\n",
+    )
+
+    result = build_inputs_settings(
+        mock_module, [input_spec("/var/log/app", index="app")], True, str(tmp_path)
+    )
+
+    assert result == {
+        "inputs.conf": {
+            "monitor:///var/log/app": {"index": "app"},
+            "monitor:///var/log/old": None,
+            "batch:///var/spool/old": None,
+        },
+    }
+
+
+def test_build_inputs_settings_duplicate(mock_module, tmp_path):
+    """Test that the same input listed twice fails the module."""
+    with pytest.raises(SystemExit):
+        build_inputs_settings(
+            mock_module,
+            [input_spec("/var/log/app"), input_spec("/var/log/app/")],
+            False,
+            str(tmp_path),
+        )
+
+
+# ============================================================================
+# Tests for estimate_monitored_files
+# ============================================================================
+
+
+@pytest.fixture
+def log_tree(tmp_path):
+    """Create app1..app3 directories with 5 .log and 5 .gz files each, one level deep."""
+    for app in ("app1", "app2", "app3"):
+        directory = tmp_path / app / "current"
+        directory.mkdir(parents=True)
+        for i in range(5):
+            (directory / f"{i}.log").touch()
+            (directory / f"{i}.gz").touch()
+    return tmp_path
+
+
+def test_monitor_path_regex():
+    """Test that * matches one path segment and ... any number of them."""
+    regex = monitor_path_regex("/var/log/*/current/.../*.log")
+
+    assert regex.match("/var/log/app/current/a/b/x.log")
+    assert not regex.match("/var/log/app/other/current/x.log")
+
+
+def test_estimate_monitored_files_filters(log_tree):
+    """Test that whitelist and blacklist filter the counted files."""
+    result = estimate_monitored_files(
+        {"whitelist": r"\.log$", "blacklist": "app3"}, str(log_tree), 1000
+    )
+
+    assert result == dict(files=10, truncated=False)
+
+
+def test_estimate_monitored_files_not_recursive(log_tree):
+    """Test that recursive = false only counts the files of the directory itself."""
+    (log_tree / "top.log").touch()
+
+    result = estimate_monitored_files({"recursive": "false"}, str(log_tree), 1000)
+
+    assert result == dict(files=1, truncated=False)
+
+
+def test_estimate_monitored_files_wildcard(log_tree):
+    """Test that a wildcard path only counts the matching files."""
+    result = estimate_monitored_files(
+        {}, str(log_tree / "app*" / "current" / "*.gz"), 1000
+    )
+
+    assert result == dict(files=15, truncated=False)
+
+
+def test_estimate_monitored_files_ignore_older_than(log_tree):
+    """Test that files older than ignoreOlderThan are not counted."""
+    old = time.time() - 10 * 86400
+    for path in (log_tree / "app1" / "current").iterdir():
+        os.utime(path, (old, old))
+
+    result = estimate_monitored_files({"ignoreOlderThan": "7d"}, str(log_tree), 1000)
+
+    assert result == dict(files=20, truncated=False)
+
+
+def test_estimate_monitored_files_truncated(log_tree):
+    """Test that the scan stops after the file limit."""
+    result = estimate_monitored_files({}, str(log_tree), 10)
+
+    assert result == dict(files=11, truncated=True)
+
+
+def test_estimate_monitored_files_entry_budget(log_tree):
+    """Test that the scan stops after its entry budget when most files are filtered out."""
+    result = estimate_monitored_files({"whitelist": r"0\.log$"}, str(log_tree), 2)
+
+    assert result["truncated"] is True
+    assert result["files"] <= 2
+
+
+def test_estimate_monitored_files_single_file(log_tree):
+    """Test that a monitored file counts as one file."""
+    result = estimate_monitored_files(
+        {}, str(log_tree / "app1" / "current" / "0.log"), 1000
+    )
+
+    assert result == dict(files=1, truncated=False)